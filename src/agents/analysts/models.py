@@ -1,6 +1,14 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 from typing import Literal
 from pathlib import Path
+import pandas as pd
+from src.agents.utils.indicator_cache import (
+    IndicatorCache,
+    frame_fingerprint,
+    shared_indicator_cache,
+)
+from src.agents.utils.indicator_payload import PayloadFormat
+from src.config import Config
 
 
 class TechOutput(BaseModel):
@@ -14,5 +22,60 @@ class TechOutput(BaseModel):
     timeframe_alignment: bool
 
 
+class NewsOutput(BaseModel):
+    key_events: list[str]
+    reddit_sentiment: str
+    sentiment: Literal["BULLISH", "BEARISH", "NEUTRAL"]
+    confidence: Literal["HIGH", "MEDIUM", "LOW"]
+    short_term_outlook: str
+    risk_factors: list[str]
+
+
+class BranchStatus(BaseModel):
+    status: Literal["ok", "timeout", "error", "skipped"]
+    seconds: float
+    error: str | None = None
+
+
+class TradeDecision(BaseModel):
+    """Technical setup adjusted by the news sentiment, see `orchestrator.merge_decision`"""
+
+    symbol: str
+    decision: Literal["LONG", "SHORT", "NO_TRADE"]
+    # On the technical agent's 0-10 scale, `Config.TECH_CONFIDENCE_SCALE`
+    confidence: float
+    entry: float | None
+    stop_loss: float | None
+    take_profit: list[float]
+    rationale: str
+    technical: TechOutput | None
+    news: NewsOutput | None
+    branches: dict[str, BranchStatus]
+
+
 class AgentsDeps(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     df_candle_path: Path
+    # Parsed candles, read from `df_candle_path` on first use if not provided
+    df_candle: pd.DataFrame | None = None
+    indicator_cache: IndicatorCache = Field(
+        default_factory=lambda: shared_indicator_cache
+    )
+    # Shape of indicator tool outputs, see `compact_payload`
+    payload_format: PayloadFormat = Config.INDICATOR_PAYLOAD_FORMAT
+    payload_tail: int | None = Config.INDICATOR_PAYLOAD_TAIL
+
+    _df_fingerprint: str | None = PrivateAttr(default=None)
+
+    def candles(self) -> pd.DataFrame:
+        if self.df_candle is None:
+            self.df_candle = pd.read_csv(
+                self.df_candle_path, parse_dates=True, index_col="timestamp"
+            )
+        return self.df_candle
+
+    def df_fingerprint(self) -> str:
+        if self._df_fingerprint is None:
+            self._df_fingerprint = frame_fingerprint(self.candles())
+        return self._df_fingerprint
@@ -1,46 +1,179 @@
-import logfire
-from pydantic_ai import Agent
-from pydantic_ai.mcp import MCPServerStdio
-from pydantic_ai.builtin_tools import WebSearchTool
+import asyncio
+import functools
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any
+from src.agents.analysts.models import NewsOutput
 from src.agents.analysts.prompts import SYSTEM_PROMPT_NEWS_ANALYST
+from src.agents.utils.mcp_pool import MCPServerPool
+from src.agents.utils.telemetry import configure_telemetry
+from src.agents.utils.ttl_cache import TTLCache
 from src.config import Config
 
+if TYPE_CHECKING:
+    from pydantic_ai import Agent
+    from pydantic_ai.mcp import MCPServerStdio
 
-logfire.configure(service_name="News agent")
-logfire.instrument_pydantic_ai()
 
 # mcp_alpha_vantage = MCPServerStreamableHTTP(
 #     url=f"https://mcp.alphavantage.co/mcp?apikey={Config.ALPHA_VANTAGE_API_KEY}&categories=cryptocurrencies,alpha_intelligence"
 # )
 
 
-mcp_coingecko = MCPServerStdio(
-    "npx",
-    args=["-y", "@coingecko/coingecko-mcp"],
-    env={
-        "COINGECKO_PRO_API_KEY": "",
-        "COINGECKO_DEMO_API_KEY": Config.COINGECKO_API_KEY,
-        "COINGECKO_ENVIRONMENT": "demo",
-    },
-    timeout=600,
-)
+def coingecko_server() -> "MCPServerStdio":
+    from pydantic_ai.mcp import MCPServerStdio
 
-mcp_reddit = MCPServerStdio("npx", args=["-y", "reddit-mcp-buddy"])
+    return MCPServerStdio(
+        "npx",
+        args=["-y", "@coingecko/coingecko-mcp"],
+        id="coingecko",
+        env={
+            "COINGECKO_PRO_API_KEY": "",
+            "COINGECKO_DEMO_API_KEY": Config.COINGECKO_API_KEY,
+            "COINGECKO_ENVIRONMENT": "demo",
+        },
+        # npx may download the package on the first start, the pool logs how long it took
+        timeout=600,
+    )
 
 
-agent = Agent(
-    model=Config.MODEL_VERSION_NEWS_AGENT,
-    instructions=SYSTEM_PROMPT_NEWS_ANALYST,
-    builtin_tools=[WebSearchTool()],
-    toolsets=[mcp_coingecko, mcp_reddit],
-)
+def reddit_server() -> "MCPServerStdio":
+    from pydantic_ai.mcp import MCPServerStdio
 
+    return MCPServerStdio("npx", args=["-y", "reddit-mcp-buddy"], id="reddit")
 
-if __name__ == "__main__":
-    SYMBOL = "Bitcoin"
-    user_prompt = (
-        f"Make a news sentiment search for {SYMBOL}",
+
+MCP_SERVER_FACTORIES = {"coingecko": coingecko_server, "reddit": reddit_server}
+
+
+@functools.cache
+def get_mcp_pool() -> MCPServerPool:
+    """
+    Process-wide pool of the news agent's MCP servers. A daemon can warm it up with
+    `await get_mcp_pool().start()` and should `close()` it on shutdown.
+    """
+    return MCPServerPool(MCP_SERVER_FACTORIES)
+
+
+@functools.cache
+def get_news_agent() -> "Agent[None, NewsOutput]":
+    """
+    The news analyst agent, built with telemetry on first use. Its MCP servers are
+    not part of the agent, runs lease them from a pool, see `run_news_analysis`.
+    """
+    from pydantic_ai import Agent
+    from pydantic_ai.builtin_tools import WebSearchTool
+
+    configure_telemetry("News agent")
+    return Agent(
+        model=Config.MODEL_VERSION_NEWS_AGENT,
+        instructions=SYSTEM_PROMPT_NEWS_ANALYST,
+        builtin_tools=[WebSearchTool()],
+        output_type=NewsOutput,
+    )
+
+
+def build_news_prompt(symbol: str) -> tuple:
+    return (
+        f"Make a news sentiment search for {symbol}",
         "Keep the analysis short and coinces. Your analysis will be used by trader later.",
     )
-    res = agent.run_sync(user_prompt)
-    print(res.output)
+
+
+def news_prompt_version() -> str:
+    """Changes with the model, instructions or prompt, so cached sentiment is not reused"""
+    return TTLCache.key(
+        Config.MODEL_VERSION_NEWS_AGENT,
+        SYSTEM_PROMPT_NEWS_ANALYST,
+        build_news_prompt("{symbol}"),
+        NewsOutput.model_json_schema(),
+    )[:12]
+
+
+@functools.cache
+def get_sentiment_cache() -> TTLCache:
+    return TTLCache(
+        Config.NEWS_CACHE_DIR / "sentiment",
+        ttl=Config.NEWS_SENTIMENT_TTL,
+        stale_ttl=Config.NEWS_SENTIMENT_STALE_TTL,
+    )
+
+
+@functools.cache
+def get_tool_cache() -> TTLCache:
+    """MCP tool results (trending coins, subreddit listings), shared by all symbols"""
+    return TTLCache(
+        Config.NEWS_CACHE_DIR / "tools",
+        ttl=Config.NEWS_TOOL_TTL,
+        stale_ttl=Config.NEWS_TOOL_STALE_TTL,
+    )
+
+
+async def run_news_analysis(
+    symbol: str,
+    pool: MCPServerPool | None = None,
+    as_of: datetime | None = None,
+    use_cache: bool = True,
+) -> NewsOutput:
+    """
+    News sentiment analysis of `symbol`, with MCP servers from `pool` (shared by
+    default). With `use_cache`, the analysis is cached per (symbol, day of `as_of`,
+    prompt version) and every MCP tool result on its own, see `Config.NEWS_*`.
+    """
+    from src.agents.utils.tool_cache import CachedToolset
+
+    async def analyse() -> NewsOutput:
+        async with (pool or get_mcp_pool()).lease() as servers:
+            if use_cache:
+                servers = [
+                    CachedToolset(server, cache=get_tool_cache()) for server in servers
+                ]
+            res = await get_news_agent().run(
+                build_news_prompt(symbol), toolsets=servers
+            )
+        return res.output
+
+    if not use_cache:
+        return await analyse()
+
+    async def analyse_json() -> dict:
+        return (await analyse()).model_dump(mode="json")
+
+    as_of = as_of or datetime.now(timezone.utc)
+    bucket = int(as_of.timestamp()) // Config.NEWS_CACHE_BUCKET_SECONDS
+    key = TTLCache.key(symbol, bucket, news_prompt_version())
+    return NewsOutput.model_validate(
+        await get_sentiment_cache().get_or_compute(key, analyse_json)
+    )
+
+
+@functools.cache
+def _legacy_server(name: str) -> "MCPServerStdio":
+    return MCP_SERVER_FACTORIES[name]()
+
+
+def __getattr__(name: str) -> Any:
+    # These used to be built at import. The old `agent` had the MCP servers attached,
+    # the pooled one has not, so fail loudly instead of running without them
+    if name == "agent":
+        raise AttributeError(
+            f"{__name__}.agent was removed, its MCP servers now come from a pool: "
+            "use run_news_analysis(symbol), or get_news_agent().run(..., toolsets=...)"
+        )
+    if name == "mcp_coingecko":
+        return _legacy_server("coingecko")
+    if name == "mcp_reddit":
+        return _legacy_server("reddit")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == "__main__":
+    SYMBOL = "Bitcoin"
+
+    async def main() -> NewsOutput:
+        try:
+            return await run_news_analysis(SYMBOL)
+        finally:
+            await get_sentiment_cache().drain()
+            await get_mcp_pool().close()
+
+    print(asyncio.run(main()))
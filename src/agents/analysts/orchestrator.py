@@ -0,0 +1,211 @@
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Awaitable, TypeVar
+from src.agents.analysts.models import (
+    BranchStatus,
+    NewsOutput,
+    TechOutput,
+    TradeDecision,
+)
+from src.agents.analysts.news_analyst import (
+    get_mcp_pool,
+    get_sentiment_cache,
+    run_news_analysis,
+)
+from src.agents.analysts.technical_analyst import (
+    prepare_tech_analysis_async,
+    run_tech_agent,
+)
+from src.agents.utils.mcp_pool import MCPServerPool
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Confidence (on the agent's 0-10 scale) added when the news agrees with the
+# technical direction, removed when it disagrees. Strongly opposed news vetoes the trade.
+NEWS_CONFIDENCE_WEIGHT = {"HIGH": 1.5, "MEDIUM": 1.0, "LOW": 0.5}
+NEWS_DIRECTION = {"BULLISH": 1, "BEARISH": -1, "NEUTRAL": 0}
+TECH_DIRECTION = {"LONG": 1, "SHORT": -1, "NO_TRADE": 0}
+
+
+async def run_branch(
+    name: str,
+    awaitable: Awaitable[T],
+    deadline: float,
+    branches: dict[str, BranchStatus],
+) -> T | None:
+    """
+    Await one branch of the decision within `deadline` seconds. A late or failing
+    branch is recorded in `branches` and gives None instead of raising.
+    """
+    start = time.perf_counter()
+    try:
+        async with asyncio.timeout(deadline):
+            result = await awaitable
+    except TimeoutError:
+        branches[name] = BranchStatus(
+            status="timeout", seconds=time.perf_counter() - start
+        )
+        logger.warning("Branch %s missed its %.0fs deadline", name, deadline)
+        return None
+    except Exception as exc:
+        branches[name] = BranchStatus(
+            status="error", seconds=time.perf_counter() - start, error=repr(exc)
+        )
+        logger.warning("Branch %s failed: %r", name, exc)
+        return None
+    branches[name] = BranchStatus(status="ok", seconds=time.perf_counter() - start)
+    return result
+
+
+def merge_decision(
+    symbol: str,
+    tech: TechOutput | None,
+    news: NewsOutput | None,
+    branches: dict[str, BranchStatus],
+) -> TradeDecision:
+    """
+    Final decision: the technical setup, with its confidence moved by the news
+    sentiment. No technical analysis means no trade, no news keeps the setup as is.
+    """
+    if tech is None or tech.decision == "NO_TRADE":
+        reason = "no technical analysis" if tech is None else "no technical setup"
+        return TradeDecision(
+            symbol=symbol,
+            decision="NO_TRADE",
+            confidence=0.0 if tech is None else tech.confidence,
+            entry=None,
+            stop_loss=None,
+            take_profit=[],
+            rationale=reason,
+            technical=tech,
+            news=news,
+            branches=branches,
+        )
+
+    decision, confidence = tech.decision, tech.confidence
+    if news is None:
+        rationale = "technical setup, news unavailable"
+    else:
+        agreement = TECH_DIRECTION[tech.decision] * NEWS_DIRECTION[news.sentiment]
+        weight = NEWS_CONFIDENCE_WEIGHT[news.confidence]
+        if agreement > 0:
+            confidence = min(confidence + weight, Config.TECH_CONFIDENCE_SCALE)
+            rationale = f"{news.sentiment.lower()} news confirms the setup"
+        elif agreement < 0 and news.confidence == "HIGH":
+            decision = "NO_TRADE"
+            rationale = (
+                f"{news.sentiment.lower()} news with high confidence vetoes the setup"
+            )
+        elif agreement < 0:
+            confidence = max(confidence - weight, 0.0)
+            rationale = f"{news.sentiment.lower()} news weakens the setup"
+        else:
+            rationale = "neutral news"
+    trade = decision != "NO_TRADE"
+    return TradeDecision(
+        symbol=symbol,
+        decision=decision,
+        confidence=confidence,
+        entry=tech.entry if trade else None,
+        stop_loss=tech.stop_loss if trade else None,
+        take_profit=tech.take_profit if trade else [],
+        rationale=rationale,
+        technical=tech,
+        news=news,
+        branches=branches,
+    )
+
+
+def news_query(symbol: str) -> str:
+    """Asset name for the news agent, e.g. BTCUSDT -> BTC"""
+    for quote in ("USDT", "USDC", "USD", "PERP"):
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[: -len(quote)]
+    return symbol
+
+
+async def decide(
+    symbol: str = Config.COIN,
+    end_date: int | None = None,
+    window: timedelta = timedelta(days=1),
+    output_dir: Path = Path("logs/decisions"),
+    pool: MCPServerPool | None = None,
+    data_deadline: float = Config.DECISION_DATA_DEADLINE,
+    tech_deadline: float = Config.DECISION_TECH_DEADLINE,
+    news_deadline: float = Config.DECISION_NEWS_DEADLINE,
+) -> TradeDecision:
+    """
+    Trade decision from the technical and news analysts run concurrently.
+
+    The news branch starts right away, next to the technical branch (candles of both
+    timeframes fetched and rendered in parallel threads, then the technical agent).
+    Each branch has its own deadline, so the decision takes as long as the slowest
+    branch within its deadline. A news search still running at its deadline keeps
+    filling the sentiment cache in the background for the next decision.
+    """
+    if end_date is None:
+        end_date = int(datetime.now(timezone.utc).timestamp() * 1000)
+    start_date = end_date - int(window.total_seconds() * 1000)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    branches: dict[str, BranchStatus] = {}
+
+    async def technical() -> TechOutput | None:
+        prepared = await run_branch(
+            "data",
+            prepare_tech_analysis_async(
+                symbol=symbol,
+                start_date=start_date,
+                end_date=end_date,
+                filepath=output_dir / f"{symbol}.png",
+                filepath_week=output_dir / f"{symbol}_week.png",
+            ),
+            data_deadline,
+            branches,
+        )
+        if prepared is None:
+            branches["technical"] = BranchStatus(status="skipped", seconds=0.0)
+            return None
+        return await run_branch(
+            "technical", run_tech_agent(*prepared), tech_deadline, branches
+        )
+
+    tech, news = await asyncio.gather(
+        technical(),
+        run_branch(
+            "news",
+            run_news_analysis(news_query(symbol), pool=pool),
+            news_deadline,
+            branches,
+        ),
+    )
+    return merge_decision(symbol, tech, news, branches)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Trade decision from the technical and news analysts"
+    )
+    parser.add_argument("symbol", nargs="?", default=Config.COIN)
+    args = parser.parse_args()
+
+    async def main() -> None:
+        try:
+            decision = await decide(args.symbol)
+            # Printed before shutting down, so late branches don't hold it back
+            print(decision.model_dump_json(indent=2), flush=True)
+        finally:
+            # A timed out news search still holds its MCP lease, it gets a bounded
+            # grace to fill the cache. Threads of a timed out data branch can't be
+            # interrupted, `asyncio.run` joins them once the bybit client gives up.
+            grace = Config.DECISION_SHUTDOWN_GRACE
+            await get_sentiment_cache().drain(timeout=grace)
+            await get_mcp_pool().close(timeout=grace)
+
+    asyncio.run(main())
@@ -0,0 +1,223 @@
+import argparse
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from src.agents.analysts.models import TechOutput
+from src.agents.analysts.technical_analyst import run_tech_analysis_async
+from src.agents.utils.candle_store import INTERVAL_MS, frame_to_candles
+from src.agents.utils.exchange_utils import get_coin_prices, get_linear_perpetuals
+from src.agents.utils.indicator_engine import IndicatorSpec, compute_panel
+from src.agents.utils.pattern_index import detect_pattern_events
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+SCREEN_PANEL = [IndicatorSpec("atr"), IndicatorSpec("ema", {"length": 50})]
+
+
+@dataclass
+class ScreenFeatures:
+    symbol: str
+    interval: str
+    volatility: float  # ATR in % of the close
+    trend_strength: float  # distance of the close from EMA 50, in ATRs
+    trend_direction: int  # 1 above EMA 50, -1 below
+    pattern_hits: int  # candlestick patterns on the last candles
+
+
+def screen_features(
+    symbol: str, interval: str, df: pd.DataFrame, pattern_candles: int = 3
+) -> ScreenFeatures | None:
+    """
+    Cheap pre-filter features of one symbol and interval, None when the ATR is
+    zero or undefined (flat or delisting contracts) and nothing can be scaled by it
+    """
+    panel = compute_panel(df, SCREEN_PANEL)
+    close = df["close"].iloc[-1]
+    atr = panel["ATRr_14"].iloc[-1]
+    if not (np.isfinite(atr) and atr > 0):
+        return None
+    distance = (close - panel["EMA_50"].iloc[-1]) / atr
+    candles = frame_to_candles(df)
+    events = detect_pattern_events(candles)
+    recent = events["timestamp"] >= candles["timestamp"][-pattern_candles]
+    return ScreenFeatures(
+        symbol=symbol,
+        interval=interval,
+        volatility=float(100 * atr / close),
+        trend_strength=float(abs(distance)),
+        trend_direction=int(np.sign(distance)),
+        pattern_hits=int(recent.sum()),
+    )
+
+
+def _screen_job(job: tuple[str, str, pd.DataFrame]) -> ScreenFeatures | None:
+    symbol, interval, df = job
+    if len(df) < Config.SCAN_LOOKBACK_CANDLES // 2:
+        return None  # recently listed, not enough history for the indicators
+    try:
+        return screen_features(symbol, interval, df)
+    except Exception:
+        # One bad frame must not abort the scan of the whole universe
+        logger.warning("Failed to screen %s", (symbol, interval), exc_info=True)
+        return None
+
+
+def fetch_universe(
+    symbols: list[str],
+    intervals: list[str],
+    end_date: int,
+    lookback_candles: int = Config.SCAN_LOOKBACK_CANDLES,
+    max_workers: int = Config.SCAN_FETCH_WORKERS,
+) -> dict[tuple[str, str], pd.DataFrame]:
+    """
+    Last `lookback_candles` candles of every (symbol, interval), fetched concurrently
+    over the pooled exchange connections. Failed fetches are logged and skipped.
+    """
+
+    def fetch(key: tuple[str, str]) -> pd.DataFrame:
+        symbol, interval = key
+        return get_coin_prices(
+            start_date=end_date - lookback_candles * INTERVAL_MS[interval],
+            end_date=end_date,
+            sampling_freq=interval,
+            symbol=symbol,
+        )
+
+    keys = [(symbol, interval) for symbol in symbols for interval in intervals]
+    frames = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {key: pool.submit(fetch, key) for key in keys}
+        for key, future in futures.items():
+            try:
+                frames[key] = future.result()
+            except Exception:
+                logger.warning("Failed to fetch candles for %s", key, exc_info=True)
+    return frames
+
+
+def screen_universe(
+    frames: dict[tuple[str, str], pd.DataFrame],
+    processes: int = Config.SCAN_PROCESSES,
+) -> pd.DataFrame:
+    """Pre-filter features for every fetched frame, one row per (symbol, interval)"""
+    jobs = [(symbol, interval, df) for (symbol, interval), df in frames.items()]
+    if processes <= 0:
+        results = [_screen_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            chunksize = max(1, len(jobs) // (4 * processes))
+            results = list(pool.map(_screen_job, jobs, chunksize=chunksize))
+    return pd.DataFrame([asdict(r) for r in results if r is not None])
+
+
+def rank_candidates(
+    features: pd.DataFrame, top_k: int = Config.SCAN_TOP_K
+) -> pd.DataFrame:
+    """
+    Score symbols by volatility, trend strength and fresh patterns.
+
+    Each feature is ranked across the universe (0-1 percentile) per interval, the
+    score is their mean over intervals, plus a bonus when all intervals trend the
+    same way.
+    """
+    if features.empty:
+        return features
+    by_interval = features.groupby("interval")
+    ranked = features.assign(
+        score=(
+            by_interval["volatility"].rank(pct=True)
+            + by_interval["trend_strength"].rank(pct=True)
+            + 0.5 * by_interval["pattern_hits"].rank(pct=True)
+        )
+    )
+    per_symbol = ranked.groupby("symbol").agg(
+        score=("score", "mean"),
+        volatility=("volatility", "mean"),
+        trend_strength=("trend_strength", "mean"),
+        pattern_hits=("pattern_hits", "sum"),
+        aligned=("trend_direction", lambda d: abs(d.sum()) == len(d)),
+    )
+    per_symbol["score"] += 0.5 * per_symbol["aligned"]
+    return per_symbol.sort_values("score", ascending=False).head(top_k)
+
+
+async def analyse_candidates(
+    symbols: list[str],
+    end_date: int,
+    output_dir: Path = Path("logs/scan"),
+    max_concurrency: int = 4,
+) -> dict[str, TechOutput]:
+    """Run the technical analyst on every candidate, failures are logged and skipped"""
+    semaphore = asyncio.Semaphore(max_concurrency)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    async def analyse(symbol: str) -> TechOutput:
+        async with semaphore:
+            return await run_tech_analysis_async(
+                symbol=symbol,
+                start_date=end_date - 24 * 60 * 60 * 1000,
+                end_date=end_date,
+                filepath=output_dir / f"{symbol}.png",
+                filepath_week=output_dir / f"{symbol}_week.png",
+            )
+
+    results = await asyncio.gather(
+        *(analyse(symbol) for symbol in symbols), return_exceptions=True
+    )
+    outputs = {}
+    for symbol, result in zip(symbols, results):
+        if isinstance(result, BaseException):
+            logger.warning("Analysis of %s failed: %r", symbol, result)
+        else:
+            outputs[symbol] = result
+    return outputs
+
+
+def run_scan(
+    symbols: list[str] | None = None,
+    intervals: list[str] = Config.SCAN_INTERVALS,
+    top_k: int = Config.SCAN_TOP_K,
+    analyse: bool = True,
+) -> tuple[pd.DataFrame, dict[str, TechOutput]]:
+    """
+    One scanning cycle: fetch candles for the universe, pre-filter it and run the
+    LLM analysis on the `top_k` best candidates only.
+
+    Args:
+        symbols: Universe to scan, all USDT linear perpetuals by default
+        intervals: Kline intervals every symbol is screened on
+        analyse: If False, only the ranking is computed
+
+    Returns:
+        Ranking of the top candidates and the analyst's output per candidate
+    """
+    if symbols is None:
+        symbols = get_linear_perpetuals()
+    end_date = int(datetime.now(timezone.utc).timestamp() * 1000)
+    frames = fetch_universe(symbols, intervals, end_date)
+    candidates = rank_candidates(screen_universe(frames), top_k)
+    outputs = {}
+    if analyse and not candidates.empty:
+        outputs = asyncio.run(analyse_candidates(list(candidates.index), end_date))
+    return candidates, outputs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", nargs="*", help="Default: all USDT perpetuals")
+    parser.add_argument("--top-k", type=int, default=Config.SCAN_TOP_K)
+    parser.add_argument("--no-analysis", action="store_true")
+    args = parser.parse_args()
+
+    candidates, outputs = run_scan(
+        symbols=args.symbols, top_k=args.top_k, analyse=not args.no_analysis
+    )
+    print(candidates)
+    for symbol, output in outputs.items():
+        print(symbol, output)
@@ -1,35 +1,70 @@
-import logfire
-from pydantic_ai import Agent, BinaryContent
-from pydantic_ai.models.anthropic import AnthropicModelSettings
+import argparse
+import asyncio
+import functools
+import pandas as pd
 from src.agents.analysts.prompts import SYSTEM_PROMPT_TECHNICAL_ANALYST
 from src.config import Config
-from src.agents.utils.tech_indicators import (
-    calculate_atr,
-    calculate_bollinger_bands,
-    calculate_ema,
-    calculate_macd,
-    calculate_obv,
-    calculate_rsi,
-    calculate_stochastic,
-    calculate_supertrend,
-    calculate_vwap,
-    calculate_cdl_pattern,
-)
 from pathlib import Path
-from src.agents.utils.exchange_utils import get_plot_and_save_ohlc
+from typing import TYPE_CHECKING, Any, Iterator
+from src.agents.utils.candle_stream import (
+    BybitKlineStream,
+    CandleFeed,
+    KlineSource,
+    ReplayKlineStream,
+    resample_frame,
+)
+from src.agents.utils.candle_store import DAY_MS, INTERVAL_MS, frame_to_candles
+from src.agents.utils.charts import render_ohlc_png, render_ohlc_pngs
+from src.agents.utils.exchange_utils import get_chart_title, get_coin_prices
 from datetime import datetime, timedelta, timezone
 from src.agents.analysts.models import TechOutput, AgentsDeps
-
-logfire.configure(service_name="Tech agent")
-logfire.instrument_pydantic_ai()
-settings = AnthropicModelSettings(
-    anthropic_thinking={"type": "enabled", "budget_tokens": 1024},
+from src.agents.utils.profiling import (
+    profile_stage,
+    prompt_cache_stats,
+    record_llm_usage,
 )
+from src.agents.utils.telemetry import configure_telemetry
+
+if TYPE_CHECKING:
+    from pydantic_ai import Agent
+    from pydantic_ai.models import Model
+    from src.agents.utils.prompt_cache import PromptCachingSettings
+
+
+def get_model_settings() -> "PromptCachingSettings":
+    """
+    Cache breakpoints on the static prefix of every request (tool schemas, then
+    system prompt) and on the conversation so far, so the charts sent with the
+    first request are read from the cache by the tool calling turns after it.
+    """
+    from src.agents.utils.prompt_cache import PromptCachingSettings
+
+    enabled = Config.ANTHROPIC_PROMPT_CACHE
+    return PromptCachingSettings(
+        anthropic_cache_tool_definitions=enabled,
+        anthropic_cache_instructions=enabled,
+        anthropic_cache_messages=enabled,
+    )
+
+
+def get_model() -> "Model | str":
+    model = Config.MODEL_VERSION_TECHANAL_AGENT
+    if Config.ANTHROPIC_PROMPT_CACHE and model.startswith("anthropic:"):
+        from src.agents.utils.prompt_cache import PromptCachingAnthropicModel
+
+        return PromptCachingAnthropicModel(model.removeprefix("anthropic:"))
+    return model
 
-agent = Agent(
-    model=Config.MODEL_VERSION_TECHANAL_AGENT,
-    instructions=SYSTEM_PROMPT_TECHNICAL_ANALYST,
-    tools=[
+
+@functools.cache
+def get_agent() -> "Agent[AgentsDeps, TechOutput]":
+    """
+    The technical analyst agent, built on first use together with its model,
+    tools (pandas-ta) and telemetry, so importing this module stays cheap.
+    """
+    from pydantic_ai import Agent, Tool
+    from src.agents.utils.llm_cache import cached_model
+    from src.agents.utils.tech_indicators import (
         calculate_atr,
         calculate_bollinger_bands,
         calculate_ema,
@@ -40,10 +75,217 @@ agent = Agent(
         calculate_supertrend,
         calculate_vwap,
         calculate_cdl_pattern,
-    ],
-    deps_type=AgentsDeps,
-    output_type=TechOutput,
-)
+        describe_payload,
+    )
+
+    configure_telemetry("Tech agent")
+    return Agent(
+        model=cached_model(get_model()),
+        model_settings=get_model_settings(),
+        instructions=SYSTEM_PROMPT_TECHNICAL_ANALYST,
+        tools=[
+            # Series tools describe their compact payload when it is enabled
+            *(
+                Tool(tool, prepare=describe_payload)
+                for tool in (
+                    calculate_atr,
+                    calculate_bollinger_bands,
+                    calculate_ema,
+                    calculate_macd,
+                    calculate_obv,
+                    calculate_rsi,
+                    calculate_stochastic,
+                    calculate_supertrend,
+                    calculate_vwap,
+                )
+            ),
+            calculate_cdl_pattern,
+        ],
+        deps_type=AgentsDeps,
+        output_type=TechOutput,
+    )
+
+
+def __getattr__(name: str) -> Any:
+    # `agent` and `settings` used to be built at import, keep them importable
+    if name == "agent":
+        return get_agent()
+    if name == "settings":
+        return get_model_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def build_user_prompt(
+    symbol: str,
+    chart: bytes,
+    chart_week: bytes,
+    indicators: dict[str, float] | None = None,
+) -> tuple:
+    """
+    `indicators` are current values to state in the prompt, e.g. the streaming
+    feed's, so the agent needs fewer tool calls. Without them the prompt (and its
+    LLM cache keys) is unchanged.
+    """
+    from pydantic_ai import BinaryContent
+
+    prompt = (
+        f"Make a technicall analysis for {symbol}.",
+        "Keep the analysis short and coinces. Your analysis will be used by trader later."
+        f"Use tools if needed to calculate indicators, timeframe is {Config.SAMPLING_FREQ}",
+        BinaryContent(data=chart, media_type="image/png"),
+        "For better context, check last 7 days of the price movements in a image below as well.",
+        BinaryContent(data=chart_week, media_type="image/png"),
+    )
+    values = {k: v for k, v in (indicators or {}).items() if v == v}  # not NaN
+    if values:
+        listed = ", ".join(f"{name}={value:.2f}" for name, value in values.items())
+        prompt += (f"Indicator values at the last closed candle: {listed}",)
+    return prompt
+
+
+def _save_and_build_prompt(
+    symbol: str,
+    df: pd.DataFrame,
+    chart: bytes,
+    df_week: pd.DataFrame,
+    chart_week: bytes,
+    filepath: Path,
+    filepath_week: Path,
+    indicators: dict[str, float] | None = None,
+) -> tuple[tuple, AgentsDeps]:
+    # Saved for the record only, the agent gets charts and candles from memory
+    with profile_stage("write_csv") as stage:
+        df.to_csv(filepath.with_suffix(".csv"))
+        filepath.write_bytes(chart)
+        df_week.to_csv(filepath_week.with_suffix(".csv"))
+        filepath_week.write_bytes(chart_week)
+        written = [filepath, filepath_week]
+        written += [path.with_suffix(".csv") for path in written]
+        stage["bytes"] = sum(path.stat().st_size for path in written)
+
+    with profile_stage("build_prompt", image_bytes=len(chart) + len(chart_week)):
+        user_prompt = build_user_prompt(
+            symbol, chart=chart, chart_week=chart_week, indicators=indicators
+        )
+        deps = AgentsDeps(df_candle_path=filepath.with_suffix(".csv"), df_candle=df)
+    return user_prompt, deps
+
+
+def prepare_tech_analysis(
+    symbol: str,
+    start_date: int,
+    end_date: int,
+    filepath: Path = Path("logs/pics/btc_tmp.png"),
+    filepath_week: Path = Path("logs/pics/btc_tmp_week.png"),
+    num_days_behind: int = 7,
+    df: pd.DataFrame | None = None,
+    df_week: pd.DataFrame | None = None,
+    indicators: dict[str, float] | None = None,
+    reuse_charts: bool = False,
+) -> tuple[tuple, AgentsDeps]:
+    """
+    Fetch candles, render the charts and build the user prompt for the agent.
+    `df` and `df_week` replace the fetch of the main timeframe and hourly candles,
+    e.g. with a streamed buffer, see `build_user_prompt` for `indicators`.
+    With `reuse_charts`, charts already saved at `filepath` and `filepath_week`
+    are sent instead of re-rendered (e.g. to match LLM cache seeds).
+    """
+    if df is None:
+        df = get_coin_prices(start_date=start_date, end_date=end_date, symbol=symbol)
+    if df_week is None:
+        df_week = get_coin_prices(
+            start_date=start_date - ((1000 * 60) * 60) * 24 * num_days_behind,
+            end_date=end_date,
+            sampling_freq="60",
+            symbol=symbol,
+        )
+    if reuse_charts and filepath.exists() and filepath_week.exists():
+        chart, chart_week = filepath.read_bytes(), filepath_week.read_bytes()
+    else:
+        with profile_stage("render_charts", rows=len(df) + len(df_week)) as stage:
+            chart, chart_week = render_ohlc_pngs(
+                [
+                    (df, get_chart_title(Config.SAMPLING_FREQ, symbol)),
+                    (df_week, get_chart_title("60", symbol)),
+                ]
+            )
+            stage["bytes"] = len(chart) + len(chart_week)
+    return _save_and_build_prompt(
+        symbol, df, chart, df_week, chart_week, filepath, filepath_week, indicators
+    )
+
+
+def _fetch_and_render(
+    symbol: str,
+    start_date: int,
+    end_date: int,
+    sampling_freq: str,
+    stored_chart: Path | None = None,
+) -> tuple[pd.DataFrame, bytes]:
+    """Candles and their chart, read from `stored_chart` when it was saved before"""
+    df = get_coin_prices(
+        start_date=start_date,
+        end_date=end_date,
+        sampling_freq=sampling_freq,
+        symbol=symbol,
+    )
+    if stored_chart is not None and stored_chart.exists():
+        return df, stored_chart.read_bytes()
+    with profile_stage("render_charts", rows=len(df)) as stage:
+        chart = render_ohlc_png(df, get_chart_title(sampling_freq, symbol))
+        stage["bytes"] = len(chart)
+    return df, chart
+
+
+async def prepare_tech_analysis_async(
+    symbol: str,
+    start_date: int,
+    end_date: int,
+    filepath: Path = Path("logs/pics/btc_tmp.png"),
+    filepath_week: Path = Path("logs/pics/btc_tmp_week.png"),
+    num_days_behind: int = 7,
+    reuse_charts: bool = False,
+) -> tuple[tuple, AgentsDeps]:
+    """
+    Async `prepare_tech_analysis`: each timeframe is fetched then rendered in its
+    own worker thread, so the two pipelines overlap.
+    """
+    (df, chart), (df_week, chart_week) = await asyncio.gather(
+        asyncio.to_thread(
+            _fetch_and_render,
+            symbol,
+            start_date,
+            end_date,
+            Config.SAMPLING_FREQ,
+            filepath if reuse_charts else None,
+        ),
+        asyncio.to_thread(
+            _fetch_and_render,
+            symbol,
+            start_date - ((1000 * 60) * 60) * 24 * num_days_behind,
+            end_date,
+            "60",
+            filepath_week if reuse_charts else None,
+        ),
+    )
+    return await asyncio.to_thread(
+        _save_and_build_prompt,
+        symbol,
+        df,
+        chart,
+        df_week,
+        chart_week,
+        filepath,
+        filepath_week,
+    )
+
+
+async def run_tech_agent(user_prompt: tuple, deps: AgentsDeps) -> TechOutput:
+    with profile_stage("llm_agent") as stage:
+        res = await get_agent().run(user_prompt, deps=deps)
+        stage.update(prompt_cache_stats(res.all_messages()))
+    record_llm_usage(res.all_messages())
+    return res.output
 
 
 def run_tech_analysis(
@@ -53,34 +295,143 @@ def run_tech_analysis(
     filepath: Path = Path("logs/pics/btc_tmp.png"),
     filepath_week: Path = Path("logs/pics/btc_tmp_week.png"),
     num_days_behind: int = 7,
+    df: pd.DataFrame | None = None,
+    df_week: pd.DataFrame | None = None,
+    indicators: dict[str, float] | None = None,
+    reuse_charts: bool = False,
 ) -> TechOutput:
-    get_plot_and_save_ohlc(filepath=filepath, start_date=start_date, end_date=end_date)
-    get_plot_and_save_ohlc(
-        start_date=start_date - ((1000 * 60) * 60) * 24 * num_days_behind,
+    user_prompt, deps = prepare_tech_analysis(
+        symbol=symbol,
+        start_date=start_date,
         end_date=end_date,
-        filepath=filepath_week,
-        sampling_freq="60",
+        filepath=filepath,
+        filepath_week=filepath_week,
+        num_days_behind=num_days_behind,
+        df=df,
+        df_week=df_week,
+        indicators=indicators,
+        reuse_charts=reuse_charts,
     )
+    with profile_stage("llm_agent") as stage:
+        res = get_agent().run_sync(user_prompt, deps=deps)
+        stage.update(prompt_cache_stats(res.all_messages()))
+    record_llm_usage(res.all_messages())
+    return res.output
 
-    user_prompt = (
-        f"Make a technicall analysis for {symbol}.",
-        "Keep the analysis short and coinces. Your analysis will be used by trader later."
-        f"Use tools if needed to calculate indicators, timeframe is {Config.SAMPLING_FREQ}",
-        BinaryContent(data=filepath.read_bytes(), media_type="image/png"),
-        "For better context, check last 7 days of the price movements in a image below as well.",
-        BinaryContent(data=filepath_week.read_bytes(), media_type="image/png"),
+
+async def run_tech_analysis_async(
+    symbol: str,
+    start_date: int,
+    end_date: int,
+    filepath: Path = Path("logs/pics/btc_tmp.png"),
+    filepath_week: Path = Path("logs/pics/btc_tmp_week.png"),
+    num_days_behind: int = 7,
+    reuse_charts: bool = False,
+) -> TechOutput:
+    """Async version of `run_tech_analysis`, data preparation runs in worker threads"""
+    user_prompt, deps = await prepare_tech_analysis_async(
+        symbol=symbol,
+        start_date=start_date,
+        end_date=end_date,
+        filepath=filepath,
+        filepath_week=filepath_week,
+        num_days_behind=num_days_behind,
+        reuse_charts=reuse_charts,
     )
-    res = agent.run_sync(
-        user_prompt, deps=AgentsDeps(df_candle_path=filepath.with_suffix(".csv"))
+    return await run_tech_agent(user_prompt, deps)
+
+
+def stream_tech_analysis(
+    source: KlineSource,
+    symbol: str = Config.COIN,
+    window: timedelta = timedelta(days=1),
+    seed: bool = True,
+    num_days_behind: int = 7,
+) -> Iterator[TechOutput]:
+    """
+    Run the analysis on every closed candle of a kline stream, with no REST call
+    per candle.
+
+    The main timeframe candles come from the feed's buffer, the hourly candles of
+    the weekly chart are resampled from it, and the feed's incremental indicator
+    values are stated in the prompt. With `seed`, the buffer is warmed up with the
+    last `window` plus `num_days_behind` days of candles from `get_coin_prices`
+    before the stream starts. Unseeded (e.g. a replay), candles are only buffered
+    until a full `window` has streamed, the indicator tools need that much history,
+    and the weekly chart covers the candles streamed so far.
+    """
+    import logfire
+
+    # Configures telemetry before the first candle is logged
+    get_agent()
+    step = INTERVAL_MS[Config.SAMPLING_FREQ]
+    window_ms = int(window.total_seconds() * 1000)
+    history_ms = window_ms + num_days_behind * DAY_MS
+    feed = CandleFeed(
+        source, capacity=max(Config.STREAM_BUFFER_SIZE, history_ms // step + 1)
     )
-    return res.output
+    if seed:
+        end_date = int(datetime.now(timezone.utc).timestamp() * 1000)
+        history = get_coin_prices(
+            start_date=end_date - history_ms, end_date=end_date, symbol=symbol
+        )
+        # The last candle from REST is still forming, the stream will close it
+        closed = history.iloc[:-1]
+        feed.seed(frame_to_candles(closed))
+    window_candles = window_ms // step
+    for candle in feed.run():
+        end_date = int(candle["timestamp"]) + step - 1
+        start_date = end_date - window_ms
+        frame = feed.buffer.to_frame()
+        week_start = pd.Timestamp(start_date - num_days_behind * DAY_MS, unit="ms")
+        indicators = feed.snapshot()
+        logfire.info(
+            "Candle closed at {timestamp}",
+            timestamp=int(candle["timestamp"]),
+            **indicators,
+        )
+        if len(frame) < window_candles:
+            logfire.info(
+                "Warming up, {num_candles}/{window_candles} candles buffered",
+                num_candles=len(frame),
+                window_candles=window_candles,
+            )
+            continue
+        yield run_tech_analysis(
+            symbol=symbol,
+            start_date=start_date,
+            end_date=end_date,
+            num_days_behind=num_days_behind,
+            df=frame.iloc[-window_candles:],
+            df_week=resample_frame(frame.loc[frame.index >= week_start], "60"),
+            indicators=indicators,
+        )
 
 
 if __name__ == "__main__":
-    SYMBOL = "BTCUSDT"
-    start_date = int(
-        (datetime.now(timezone.utc) - timedelta(days=1)).timestamp() * 1000
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--stream", action="store_true", help="Analyse on every closed candle"
+    )
+    parser.add_argument(
+        "--replay", type=Path, help="Replay a recorded kline stream instead"
     )
-    end_date = int(datetime.now(timezone.utc).timestamp() * 1000)
-    res = run_tech_analysis(symbol=SYMBOL, start_date=start_date, end_date=end_date)
-    print(res)
+    parser.add_argument("--record", type=Path, help="Record the live kline stream")
+    args = parser.parse_args()
+
+    SYMBOL = "BTCUSDT"
+    if args.stream or args.replay:
+        source = (
+            ReplayKlineStream(args.replay)
+            if args.replay
+            else BybitKlineStream(symbol=SYMBOL, record_path=args.record)
+        )
+        for res in stream_tech_analysis(source, symbol=SYMBOL, seed=not args.replay):
+            print(res)
+    else:
+        start_date = int(
+            (datetime.now(timezone.utc) - timedelta(days=1)).timestamp() * 1000
+        )
+        end_date = int(datetime.now(timezone.utc).timestamp() * 1000)
+        res = run_tech_analysis(symbol=SYMBOL, start_date=start_date, end_date=end_date)
+        print(res)
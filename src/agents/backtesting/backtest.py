@@ -1,133 +1,449 @@
-from src.agents.analysts.technical_analyst import run_tech_analysis
+from src.agents.analysts.prompts import SYSTEM_PROMPT_TECHNICAL_ANALYST
+from src.agents.analysts.technical_analyst import (
+    build_user_prompt,
+    run_tech_analysis,
+    run_tech_analysis_async,
+)
 from src.agents.utils.exchange_utils import get_coin_prices
+from src.agents.analysts.models import TechOutput
+from src.agents.backtesting.barriers import (
+    NOT_HIT,
+    OUTCOME_TARGET,
+    TieRule,
+    evaluate_barriers,
+)
+from src.agents.backtesting.baselines import run_baselines, summarize_baselines
+from src.agents.backtesting.portfolio import (
+    AccountingConfig,
+    confidence_report,
+    evaluate_configs,
+    replay_trades,
+    trade_pnl,
+)
+from src.agents.backtesting.sample_plan import (
+    Sample,
+    SamplePlan,
+    stratified_hit_rate,
+    stratified_plan,
+    uniform_plan,
+)
+from src.agents.utils.candle_store import DAY_MS, INTERVAL_MS
+from src.agents.utils.profiling import (
+    load_profiles,
+    profile_stage,
+    profiling,
+    stage_breakdown,
+    stage_percentiles,
+)
 from src.config import Config
 from tqdm import tqdm
-import random
+import argparse
+import asyncio
+import json
+import logging
+from typing import TYPE_CHECKING, Any
 from datetime import datetime
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
-random.seed(13)
+if TYPE_CHECKING:
+    from src.agents.utils.llm_cache import LLMResponseCache
 
+logger = logging.getLogger(__name__)
 
-def get_first_index_safely(indexes):
-    return indexes[0] if len(indexes) > 0 else None
+BACKTEST_START = datetime(2024, 1, 1, 0, 0, 0)
+BACKTEST_END = datetime(2025, 10, 1, 23, 59, 59)
+OUTCOME_DAYS = 4  # how long after the prediction the trade outcome is tracked
+SAMPLE_FOLDER_FORMAT = "%Y-%m-%d_%H:%M:%S"  # local time of the sample
 
 
-def run_test_tech_analyst(test_name: str, num_tests: int = 1):
+def score_prediction(
+    res: TechOutput, df: pd.DataFrame, tie_rule: TieRule = "stop_first"
+) -> dict:
+    """
+    Score agent's prediction against the candles following the entry.
+    Trade is profitable when TP1 is hit before the stop-loss, see `evaluate_barriers`.
+    """
+    side = {"LONG": 1, "SHORT": -1}.get(res.decision, 0)
+    take_profits = (res.take_profit + [np.nan] * 3)[:3]
+    hits = evaluate_barriers(
+        high=df["high"].to_numpy(),
+        low=df["low"].to_numpy(),
+        side=np.array([side]),
+        stop_loss=np.array([res.stop_loss]),
+        take_profits=np.array([take_profits]),
+        tie_rule=tie_rule,
+    )
+
+    def hit_time(idx):
+        return df.index[idx] if idx != NOT_HIT else None
+
+    return {
+        "timestamp_profit_1": hit_time(hits.take_profit[0, 0]),
+        "timestamp_profit_2": hit_time(hits.take_profit[0, 1]),
+        "timestamp_profit_3": hit_time(hits.take_profit[0, 2]),
+        "timestamp_loss": hit_time(hits.stop_loss[0]),
+        "trade_type": {1: "long", -1: "short"}.get(side, "no-trade"),
+        "timpestamps_open": df.index[0],
+        "open_price": float(df[["open", "close"]].iloc[0].mean()),
+        "take_profit_1": take_profits[0],
+        "take_profit_2": take_profits[1],
+        "take_profit_3": take_profits[2],
+        "stop_loss": res.stop_loss,
+        "confidence": res.confidence,
+        "risk_reward_ratio": res.risk_reward_ratio,
+        "profitable": bool(hits.outcome[0] == OUTCOME_TARGET),
+    }
+
+
+def sample_timestamps(num_tests: int, seed: int = 13) -> list[int]:
+    """Reproducible random sample timestamps (ms) from the backtest window"""
+    return uniform_plan(BACKTEST_START, BACKTEST_END, num_tests, seed).timestamps
+
+
+def make_stratified_plan(num_samples: int, seed: int = 13, **kwargs: Any) -> SamplePlan:
+    """`stratified_plan` over the hourly candles of the backtest window"""
+    df = get_coin_prices(
+        start_date=int(BACKTEST_START.timestamp() * 1000),
+        end_date=int(BACKTEST_END.timestamp() * 1000),
+        sampling_freq="60",
+    )
+    return stratified_plan(df, num_samples, seed=seed, **kwargs)
+
+
+def get_plan_path(test_name: str) -> Path:
+    return Path(f"logs/backtest/{test_name}/plan.json")
+
+
+def resolve_plan(
+    test_name: str, num_tests: int, plan: SamplePlan | None = None
+) -> SamplePlan:
+    """
+    Plan of a test: `plan` if given, else the plan saved by a previous run of the
+    test, else `num_tests` uniformly random samples. The plan is saved with the test.
+    """
+    path = get_plan_path(test_name)
+    if plan is None and path.exists():
+        return SamplePlan.load(path)
+    if plan is None:
+        plan = uniform_plan(BACKTEST_START, BACKTEST_END, num_tests)
+    plan.save(path)
+    return plan
+
+
+def get_sample_folder(test_name: str, timestamp: int) -> Path:
+    file_id = datetime.fromtimestamp(timestamp / 1000).strftime(SAMPLE_FOLDER_FORMAT)
+    return Path(f"logs/backtest/{test_name}/raw_results/{file_id}")
+
+
+def get_outcome_prices(timestamp: int) -> pd.DataFrame:
+    """Candles used to score a prediction made at `timestamp`"""
+    return get_coin_prices(
+        start_date=timestamp,
+        end_date=timestamp + ((1000 * 60) * 60) * 24 * OUTCOME_DAYS,
+    )
+
+
+def save_sample_result(
+    parent_folder: Path, res: TechOutput, score: dict, timestamp: int
+) -> None:
+    """
+    Save the prediction and its score. The score keeps the sample `timestamp` (ms),
+    the folder name is in local time and only to the second.
+    """
+    with open(parent_folder / "raw_agent_prediction.json", "w") as f:
+        f.write(res.model_dump_json(indent=2))
+    with open(parent_folder / "score.json", "w") as f:
+        json.dump({**score, "sample_timestamp": timestamp}, f, default=str, indent=2)
+
+
+def with_stratum(score: dict, sample: Sample) -> dict:
+    return {**score, "stratum": sample.stratum} if sample.stratum else score
+
+
+def save_test_results(test_results: list[dict], test_name: str):
+    df_res = pd.DataFrame(test_results)
+    path_df_res = Path(f"logs/backtest/{test_name}/raw_results/res.csv")
+    path_df_res.parent.mkdir(parents=True, exist_ok=True)
+    if "profitable" in df_res.columns:
+        df_res["profitable"] = df_res["profitable"].astype(object)
+    df_res.loc[df_res["trade_type"] == "no-trade", "profitable"] = pd.NA
+    df_res.to_csv(path_df_res)
+    return df_res, path_df_res
+
+
+def run_test_tech_analyst(
+    test_name: str, num_tests: int = 1, plan: SamplePlan | None = None
+):
     """
     Func to run the testing of the new agentic system
     test_name - MUST BE UNIQUE!
+    plan - samples to run, see `resolve_plan`
     """
-    start_date = datetime(2024, 1, 1, 0, 0, 0).timestamp()
-    end_date = datetime(2025, 10, 1, 23, 59, 59).timestamp()
     test_results = []
-    for i in tqdm(range(num_tests)):
-        # Generate random timestamp
-        random_timestamp = int(random.uniform(start_date, end_date) * 1000)
-        file_id = datetime.fromtimestamp(random_timestamp / 1000).strftime(
-            "%Y-%m-%d_%H:%M:%S"
-        )
-
-        parent_folder = Path(f"logs/backtest/{test_name}/raw_results/{file_id}")
+    for sample in tqdm(resolve_plan(test_name, num_tests, plan).samples):
+        random_timestamp = sample.timestamp
+        parent_folder = get_sample_folder(test_name, random_timestamp)
         parent_folder.mkdir(parents=True, exist_ok=True)
 
-        filepath = parent_folder / "1day.png"
-        filepath_week = parent_folder / "1week.png"
-        filepath_res = parent_folder / "raw_agent_prediction.json"
-
         res = run_tech_analysis(
             symbol=Config.COIN,
             start_date=random_timestamp - ((1000 * 60) * 60) * 24,
             end_date=random_timestamp,
-            filepath=filepath,
-            filepath_week=filepath_week,
+            filepath=parent_folder / "1day.png",
+            filepath_week=parent_folder / "1week.png",
+            reuse_charts=True,
         )
-        df = get_coin_prices(
-            start_date=random_timestamp,
-            end_date=random_timestamp + ((1000 * 60) * 60) * 24 * 4,
-        )
-        timestamp_profit_1 = None
-        timestamp_profit_2 = None
-        timestamp_profit_3 = None
-        timestamp_loss = None
-        timpestamps_open = df.index[0]
-        if res.decision == "SHORT":
-            timestamp_profit_1 = get_first_index_safely(
-                df.loc[df["low"] <= res.take_profit[0]].index
-            )
-            timestamp_profit_2 = get_first_index_safely(
-                df.loc[df["low"] <= res.take_profit[1]].index
-            )
-            timestamp_profit_3 = get_first_index_safely(
-                df.loc[df["low"] <= res.take_profit[2]].index
-            )
-            timestamp_loss = get_first_index_safely(
-                df.loc[df["high"] >= res.stop_loss].index
-            )
-            trade_type = "short"
-        elif res.decision == "LONG":
-            timestamp_profit_1 = get_first_index_safely(
-                df.loc[df["high"] >= res.take_profit[0]].index
-            )
-            timestamp_profit_2 = get_first_index_safely(
-                df.loc[df["high"] >= res.take_profit[1]].index
-            )
-            timestamp_profit_3 = get_first_index_safely(
-                df.loc[df["high"] >= res.take_profit[2]].index
+        score = score_prediction(res, get_outcome_prices(random_timestamp))
+        save_sample_result(parent_folder, res, score, random_timestamp)
+        test_results.append(with_stratum(score, sample))
+    return save_test_results(test_results, test_name)
+
+
+async def run_sample(
+    test_name: str,
+    timestamp: int,
+    sample_timeout: float,
+    max_retries: int,
+    profile: bool = False,
+) -> dict | None:
+    """
+    Run and score one sample, or read its saved score.
+    With `profile`, the stage timings of the run are saved to `profile.json`.
+    """
+    parent_folder = get_sample_folder(test_name, timestamp)
+    if profile:
+        with profiling(parent_folder.name) as sample_profile:
+            score = await run_sample(test_name, timestamp, sample_timeout, max_retries)
+        if sample_profile.stages:
+            sample_profile.save(parent_folder / "profile.json")
+        return score
+
+    filepath_score = parent_folder / "score.json"
+    filepath_res = parent_folder / "raw_agent_prediction.json"
+    if filepath_score.exists():
+        score = json.loads(filepath_score.read_text())
+        score.pop("sample_timestamp", None)  # results are keyed by the plan
+        return score
+    parent_folder.mkdir(parents=True, exist_ok=True)
+
+    for attempt in range(max_retries + 1):
+        try:
+            if filepath_res.exists():
+                # The agent finished before an interruption, only the scoring is missing
+                res = TechOutput.model_validate_json(filepath_res.read_text())
+            else:
+                res = await asyncio.wait_for(
+                    run_tech_analysis_async(
+                        symbol=Config.COIN,
+                        start_date=timestamp - ((1000 * 60) * 60) * 24,
+                        end_date=timestamp,
+                        filepath=parent_folder / "1day.png",
+                        filepath_week=parent_folder / "1week.png",
+                        # Seeds are keyed by the stored charts, see seed_llm_cache
+                        reuse_charts=True,
+                    ),
+                    timeout=sample_timeout,
+                )
+            df = await asyncio.to_thread(get_outcome_prices, timestamp)
+            with profile_stage("score_prediction"):
+                score = score_prediction(res, df)
+            save_sample_result(parent_folder, res, score, timestamp)
+            return json.loads(json.dumps(score, default=str))
+        except Exception as e:
+            logger.warning(
+                f"Sample {parent_folder.name} failed (attempt {attempt + 1}): {e!r}"
             )
-            timestamp_loss = get_first_index_safely(
-                df.loc[df["low"] <= res.stop_loss].index
+            if attempt < max_retries:
+                await asyncio.sleep(2**attempt)
+    return None
+
+
+async def run_test_tech_analyst_async(
+    test_name: str,
+    num_tests: int = 1,
+    max_concurrency: int = 8,
+    sample_timeout: float = 300,
+    max_retries: int = 2,
+    plan: SamplePlan | None = None,
+    profile: bool = False,
+):
+    """
+    Concurrent version of `run_test_tech_analyst`.
+
+    Up to `max_concurrency` samples run at once. Every sample is saved to its folder
+    as soon as it finishes, so an interrupted test can be resumed by calling this
+    again with the same `test_name`: samples already scored are skipped.
+    Samples failing after `max_retries` retries are left out of `res.csv` and
+    retried on the next call.
+    With `profile`, each newly run sample saves its stage timings, see
+    `write_profile_report`.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    samples = resolve_plan(test_name, num_tests, plan).samples
+
+    async def run_limited(sample: Sample) -> dict | None:
+        async with semaphore:
+            score = await run_sample(
+                test_name, sample.timestamp, sample_timeout, max_retries, profile
             )
-            trade_type = "long"
-        else:
-            trade_type = "no-trade"
-
-        test_results.append(
-            {
-                "timestamp_profit_1": timestamp_profit_1,
-                "timestamp_profit_2": timestamp_profit_2,
-                "timestamp_profit_3": timestamp_profit_3,
-                "timestamp_loss": timestamp_loss,
-                "trade_type": trade_type,
-                "timpestamps_open": timpestamps_open,
-                "open_price": float(
-                    df[
-                        [
-                            "open",
-                            "close",
-                        ]
-                    ]
-                    .iloc[0]
-                    .mean()
-                ),
-                "take_profit_1": res.take_profit[0],
-                "take_profit_2": res.take_profit[1],
-                "take_profit_3": res.take_profit[2],
-                "stop_loss": res.stop_loss,
-                "confidence": res.confidence,
-                "risk_reward_ratio": res.risk_reward_ratio,
-            }
+            return None if score is None else with_stratum(score, sample)
+
+    tasks = [asyncio.create_task(run_limited(sample)) for sample in samples]
+    with tqdm(total=len(tasks)) as progress:
+        for task in asyncio.as_completed(tasks):
+            await task
+            progress.update()
+    # Keep the samples order of the sync runner
+    test_results = [task.result() for task in tasks]
+    return save_test_results([r for r in test_results if r is not None], test_name)
+
+
+def seed_llm_cache(test_name: str, cache: "LLMResponseCache | None" = None) -> int:
+    """
+    Import stored `raw_agent_prediction.json` files of a test into the LLM cache,
+    so the test can be replayed with `LLM_CACHE_MODE=replay` without calling the model.
+    Seeds are keyed by the stored `1day.png`/`1week.png`, which the backtest sends
+    again instead of re-rendering them, so samples saved by any chart renderer
+    match. Returns the number of imported samples.
+    """
+    from src.agents.utils.llm_cache import LLMResponseCache
+
+    cache = cache or LLMResponseCache()
+    model_name = Config.MODEL_VERSION_TECHANAL_AGENT.split(":", 1)[-1]
+    num_seeds = 0
+    for filepath_res in Path(f"logs/backtest/{test_name}/raw_results").glob(
+        "*/raw_agent_prediction.json"
+    ):
+        parent_folder = filepath_res.parent
+        if not (parent_folder / "1day.png").exists():
+            continue
+        user_prompt = build_user_prompt(
+            Config.COIN,
+            chart=(parent_folder / "1day.png").read_bytes(),
+            chart_week=(parent_folder / "1week.png").read_bytes(),
         )
-        with open(filepath_res, "w") as f:
-            f.write(res.model_dump_json(indent=2))
-    df_res = pd.DataFrame(test_results)
-    df_res["profitable"] = df_res["timestamp_profit_1"] < df_res["timestamp_loss"]
-    path_df_res = parent_folder.parent / "res.csv"
-    df_res.loc[df_res["trade_type"] == "no-trade", "profitable"] = pd.NA
-    df_res.to_csv(path_df_res)
-    return df_res, path_df_res
+        cache.put_seed(
+            model_name,
+            SYSTEM_PROMPT_TECHNICAL_ANALYST,
+            user_prompt,
+            output=json.loads(filepath_res.read_text()),
+        )
+        num_seeds += 1
+    return num_seeds
 
 
 def analyze_test(path: Path):
     df = pd.read_csv(path, index_col=0)
     df_open_trades = df.loc[df["trade_type"] != "no-trade"]
     print(df_open_trades["profitable"].sum() / df_open_trades.shape[0])
+    plan_path = path.parent.parent / "plan.json"
+    if "stratum" in df.columns and plan_path.exists():
+        plan = SamplePlan.load(plan_path)
+        print(stratified_hit_rate(df, plan.strata_weights))
+
+
+def compare_with_baselines(test_name: str) -> pd.DataFrame:
+    """
+    Hit rates of the rule-based baselines deciding at the same sample timestamps
+    as the agent in test `test_name`, see `run_baselines`
+    """
+    timestamps = SamplePlan.load(get_plan_path(test_name)).timestamps
+    df = get_coin_prices(
+        start_date=min(timestamps) - 7 * DAY_MS,  # indicators warm-up
+        end_date=max(timestamps) + OUTCOME_DAYS * DAY_MS,
+    )
+    horizon = OUTCOME_DAYS * DAY_MS // INTERVAL_MS[Config.SAMPLING_FREQ]
+    return summarize_baselines(run_baselines(df, horizon, sample_timestamps=timestamps))
+
+
+def evaluate_portfolio(
+    test_name: str, configs: dict[str, AccountingConfig] | None = None
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Replay the trades of test `test_name` on the cached candles and account for
+    them with every config (default: `AccountingConfig()`).
+
+    Returns:
+        Risk metrics per config, and the confidence report of the first config
+    """
+    configs = configs or {"default": AccountingConfig()}
+    df_res = pd.read_csv(
+        Path(f"logs/backtest/{test_name}/raw_results/res.csv"), index_col=0
+    )
+    opened = pd.to_datetime(
+        df_res.loc[df_res["trade_type"] != "no-trade", "timpestamps_open"]
+    )
+    if opened.empty:
+        metrics = pd.DataFrame.from_dict(
+            {name: {"num_trades": 0} for name in configs}, orient="index"
+        )
+        return metrics, pd.DataFrame()
+    df = get_coin_prices(
+        start_date=int(opened.min().timestamp() * 1000),
+        end_date=int(opened.max().timestamp() * 1000) + OUTCOME_DAYS * DAY_MS,
+    )
+    horizon = OUTCOME_DAYS * DAY_MS // INTERVAL_MS[Config.SAMPLING_FREQ]
+    first = next(iter(configs.values()))
+    trades = replay_trades(df_res, df, horizon, first.tie_rule)
+    report = confidence_report(trade_pnl(trades, first))
+    return evaluate_configs(trades, configs), report
+
+
+def write_profile_report(test_name: str) -> pd.DataFrame:
+    """
+    Collect the `profile.json` of every sample of a test into
+    `logs/backtest/<test_name>/profile/`: stages.csv (seconds per sample and
+    stage), percentiles.csv, tools.csv (calls, payload and tokens per tool) and
+    counters.csv (LLM tokens and prompt cache usage per sample).
+    Returns the percentiles.
+    """
+    profiles = load_profiles(Path(f"logs/backtest/{test_name}/raw_results"))
+    if not profiles:
+        raise FileNotFoundError(f"No profiled samples for test {test_name}")
+    folder = Path(f"logs/backtest/{test_name}/profile")
+    folder.mkdir(parents=True, exist_ok=True)
+    breakdown = stage_breakdown(profiles)
+    breakdown.to_csv(folder / "stages.csv")
+    percentiles = stage_percentiles(breakdown)
+    percentiles.to_csv(folder / "percentiles.csv")
+    pd.DataFrame.from_dict(
+        {profile.name: profile.counters for profile in profiles}, orient="index"
+    ).to_csv(folder / "counters.csv")
+    tools = pd.DataFrame(
+        [
+            {"sample": profile.name, "tool": tool, **stats}
+            for profile in profiles
+            for tool, stats in profile.tools.items()
+        ]
+    )
+    if not tools.empty:
+        tools.groupby("tool")[["calls", "payload_chars", "input_tokens"]].sum().to_csv(
+            folder / "tools.csv"
+        )
+    return percentiles
 
 
 if __name__ == "__main__":
-    res, path_saved = run_test_tech_analyst(
-        num_tests=30, test_name="shorter_system_prompt"
+    parser = argparse.ArgumentParser(description="Backtest of the tech agent")
+    parser.add_argument("test_name", nargs="?", default="shorter_system_prompt")
+    parser.add_argument("--num-tests", type=int, default=30)
+    parser.add_argument(
+        "--profile", action="store_true", help="Save per-sample stage timings"
+    )
+    args = parser.parse_args()
+
+    res, path_saved = asyncio.run(
+        run_test_tech_analyst_async(
+            num_tests=args.num_tests, test_name=args.test_name, profile=args.profile
+        )
     )
     analyze_test(path_saved)
+    print(compare_with_baselines(args.test_name))
+    metrics, calibration = evaluate_portfolio(args.test_name)
+    print(metrics.T)
+    print(calibration, calibration.attrs)
+    if args.profile:
+        print(write_profile_report(args.test_name))
     print(res)
@@ -0,0 +1,111 @@
+from dataclasses import dataclass
+from typing import Literal
+import numpy as np
+
+TieRule = Literal["stop_first", "target_first", "ambiguous"]
+
+# Trade outcomes returned by `evaluate_barriers`
+OUTCOME_OPEN = 0  # neither the target nor the stop-loss was hit
+OUTCOME_TARGET = 1
+OUTCOME_STOP = -1
+OUTCOME_AMBIGUOUS = 2  # both hit within the same candle with tie_rule="ambiguous"
+NOT_HIT = -1
+
+
+@dataclass
+class BarrierHits:
+    """
+    First-hit candle indices for a batch of trades, `NOT_HIT` where never reached.
+
+    Attributes:
+        take_profit: (n_trades, n_targets) first candle reaching each take profit
+        stop_loss: (n_trades,) first candle reaching the stop-loss
+        outcome: (n_trades,) one of the OUTCOME_* codes for the chosen target
+    """
+
+    take_profit: np.ndarray
+    stop_loss: np.ndarray
+    outcome: np.ndarray
+
+
+def _first_hit(path: np.ndarray, levels: np.ndarray) -> np.ndarray:
+    """
+    First index along axis 1 where `path` reaches `levels` (path >= level).
+
+    Uses the running maximum, which is monotonic, so whether a level is ever
+    reached is read from the last column and `argmax` gives the first crossing.
+    """
+    running_max = np.fmax.accumulate(path, axis=1)
+    reached = running_max[:, :, None] >= levels[:, None, :]
+    first = reached.argmax(axis=1)
+    return np.where(reached[:, -1, :], first, NOT_HIT)
+
+
+def evaluate_barriers(
+    high: np.ndarray,
+    low: np.ndarray,
+    side: np.ndarray,
+    stop_loss: np.ndarray,
+    take_profits: np.ndarray,
+    tie_rule: TieRule = "stop_first",
+    target_index: int = 0,
+) -> BarrierHits:
+    """
+    Find first-hit times of stop-loss and every take-profit for many trades at once.
+
+    Args:
+        high: (n_trades, n_candles) highs of the price path following each entry,
+            or (n_candles,) when all trades share one path. Pad with NaN for
+            paths of different length.
+        low: Same shape as `high`
+        side: (n_trades,) +1 for long, -1 for short, 0 for no trade
+        stop_loss: (n_trades,) stop-loss levels
+        take_profits: (n_trades, n_targets) take-profit levels
+        tie_rule: How to resolve the stop-loss and the target being hit within
+            the same candle, where the intra-candle order is unknown:
+            "stop_first" counts it as a loss (conservative), "target_first" as
+            a win, "ambiguous" reports OUTCOME_AMBIGUOUS
+        target_index: Take-profit level used to decide the outcome. Default TP1
+
+    Returns:
+        BarrierHits with candle indices relative to the start of each path
+    """
+    side = np.asarray(side, dtype=np.float64)
+    stop_loss = np.asarray(stop_loss, dtype=np.float64)
+    take_profits = np.asarray(take_profits, dtype=np.float64)
+    if take_profits.ndim == 1:
+        take_profits = take_profits[:, None]
+    high = np.atleast_2d(np.asarray(high, dtype=np.float64))
+    low = np.atleast_2d(np.asarray(low, dtype=np.float64))
+    if high.shape[0] == 1 and len(side) != 1:
+        high = np.broadcast_to(high, (len(side), high.shape[1]))
+        low = np.broadcast_to(low, (len(side), low.shape[1]))
+
+    # Flip shorts, so both sides become "path >= level" searches:
+    # a long target is hit when high >= tp, a short target when -low >= -tp,
+    # a long stop is hit when -low >= -sl, a short stop when high >= sl
+    is_long = (side > 0)[:, None]
+    sign = np.where(side < 0, -1.0, 1.0)
+    favourable = np.where(is_long, high, -low)
+    adverse = np.where(is_long, -low, high)
+    tp_hits = _first_hit(favourable, take_profits * sign[:, None])
+    sl_hits = _first_hit(adverse, (-stop_loss * sign)[:, None])[:, 0]
+
+    no_trade = side == 0
+    tp_hits[no_trade] = NOT_HIT
+    sl_hits[no_trade] = NOT_HIT
+
+    target = tp_hits[:, target_index]
+    target_hit = target != NOT_HIT
+    stop_hit = sl_hits != NOT_HIT
+    both = target_hit & stop_hit
+    outcome = np.full(len(side), OUTCOME_OPEN, dtype=np.int8)
+    outcome[target_hit & (~stop_hit | (target < sl_hits))] = OUTCOME_TARGET
+    outcome[stop_hit & (~target_hit | (sl_hits < target))] = OUTCOME_STOP
+    ties = both & (target == sl_hits)
+    outcome[ties] = {
+        "stop_first": OUTCOME_STOP,
+        "target_first": OUTCOME_TARGET,
+        "ambiguous": OUTCOME_AMBIGUOUS,
+    }[tie_rule]
+    return BarrierHits(take_profit=tp_hits, stop_loss=sl_hits, outcome=outcome)
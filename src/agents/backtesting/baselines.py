@@ -0,0 +1,270 @@
+from typing import Callable
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from src.agents.analysts.models import TechOutput
+from src.agents.backtesting.barriers import (
+    NOT_HIT,
+    OUTCOME_TARGET,
+    TieRule,
+    evaluate_barriers,
+)
+from src.agents.utils.indicator_engine import IndicatorSpec, compute_panel
+from src.config import Config
+
+# A rule maps the indicator panel to a signal per candle: 1 long, -1 short, 0 nothing.
+# Signals are events (a flip, a cross) and are acted on at the close of their candle.
+SignalRule = Callable[[pd.DataFrame], np.ndarray]
+
+BASELINE_PANEL = [
+    IndicatorSpec("supertrend"),
+    IndicatorSpec("rsi"),
+    IndicatorSpec("macd"),
+    IndicatorSpec("atr"),
+]
+
+
+def _crosses(values: np.ndarray, level: np.ndarray | float) -> np.ndarray:
+    """1 where `values` crosses above `level`, -1 where it crosses below"""
+    above = values > level
+    prev_above = np.roll(above, 1)
+    valid = ~np.isnan(values) & ~np.isnan(np.roll(values, 1))
+    valid[0] = False
+    out = np.zeros(len(values), dtype=np.int8)
+    out[valid & above & ~prev_above] = 1
+    out[valid & ~above & prev_above] = -1
+    return out
+
+
+def supertrend_flip(panel: pd.DataFrame) -> np.ndarray:
+    """Follow the Supertrend direction on the candle where it flips"""
+    direction = panel["SUPERTd_10_3.0"].to_numpy()
+    prev = np.roll(direction, 1)
+    flip = (direction != prev) & ~np.isnan(direction) & ~np.isnan(prev)
+    flip[0] = False
+    return np.where(flip, direction, 0).astype(np.int8)
+
+
+def rsi_mean_reversion(panel: pd.DataFrame) -> np.ndarray:
+    """Long when RSI comes back above 30, short when it comes back below 70"""
+    rsi = panel["RSI_14"].to_numpy()
+    signal = np.zeros(len(rsi), dtype=np.int8)
+    signal[_crosses(rsi, 30.0) == 1] = 1
+    signal[_crosses(rsi, 70.0) == -1] = -1
+    return signal
+
+
+def macd_cross(panel: pd.DataFrame) -> np.ndarray:
+    """Long when MACD crosses above its signal line, short when below"""
+    return _crosses(panel["MACDh_12_26_9"].to_numpy(), 0.0)
+
+
+BASELINE_RULES: dict[str, SignalRule] = {
+    "supertrend_flip": supertrend_flip,
+    "rsi_mean_reversion": rsi_mean_reversion,
+    "macd_cross": macd_cross,
+}
+
+
+def make_decisions(
+    df: pd.DataFrame,
+    signal: np.ndarray,
+    atr: np.ndarray,
+    stop_atr: float = 1.5,
+    target_atr: tuple[float, float, float] = (1.5, 3.0, 4.5),
+    sample_timestamps: list[int] | None = None,
+    lookback: int = 96,
+) -> pd.DataFrame:
+    """
+    `TechOutput`-shaped decisions, entry at the close of the signal candle and
+    stop-loss/take-profits at ATR multiples from it.
+
+    Args:
+        sample_timestamps: If given, one decision per timestamp (ms) instead of one
+            per signal: the latest signal among the `lookback` candles closed before
+            the timestamp, NO_TRADE if there is none. This mirrors an LLM backtest.
+
+    Returns:
+        Frame with the `TechOutput` fields (take profits as take_profit_1..3), plus
+        `candle`, the position of the decision candle in `df`, and `path_start`, the
+        first candle of the outcome path
+    """
+    if sample_timestamps is None:
+        candle = np.flatnonzero(signal)
+        side = signal[candle].astype(np.int8)
+        path_start = candle + 1
+    else:
+        open_time = pd.DatetimeIndex(df.index).as_unit("ms").asi8
+        # Last candle closed at each sample time, the outcome path starts at the
+        # first candle opened at or after it, as in `get_outcome_prices`
+        close_time = open_time + (open_time[1] - open_time[0])
+        candle = np.searchsorted(close_time, sample_timestamps, side="right") - 1
+        path_start = np.searchsorted(open_time, sample_timestamps, side="left")
+        last_signal = np.where(signal != 0, np.arange(len(signal)), -1)
+        last_signal = np.maximum.accumulate(last_signal)[np.maximum(candle, 0)]
+        fresh = (candle >= 0) & (last_signal >= 0) & (candle - last_signal < lookback)
+        side = np.where(fresh, signal[np.maximum(last_signal, 0)], 0).astype(np.int8)
+        candle = np.maximum(candle, 0)
+
+    entry = df["close"].to_numpy()[candle]
+    risk = atr[candle]
+    side = np.where(np.isnan(risk), 0, side).astype(np.int8)
+    take_profits = entry[:, None] + side[:, None] * risk[:, None] * np.array(target_atr)
+    decisions = pd.DataFrame(
+        {
+            "candle": candle,
+            "path_start": path_start,
+            "decision": np.select([side > 0, side < 0], ["LONG", "SHORT"], "NO_TRADE"),
+            "confidence": Config.TECH_CONFIDENCE_SCALE / 2,
+            "entry": entry,
+            "stop_loss": entry - side * risk * stop_atr,
+            "take_profit_1": take_profits[:, 0],
+            "take_profit_2": take_profits[:, 1],
+            "take_profit_3": take_profits[:, 2],
+            "risk_reward_ratio": f"1:{target_atr[0] / stop_atr:g}",
+        },
+        index=pd.Index(
+            sample_timestamps if sample_timestamps is not None else df.index[candle],
+            name="timestamp",
+        ),
+    )
+    return decisions
+
+
+def to_tech_output(decision: pd.Series) -> TechOutput:
+    return TechOutput(
+        key_signals=[],
+        decision=decision["decision"],
+        confidence=decision["confidence"],
+        entry=decision["entry"],
+        stop_loss=decision["stop_loss"],
+        take_profit=[decision[f"take_profit_{i}"] for i in range(1, 4)],
+        risk_reward_ratio=decision["risk_reward_ratio"],
+        timeframe_alignment=False,
+    )
+
+
+def score_decisions(
+    df: pd.DataFrame,
+    decisions: pd.DataFrame,
+    horizon: int,
+    tie_rule: TieRule = "stop_first",
+    batch_size: int = 8192,
+) -> pd.DataFrame:
+    """
+    Score decisions as `score_prediction` does, on the `horizon` candles from each
+    decision's `path_start`. Paths are strided windows over the candle arrays,
+    materialized one batch at a time, so memory stays bounded on long histories.
+
+    Returns:
+        Frame with the `res.csv` columns of an LLM backtest
+    """
+    pad = np.full(horizon, np.nan)
+    high = np.concatenate((df["high"].to_numpy(dtype=np.float64), pad))
+    low = np.concatenate((df["low"].to_numpy(dtype=np.float64), pad))
+    high_paths = sliding_window_view(high, horizon)
+    low_paths = sliding_window_view(low, horizon)
+
+    start = decisions["path_start"].to_numpy()
+    side = decisions["decision"].map({"LONG": 1, "SHORT": -1}).fillna(0).to_numpy()
+    stop_loss = decisions["stop_loss"].to_numpy(dtype=np.float64)
+    take_profits = decisions[
+        ["take_profit_1", "take_profit_2", "take_profit_3"]
+    ].to_numpy(dtype=np.float64)
+
+    n = len(decisions)
+    tp_hits = np.full((n, 3), NOT_HIT)
+    sl_hits = np.full(n, NOT_HIT)
+    outcome = np.zeros(n, dtype=np.int8)
+    for lo in range(0, n, batch_size):
+        batch = slice(lo, lo + batch_size)
+        hits = evaluate_barriers(
+            high=high_paths[start[batch]],
+            low=low_paths[start[batch]],
+            side=side[batch],
+            stop_loss=stop_loss[batch],
+            take_profits=take_profits[batch],
+            tie_rule=tie_rule,
+        )
+        tp_hits[batch], sl_hits[batch], outcome[batch] = (
+            hits.take_profit,
+            hits.stop_loss,
+            hits.outcome,
+        )
+
+    index = df.index.append(pd.DatetimeIndex([pd.NaT]))  # NaT for "never hit"
+
+    def hit_time(hit: np.ndarray) -> pd.Index:
+        return index[np.where(hit == NOT_HIT, len(df), start + hit)]
+
+    open_price = np.append((df["open"].to_numpy() + df["close"].to_numpy()) / 2, np.nan)
+    profitable = pd.Series(outcome == OUTCOME_TARGET, dtype=object)
+    profitable[side == 0] = pd.NA
+    return pd.DataFrame(
+        {
+            "timestamp_profit_1": hit_time(tp_hits[:, 0]),
+            "timestamp_profit_2": hit_time(tp_hits[:, 1]),
+            "timestamp_profit_3": hit_time(tp_hits[:, 2]),
+            "timestamp_loss": hit_time(sl_hits),
+            "trade_type": np.select(
+                [side > 0, side < 0], ["long", "short"], "no-trade"
+            ),
+            "timpestamps_open": index[start],
+            "open_price": open_price[start],
+            "take_profit_1": take_profits[:, 0],
+            "take_profit_2": take_profits[:, 1],
+            "take_profit_3": take_profits[:, 2],
+            "stop_loss": stop_loss,
+            "confidence": decisions["confidence"].to_numpy(),
+            "risk_reward_ratio": decisions["risk_reward_ratio"].to_numpy(),
+            "profitable": profitable.to_numpy(),
+        },
+        index=decisions.index,
+    )
+
+
+def run_baselines(
+    df: pd.DataFrame,
+    horizon: int,
+    rules: dict[str, SignalRule] = BASELINE_RULES,
+    sample_timestamps: list[int] | None = None,
+    tie_rule: TieRule = "stop_first",
+    **decision_kwargs,
+) -> dict[str, pd.DataFrame]:
+    """
+    Simulate every rule over `df` and score its decisions.
+
+    Args:
+        df: Candles, e.g. the whole cached history from `get_coin_prices`
+        horizon: Candles after each decision the outcome is tracked for
+        sample_timestamps: Decide at these timestamps only (e.g. an LLM backtest's
+            plan) instead of at every signal, see `make_decisions`
+
+    Returns:
+        Scored decisions per rule name, in the `res.csv` format
+    """
+    panel = compute_panel(df, BASELINE_PANEL)
+    atr = panel["ATRr_14"].to_numpy()
+    results = {}
+    for name, rule in rules.items():
+        decisions = make_decisions(
+            df,
+            rule(panel),
+            atr,
+            sample_timestamps=sample_timestamps,
+            **decision_kwargs,
+        )
+        results[name] = score_decisions(df, decisions, horizon, tie_rule)
+    return results
+
+
+def summarize_baselines(results: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Number of trades and TP1-before-SL hit rate per rule, as in `analyze_test`"""
+    rows = {}
+    for name, res in results.items():
+        trades = res.loc[res["trade_type"] != "no-trade"]
+        rows[name] = {
+            "num_trades": len(trades),
+            "hit_rate": trades["profitable"].astype(float).mean(),
+        }
+    return pd.DataFrame.from_dict(rows, orient="index")
@@ -0,0 +1,305 @@
+import math
+from dataclasses import dataclass
+from typing import Literal
+import numpy as np
+import pandas as pd
+from src.agents.backtesting.barriers import NOT_HIT, TieRule, evaluate_barriers
+from src.config import Config
+
+Sizing = Literal["fixed", "risk"]
+
+
+@dataclass(frozen=True)
+class AccountingConfig:
+    """
+    Costs and sizing used to turn recorded trades into PnL.
+
+    Positions are sized on the initial capital (no compounding), so every trade's
+    PnL is independent of the others and all trades are evaluated at once.
+    """
+
+    initial_capital: float = 10_000.0
+    # "fixed": notional = position_fraction * capital
+    # "risk": notional such that the stop-loss costs risk_per_trade * capital
+    sizing: Sizing = "risk"
+    position_fraction: float = 1.0
+    risk_per_trade: float = 0.01
+    max_leverage: float = 5.0
+    # Bybit linear perpetual fees: market orders pay taker, TP limit orders maker
+    taker_fee: float = 0.00055
+    maker_fee: float = 0.0002
+    slippage: float = 0.0002  # adverse fraction of price on market orders
+    funding_rate: float = 0.0001  # per 8h, paid by longs and received by shorts
+    # Share of the position closed at TP1, TP2 and TP3, the rest at the stop or at
+    # the end of the holding horizon
+    exit_fractions: tuple[float, float, float] = (1 / 3, 1 / 3, 1 / 3)
+    tie_rule: TieRule = "stop_first"
+
+
+@dataclass
+class ReplayedTrades:
+    """
+    Opened trades of a backtest replayed on candles, independent of costs and sizing.
+
+    Attributes:
+        side: (n,) +1 long, -1 short
+        entry, stop_loss: (n,) prices
+        take_profits: (n, 3) prices, NaN where the agent gave fewer targets
+        tp_hits, sl_hits: first candle of each hit relative to the open, NOT_HIT if never
+        last_close: (n,) close of the last candle of the holding horizon
+        open_time: (n,) open timestamps
+        step: candle duration
+        confidence: (n,) agent's confidence as a fraction of its 0-10 scale, so it
+            compares to hit rates, NaN if not recorded
+    """
+
+    side: np.ndarray
+    entry: np.ndarray
+    stop_loss: np.ndarray
+    take_profits: np.ndarray
+    tp_hits: np.ndarray
+    sl_hits: np.ndarray
+    last_close: np.ndarray
+    horizon: np.ndarray
+    open_time: pd.DatetimeIndex
+    step: pd.Timedelta
+    confidence: np.ndarray
+
+
+def replay_trades(
+    df_res: pd.DataFrame,
+    candles: pd.DataFrame,
+    horizon: int,
+    tie_rule: TieRule = "stop_first",
+) -> ReplayedTrades:
+    """
+    Find every barrier hit of the opened trades of `res.csv` on `candles`.
+
+    Args:
+        df_res: Backtest results, as written by `save_test_results`
+        candles: Candles covering every trade's open plus `horizon` candles
+        horizon: Holding horizon in candles
+    """
+    trades = df_res.loc[df_res["trade_type"] != "no-trade"]
+    side = np.where(trades["trade_type"] == "long", 1.0, -1.0)
+    open_time = pd.DatetimeIndex(pd.to_datetime(trades["timpestamps_open"]))
+    open_idx = candles.index.searchsorted(open_time)
+
+    pad = np.full(horizon, np.nan)
+    high = np.concatenate((candles["high"].to_numpy(dtype=np.float64), pad))
+    low = np.concatenate((candles["low"].to_numpy(dtype=np.float64), pad))
+    close = np.concatenate((candles["close"].to_numpy(dtype=np.float64), pad))
+    windows = np.lib.stride_tricks.sliding_window_view
+    take_profits = trades[["take_profit_1", "take_profit_2", "take_profit_3"]].to_numpy(
+        dtype=np.float64
+    )
+    stop_loss = trades["stop_loss"].to_numpy(dtype=np.float64)
+    hits = evaluate_barriers(
+        high=windows(high, horizon)[open_idx],
+        low=windows(low, horizon)[open_idx],
+        side=side,
+        stop_loss=stop_loss,
+        take_profits=take_profits,
+        tie_rule=tie_rule,
+    )
+    # Trades near the end of the candles have shorter paths
+    available = np.minimum(horizon, len(candles) - open_idx)
+    last_close = close[open_idx + np.maximum(available, 1) - 1]
+    confidence = (
+        trades["confidence"].to_numpy(dtype=np.float64) / Config.TECH_CONFIDENCE_SCALE
+        if "confidence" in trades
+        else np.full(len(trades), np.nan)
+    )
+    return ReplayedTrades(
+        side=side,
+        entry=trades["open_price"].to_numpy(dtype=np.float64),
+        stop_loss=stop_loss,
+        take_profits=take_profits,
+        tp_hits=hits.take_profit,
+        sl_hits=hits.stop_loss,
+        last_close=last_close,
+        horizon=available,
+        open_time=open_time,
+        step=candles.index[1] - candles.index[0],
+        confidence=confidence,
+    )
+
+
+def trade_pnl(trades: ReplayedTrades, config: AccountingConfig) -> pd.DataFrame:
+    """
+    PnL of every trade with partial exits, fees, slippage and funding.
+
+    TP k closes `exit_fractions[k]` of the position if hit before the stop-loss
+    (ties follow `config.tie_rule`). Fractions of missing targets are spread over
+    the given ones. The rest is closed at the stop-loss, or at the last close of
+    the horizon if the stop is never hit.
+
+    Returns:
+        Frame per trade: notional, return (on notional, after costs), r_multiple,
+        pnl, fees, funding, won (TP1 before SL), open/exit time, hold_hours
+    """
+    side, entry = trades.side, trades.entry
+    sl_hit = trades.sl_hits != NOT_HIT
+    tp_valid = ~np.isnan(trades.take_profits)
+    fractions = np.asarray(config.exit_fractions) * tp_valid
+    total = fractions.sum(axis=1, keepdims=True)
+    fractions = np.divide(
+        fractions, total, out=np.zeros_like(fractions), where=total > 0
+    )
+
+    tp_hit = trades.tp_hits != NOT_HIT
+    before_stop = ~sl_hit[:, None] | (trades.tp_hits < trades.sl_hits[:, None])
+    if config.tie_rule == "target_first":
+        before_stop |= trades.tp_hits == trades.sl_hits[:, None]
+    filled = tp_hit & before_stop
+    filled_fraction = (fractions * filled).sum(axis=1)
+    remainder = 1.0 - filled_fraction
+
+    slip = config.slippage
+    entry_price = entry * (1 + side * slip)
+    tp_returns = side[:, None] * (trades.take_profits - entry_price[:, None])
+    tp_part = np.nansum(fractions * filled * tp_returns, axis=1) / entry_price
+    exit_price = np.where(sl_hit, trades.stop_loss, trades.last_close) * (
+        1 - side * slip
+    )
+    rest_part = remainder * side * (exit_price - entry_price) / entry_price
+    fees = (
+        config.taker_fee
+        + filled_fraction * config.maker_fee
+        + remainder * config.taker_fee
+    )
+
+    # The trade ends with its last exit: the stop, TP3 or the end of the horizon
+    tp_exit = np.where(filled, trades.tp_hits, -1).max(axis=1)
+    exit_idx = np.where(
+        remainder > 1e-12,
+        np.where(sl_hit, trades.sl_hits, trades.horizon - 1),
+        tp_exit,
+    )
+    hold_hours = (exit_idx + 1) * trades.step.total_seconds() / 3600
+    funding = -side * config.funding_rate * hold_hours / 8
+    returns = tp_part + rest_part - fees + funding
+
+    risk = np.abs(entry - trades.stop_loss) / entry
+    if config.sizing == "risk":
+        notional = config.risk_per_trade * config.initial_capital / risk
+    else:
+        notional = np.full(
+            len(entry), config.position_fraction * config.initial_capital
+        )
+    notional = np.minimum(notional, config.max_leverage * config.initial_capital)
+
+    exit_time = trades.open_time + pd.to_timedelta((exit_idx + 1) * trades.step)
+    return pd.DataFrame(
+        {
+            "open_time": trades.open_time,
+            "exit_time": exit_time,
+            "side": side,
+            "confidence": trades.confidence,
+            "notional": notional,
+            "return": returns,
+            "r_multiple": returns / risk,
+            "pnl": notional * returns,
+            "fees": notional * fees,
+            "funding": notional * funding,
+            "won": filled[:, 0],
+            "hold_hours": hold_hours,
+        }
+    )
+
+
+def equity_curve(pnl: pd.DataFrame, initial_capital: float) -> pd.Series:
+    """Equity after each realized trade, indexed by exit time"""
+    realized = pnl.sort_values("exit_time", kind="stable")
+    return pd.Series(
+        initial_capital + realized["pnl"].cumsum().to_numpy(),
+        index=pd.DatetimeIndex(realized["exit_time"]),
+        name="equity",
+    )
+
+
+def risk_metrics(pnl: pd.DataFrame, initial_capital: float) -> dict[str, float]:
+    """
+    Return, drawdown and risk-adjusted metrics of a trade list.
+    Sharpe and Sortino are annualized from daily realized PnL over initial capital.
+    """
+    if pnl.empty:
+        return {"num_trades": 0}
+    equity = equity_curve(pnl, initial_capital)
+    peak = np.maximum.accumulate(np.maximum(equity.to_numpy(), initial_capital))
+    drawdown = (equity.to_numpy() - peak) / peak
+    # Positions are sized on the initial capital, so are daily returns
+    daily_returns = (
+        pnl.groupby(pnl["exit_time"].dt.floor("1D"))["pnl"]
+        .sum()
+        .asfreq("1D", fill_value=0)
+        / initial_capital
+    )
+    std = daily_returns.std()
+    downside = np.sqrt((np.minimum(daily_returns, 0) ** 2).mean())
+    wins, losses = pnl.loc[pnl["pnl"] > 0, "pnl"], pnl.loc[pnl["pnl"] <= 0, "pnl"]
+
+    # Max number of positions open at the same time
+    events = pd.concat(
+        [
+            pd.Series(1, index=pnl["open_time"].to_numpy()),
+            pd.Series(-1, index=pnl["exit_time"].to_numpy()),
+        ]
+    ).sort_index(kind="stable")
+    return {
+        "num_trades": len(pnl),
+        "total_return": float(equity.iloc[-1] / initial_capital - 1),
+        "max_drawdown": float(drawdown.min()),
+        "sharpe": float(daily_returns.mean() / std * math.sqrt(365)) if std else 0.0,
+        "sortino": (
+            float(daily_returns.mean() / downside * math.sqrt(365)) if downside else 0.0
+        ),
+        "win_rate": float((pnl["pnl"] > 0).mean()),
+        "expectancy": float(pnl["pnl"].mean()),
+        "expectancy_r": float(pnl["r_multiple"].mean()),
+        "profit_factor": (
+            float(wins.sum() / -losses.sum()) if losses.sum() < 0 else math.inf
+        ),
+        "fees": float(pnl["fees"].sum()),
+        "funding": float(pnl["funding"].sum()),
+        "avg_hold_hours": float(pnl["hold_hours"].mean()),
+        "max_concurrent": int(events.cumsum().max()),
+    }
+
+
+def confidence_report(
+    pnl: pd.DataFrame, bins: tuple[float, ...] = (0, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+) -> pd.DataFrame:
+    """
+    Expectancy and calibration per bucket of the agent's `confidence` (0-1, see
+    `replay_trades`): a calibrated agent has a TP1-before-SL hit rate close to the
+    mean confidence of each bucket.
+    The Brier score of confidence vs outcome is in `attrs["brier"]`.
+    """
+    rated = pnl.dropna(subset=["confidence"])
+    bucket = pd.cut(rated["confidence"], bins=list(bins), include_lowest=True)
+    report = rated.groupby(bucket, observed=True).agg(
+        num_trades=("pnl", "size"),
+        mean_confidence=("confidence", "mean"),
+        hit_rate=("won", "mean"),
+        expectancy=("pnl", "mean"),
+        expectancy_r=("r_multiple", "mean"),
+    )
+    report["calibration_gap"] = report["hit_rate"] - report["mean_confidence"]
+    report.attrs["brier"] = float(
+        ((rated["confidence"] - rated["won"].astype(float)) ** 2).mean()
+    )
+    return report
+
+
+def evaluate_configs(
+    trades: ReplayedTrades, configs: dict[str, AccountingConfig]
+) -> pd.DataFrame:
+    """`risk_metrics` for several accounting variants of the same replayed trades"""
+    return pd.DataFrame.from_dict(
+        {
+            name: risk_metrics(trade_pnl(trades, config), config.initial_capital)
+            for name, config in configs.items()
+        },
+        orient="index",
+    )
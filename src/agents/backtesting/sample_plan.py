@@ -0,0 +1,230 @@
+import bisect
+import json
+import math
+import random
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Literal
+import numpy as np
+import pandas as pd
+from src.agents.utils.candle_store import DAY_MS
+
+HOUR_MS = 60 * 60 * 1000
+# Agent sees the 24h before a sample, the outcome is tracked for
+# `OUTCOME_DAYS` (backtest.py) after it
+ANALYSIS_WINDOW_MS = DAY_MS
+OUTCOME_WINDOW_MS = 4 * DAY_MS
+
+PlanMethod = Literal["uniform", "walk_forward", "stratified"]
+Allocation = Literal["equal", "proportional"]
+
+
+@dataclass
+class Sample:
+    timestamp: int  # ms, the moment the agent makes its prediction
+    stratum: str = ""
+
+
+@dataclass
+class SamplePlan:
+    """
+    Reproducible list of backtest samples, saved as JSON next to the test results.
+
+    `strata_weights` are the shares of each stratum in the whole candidate
+    population, used to reweight per-stratum hit rates into an unbiased estimate.
+    """
+
+    method: PlanMethod
+    seed: int
+    samples: list[Sample]
+    params: dict = field(default_factory=dict)
+    strata_weights: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def timestamps(self) -> list[int]:
+        return [sample.timestamp for sample in self.samples]
+
+    def shard(self, index: int, num_shards: int) -> "SamplePlan":
+        """Every `num_shards`-th sample starting at `index`, strata stay balanced"""
+        if not 0 <= index < num_shards:
+            raise ValueError(f"Shard index {index} not in [0, {num_shards})")
+        return SamplePlan(
+            method=self.method,
+            seed=self.seed,
+            samples=self.samples[index::num_shards],
+            params={**self.params, "shard": [index, num_shards]},
+            strata_weights=self.strata_weights,
+        )
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(asdict(self), indent=2))
+
+    @classmethod
+    def load(cls, path: Path) -> "SamplePlan":
+        data = json.loads(path.read_text())
+        data["samples"] = [Sample(**sample) for sample in data["samples"]]
+        return cls(**data)
+
+
+def _to_ms(date: datetime) -> int:
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return int(date.timestamp() * 1000)
+
+
+def _select_spaced(
+    candidates: list[int], selected: list[int], min_gap: int, limit: int
+) -> list[int]:
+    """
+    Take candidates in order while they are at least `min_gap` ms away from every
+    selected timestamp. `selected` is a sorted list updated in place.
+    """
+    taken = []
+    for timestamp in candidates:
+        if len(taken) >= limit:
+            break
+        pos = bisect.bisect_left(selected, timestamp)
+        if pos > 0 and timestamp - selected[pos - 1] < min_gap:
+            continue
+        if pos < len(selected) and selected[pos] - timestamp < min_gap:
+            continue
+        selected.insert(pos, timestamp)
+        taken.append(timestamp)
+    return taken
+
+
+def uniform_plan(
+    start: datetime, end: datetime, num_samples: int, seed: int = 13
+) -> SamplePlan:
+    """Uniformly random timestamps, as drawn by `sample_timestamps`"""
+    rng = random.Random(seed)
+    start_s, end_s = start.timestamp(), end.timestamp()
+    samples = [
+        Sample(int(rng.uniform(start_s, end_s) * 1000)) for _ in range(num_samples)
+    ]
+    return SamplePlan("uniform", seed, samples, {"num_samples": num_samples})
+
+
+def walk_forward_plan(
+    start: datetime,
+    end: datetime,
+    step: int = ANALYSIS_WINDOW_MS + OUTCOME_WINDOW_MS,
+    num_samples: int | None = None,
+) -> SamplePlan:
+    """
+    Samples every `step` ms from `start`, aligned to the hour. The default step puts
+    each analysis window right after the previous outcome window, so no candle is
+    used twice. With `num_samples`, the step is widened to spread that many samples.
+    """
+    first = (_to_ms(start) + ANALYSIS_WINDOW_MS) // HOUR_MS * HOUR_MS
+    last = _to_ms(end) - OUTCOME_WINDOW_MS
+    if num_samples is not None and num_samples > 1:
+        step = max(step, (last - first) // (num_samples - 1) // HOUR_MS * HOUR_MS)
+    samples = [Sample(ts) for ts in range(first, last + 1, step)][:num_samples]
+    return SamplePlan("walk_forward", 0, samples, {"step": step})
+
+
+def regime_labels(df: pd.DataFrame, window: int = 24) -> pd.DataFrame:
+    """
+    Regime of every candle from the `window` candles up to and including it.
+
+    Columns:
+        volatility: "low"/"mid"/"high" tercile of trailing realized volatility
+        trend: "down"/"flat"/"up", trailing return beyond +-0.5 trailing volatility
+        session: "asia"/"europe"/"us" (UTC 0-8, 8-16, 16-24), "weekend" on Sat/Sun
+    """
+    log_ret = np.log(df["close"]).diff()
+    vol = log_ret.rolling(window).std()
+    trailing_ret = log_ret.rolling(window).sum()
+    scaled = trailing_ret / (vol * math.sqrt(window))
+    labels = pd.DataFrame(index=df.index)
+    labels["volatility"] = pd.qcut(vol, 3, labels=["low", "mid", "high"]).astype(str)
+    labels["trend"] = np.select(
+        [scaled > 0.5, scaled < -0.5], ["up", "down"], default="flat"
+    )
+    hour = df.index.hour
+    session = np.select([hour < 8, hour < 16], ["asia", "europe"], default="us")
+    labels["session"] = np.where(df.index.dayofweek >= 5, "weekend", session)
+    return labels[vol.notna()]
+
+
+def stratified_plan(
+    df: pd.DataFrame,
+    num_samples: int,
+    seed: int = 13,
+    min_gap: int = ANALYSIS_WINDOW_MS + OUTCOME_WINDOW_MS,
+    allocation: Allocation = "equal",
+) -> SamplePlan:
+    """
+    Samples stratified by volatility regime, trend and weekday/session.
+
+    Candidates are the closes of the hourly candles in `df` that leave room for the
+    outcome window. Samples are drawn per stratum, and a candidate is skipped when
+    it is closer than `min_gap` ms to an already selected sample, so analysis and
+    outcome windows do not overlap with the default gap.
+
+    Args:
+        df: Hourly candles, as returned by `get_coin_prices(sampling_freq="60")`
+        allocation: "equal" gives every stratum the same number of samples (best
+            coverage of rare regimes), "proportional" follows the strata sizes
+
+    Returns:
+        Plan sorted by timestamp, with the population share of every stratum.
+        It has fewer than `num_samples` samples if the gap leaves no room for more.
+    """
+    labels = regime_labels(df)
+    # A sample is taken at the close of its candle
+    timestamps = pd.DatetimeIndex(labels.index).as_unit("ms").asi8 + HOUR_MS
+    last_allowed = timestamps[-1] - OUTCOME_WINDOW_MS
+    strata = labels["volatility"] + "|" + labels["trend"] + "|" + labels["session"]
+    population = pd.Series(timestamps, index=strata.to_numpy())
+    population = population[population <= last_allowed]
+    counts = population.index.value_counts().sort_index(kind="stable")
+    weights = (counts / counts.sum()).to_dict()
+
+    if allocation == "equal":
+        quotas = {s: num_samples // len(counts) for s in counts.index}
+        for s in list(counts.index)[: num_samples % len(counts)]:
+            quotas[s] += 1
+    else:
+        quotas = {s: round(num_samples * w) for s, w in weights.items()}
+
+    rng = random.Random(seed)
+    selected: list[int] = []
+    samples = []
+    # Smallest strata first, so the gap constraint does not starve rare regimes
+    for stratum in counts.sort_values(kind="stable").index:
+        candidates = population.loc[[stratum]].tolist()
+        rng.shuffle(candidates)
+        for ts in _select_spaced(candidates, selected, min_gap, quotas[stratum]):
+            samples.append(Sample(ts, stratum))
+    samples.sort(key=lambda sample: sample.timestamp)
+    params = {"num_samples": num_samples, "min_gap": min_gap, "allocation": allocation}
+    return SamplePlan("stratified", seed, samples, params, weights)
+
+
+def stratified_hit_rate(
+    df_res: pd.DataFrame, strata_weights: dict[str, float]
+) -> dict[str, float]:
+    """
+    Hit rate of opened trades reweighted by stratum population shares, with its
+    standard error. Strata without opened trades are left out and the remaining
+    weights renormalized.
+    """
+    trades = df_res.loc[df_res["trade_type"] != "no-trade"]
+    profitable = trades["profitable"].astype(float)
+    per_stratum = profitable.groupby(trades["stratum"]).agg(["mean", "count"])
+    weights = per_stratum.index.map(strata_weights).to_series(index=per_stratum.index)
+    weights = weights.fillna(0) / weights.fillna(0).sum()
+    rate = float((weights * per_stratum["mean"]).sum())
+    variance = (
+        weights**2 * per_stratum["mean"] * (1 - per_stratum["mean"])
+    ) / per_stratum["count"]
+    return {
+        "hit_rate": rate,
+        "std_error": float(math.sqrt(variance.sum())),
+        "num_trades": int(per_stratum["count"].sum()),
+        "num_strata": len(per_stratum),
+    }
@@ -0,0 +1,200 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import pandas as pd
+from tqdm import tqdm
+from src.agents.backtesting.backtest import (
+    BACKTEST_END,
+    BACKTEST_START,
+    analyze_test,
+    get_plan_path,
+    make_stratified_plan,
+    resolve_plan,
+    run_sample,
+    save_test_results,
+    with_stratum,
+)
+from src.agents.backtesting.sample_plan import SamplePlan, uniform_plan
+
+logger = logging.getLogger(__name__)
+
+# Sharded tests only coordinate through files under `logs/backtest/<test_name>/`:
+# plan.json is written once (`plan` refuses to replace it without --force), then
+# every shard appends to its own JSONL file.
+
+
+def get_shards_folder(test_name: str) -> Path:
+    return Path(f"logs/backtest/{test_name}/shards")
+
+
+def get_shard_path(test_name: str, index: int, num_shards: int) -> Path:
+    return get_shards_folder(test_name) / f"shard-{index:03d}-of-{num_shards:03d}.jsonl"
+
+
+def read_shard(path: Path) -> list[dict]:
+    """Records of a shard file, a partially written last line is ignored"""
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping truncated record in {path}")
+    return records
+
+
+def _terminate_last_line(path: Path) -> None:
+    """Terminate a line cut by a crash, so the next record starts on its own line"""
+    with open(path, "rb+") as f:
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+
+async def run_shard(
+    test_name: str,
+    index: int,
+    num_shards: int,
+    max_concurrency: int = 8,
+    sample_timeout: float = 300,
+    max_retries: int = 2,
+) -> Path:
+    """
+    Run shard `index` of `num_shards` of a test whose plan is already saved.
+
+    Each scored sample is appended to the shard file as soon as it is done, so the
+    shard can be killed and restarted at any time: samples already in the file are
+    skipped. Returns the shard file path.
+    """
+    plan_path = get_plan_path(test_name)
+    if not plan_path.exists():
+        raise FileNotFoundError(f"No plan for test {test_name}, create it first")
+    shard = SamplePlan.load(plan_path).shard(index, num_shards)
+    path = get_shard_path(test_name, index, num_shards)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    done = (
+        {record["sample_timestamp"] for record in read_shard(path)}
+        if path.exists()
+        else set()
+    )
+    samples = [s for s in shard.samples if s.timestamp not in done]
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    if path.exists():
+        _terminate_last_line(path)
+
+    with open(path, "a") as f:
+
+        async def run_limited(sample) -> None:
+            async with semaphore:
+                score = await run_sample(
+                    test_name, sample.timestamp, sample_timeout, max_retries
+                )
+            if score is None:
+                return
+            record = {
+                "sample_timestamp": sample.timestamp,
+                **with_stratum(score, sample),
+            }
+            # One write per record, flushed, so other nodes never see half a shard
+            f.write(json.dumps(record, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        tasks = [asyncio.create_task(run_limited(sample)) for sample in samples]
+        with tqdm(total=len(tasks), desc=f"shard {index}/{num_shards}") as progress:
+            for task in asyncio.as_completed(tasks):
+                await task
+                progress.update()
+    return path
+
+
+def _run_shard_process(args: tuple[str, int, int, int]) -> Path:
+    test_name, index, num_shards, max_concurrency = args
+    return asyncio.run(
+        run_shard(test_name, index, num_shards, max_concurrency=max_concurrency)
+    )
+
+
+def run_local_shards(
+    test_name: str, num_shards: int, max_concurrency: int = 8
+) -> list[Path]:
+    """Run every shard of a test in its own worker process on this machine"""
+    jobs = [(test_name, i, num_shards, max_concurrency) for i in range(num_shards)]
+    with ProcessPoolExecutor(max_workers=num_shards) as pool:
+        return list(pool.map(_run_shard_process, jobs))
+
+
+def merge_shards(test_name: str) -> tuple[pd.DataFrame, Path]:
+    """
+    Build `res.csv` from all shard files of a test, in plan order.
+    A sample found in several shard files (e.g. after re-sharding) is kept once.
+    """
+    plan = SamplePlan.load(get_plan_path(test_name))
+    records: dict[int, dict] = {}
+    for path in sorted(get_shards_folder(test_name).glob("*.jsonl")):
+        for record in read_shard(path):
+            records[record.pop("sample_timestamp")] = record
+    missing = [ts for ts in plan.timestamps if ts not in records]
+    if missing:
+        logger.warning(f"{len(missing)} samples of {test_name} have no result yet")
+    results = [records[ts] for ts in plan.timestamps if ts in records]
+    return save_test_results(results, test_name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded backtest of the tech agent")
+    parser.add_argument("test_name")
+    commands = parser.add_subparsers(dest="command", required=True)
+    plan_cmd = commands.add_parser("plan", help="Create and save the sample plan")
+    plan_cmd.add_argument("--num-tests", type=int, required=True)
+    plan_cmd.add_argument("--stratified", action="store_true")
+    plan_cmd.add_argument("--seed", type=int, default=13)
+    plan_cmd.add_argument(
+        "--force",
+        action="store_true",
+        help="Replace an existing plan, shard results of the old plan are kept",
+    )
+    shard_cmd = commands.add_parser("shard", help="Run one shard (e.g. on one node)")
+    shard_cmd.add_argument("--index", type=int, required=True)
+    shard_cmd.add_argument("--num-shards", type=int, required=True)
+    shard_cmd.add_argument("--max-concurrency", type=int, default=8)
+    local_cmd = commands.add_parser("local", help="Run all shards on this machine")
+    local_cmd.add_argument("--num-shards", type=int, required=True)
+    local_cmd.add_argument("--max-concurrency", type=int, default=8)
+    commands.add_parser("merge", help="Merge shard results and analyze them")
+    args = parser.parse_args()
+
+    if args.command == "plan":
+        if get_plan_path(args.test_name).exists() and not args.force:
+            parser.error(
+                f"{get_plan_path(args.test_name)} exists and shards may be using it, "
+                "pass --force to replace it"
+            )
+        if args.stratified:
+            plan = make_stratified_plan(args.num_tests, seed=args.seed)
+        else:
+            plan = uniform_plan(
+                BACKTEST_START, BACKTEST_END, args.num_tests, seed=args.seed
+            )
+        plan = resolve_plan(args.test_name, args.num_tests, plan)
+        print(f"Saved plan with {len(plan.samples)} samples")
+    elif args.command == "shard":
+        asyncio.run(
+            run_shard(
+                args.test_name,
+                args.index,
+                args.num_shards,
+                max_concurrency=args.max_concurrency,
+            )
+        )
+    elif args.command == "local":
+        run_local_shards(args.test_name, args.num_shards, args.max_concurrency)
+    else:
+        _, path_saved = merge_shards(args.test_name)
+        analyze_test(path_saved)
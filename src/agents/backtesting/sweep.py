@@ -0,0 +1,228 @@
+import argparse
+import itertools
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from src.agents.analysts.models import TechOutput
+from src.agents.backtesting.backtest import OUTCOME_DAYS, SAMPLE_FOLDER_FORMAT
+from src.agents.backtesting.portfolio import (
+    AccountingConfig,
+    replay_trades,
+    risk_metrics,
+    trade_pnl,
+)
+from src.agents.utils.candle_store import DAY_MS, INTERVAL_MS
+from src.agents.utils.exchange_utils import get_coin_prices
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SweepGrid:
+    """
+    Transformations of the stored predictions, every combination is one grid cell.
+
+    Attributes:
+        sl_scale: Multiplier of the entry to stop-loss distance
+        tp_scale: Multiplier of the entry to take-profit distances
+        min_confidence: Only trades with at least this confidence are taken, as a
+            fraction of the agent's 0-10 scale (0.7 keeps confidences of 7 and up)
+        horizon_days: How long after the prediction the trade is held at most
+    """
+
+    sl_scale: tuple[float, ...] = (1.0,)
+    tp_scale: tuple[float, ...] = (1.0,)
+    min_confidence: tuple[float, ...] = (0.0,)
+    horizon_days: tuple[float, ...] = (OUTCOME_DAYS,)
+
+    def __len__(self) -> int:
+        return (
+            len(self.sl_scale)
+            * len(self.tp_scale)
+            * len(self.min_confidence)
+            * len(self.horizon_days)
+        )
+
+
+def load_predictions(test_name: str) -> pd.DataFrame:
+    """
+    Stored `TechOutput` predictions of a test as columns: timestamp (ms), side,
+    confidence, entry, stop_loss, take_profit_1..3 (NaN where not given).
+    """
+    rows = []
+    for path in sorted(
+        Path(f"logs/backtest/{test_name}/raw_results").glob(
+            "*/raw_agent_prediction.json"
+        )
+    ):
+        res = TechOutput.model_validate_json(path.read_text())
+        take_profits = (res.take_profit + [np.nan] * 3)[:3]
+        rows.append(
+            {
+                "timestamp": _sample_timestamp(path.parent),
+                "side": {"LONG": 1, "SHORT": -1}.get(res.decision, 0),
+                "confidence": res.confidence,
+                "entry": res.entry,
+                "stop_loss": res.stop_loss,
+                "take_profit_1": take_profits[0],
+                "take_profit_2": take_profits[1],
+                "take_profit_3": take_profits[2],
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def _sample_timestamp(folder: Path) -> int:
+    """Sample timestamp (ms) saved with the score of a sample folder"""
+    score_path = folder / "score.json"
+    if score_path.exists():
+        score = json.loads(score_path.read_text())
+        if "sample_timestamp" in score:
+            return int(score["sample_timestamp"])
+    # Samples saved before the timestamp was kept: the folder name is in the local
+    # time of the machine that wrote it, this one is assumed
+    logger.warning(f"No sample_timestamp in {score_path}, using the folder name")
+    timestamp = datetime.strptime(folder.name, SAMPLE_FOLDER_FORMAT)
+    return int(timestamp.timestamp() * 1000)
+
+
+def to_results(
+    predictions: pd.DataFrame,
+    candles: pd.DataFrame,
+    sl_scale: float = 1.0,
+    tp_scale: float = 1.0,
+) -> pd.DataFrame:
+    """
+    Opened trades of `predictions` in the `res.csv` columns used by `replay_trades`,
+    with stop-loss and take-profit distances from the agent's entry scaled.
+    The trade opens on the first candle at or after the prediction, as in
+    `score_prediction`.
+    """
+    trades = predictions.loc[predictions["side"] != 0]
+    open_time = pd.DatetimeIndex(candles.index).as_unit("ms").asi8
+    start = np.searchsorted(open_time, trades["timestamp"].to_numpy(), side="left")
+    start = np.minimum(start, len(candles) - 1)
+    first_price = (candles["open"].to_numpy() + candles["close"].to_numpy()) / 2
+    entry = trades["entry"].to_numpy()
+    tp_columns = ["take_profit_1", "take_profit_2", "take_profit_3"]
+    take_profits = entry[:, None] + tp_scale * (
+        trades[tp_columns].to_numpy() - entry[:, None]
+    )
+    return pd.DataFrame(
+        {
+            "trade_type": np.where(trades["side"] > 0, "long", "short"),
+            "timpestamps_open": candles.index[start],
+            "open_price": first_price[start],
+            **dict(zip(tp_columns, take_profits.T)),
+            "stop_loss": entry + sl_scale * (trades["stop_loss"].to_numpy() - entry),
+            "confidence": trades["confidence"].to_numpy(),
+        }
+    )
+
+
+def _evaluate_cells(
+    job: tuple[pd.DataFrame, pd.DataFrame, float, float, SweepGrid, AccountingConfig],
+) -> list[dict]:
+    """Cells of one (sl_scale, tp_scale) pair, replaying once per horizon"""
+    predictions, candles, sl_scale, tp_scale, grid, config = job
+    df_res = to_results(predictions, candles, sl_scale, tp_scale)
+    step = INTERVAL_MS[Config.SAMPLING_FREQ]
+    rows = []
+    for horizon_days in grid.horizon_days:
+        horizon = max(1, int(horizon_days * DAY_MS // step))
+        trades = replay_trades(df_res, candles, horizon, config.tie_rule)
+        pnl = trade_pnl(trades, config)
+        for min_confidence in grid.min_confidence:
+            taken = pnl.loc[pnl["confidence"].fillna(1.0) >= min_confidence]
+            rows.append(
+                {
+                    "sl_scale": sl_scale,
+                    "tp_scale": tp_scale,
+                    "min_confidence": min_confidence,
+                    "horizon_days": horizon_days,
+                    "hit_rate": float(taken["won"].mean()) if len(taken) else np.nan,
+                    **risk_metrics(taken, config.initial_capital),
+                }
+            )
+    return rows
+
+
+def sweep_predictions(
+    predictions: pd.DataFrame,
+    candles: pd.DataFrame,
+    grid: SweepGrid,
+    config: AccountingConfig = AccountingConfig(),
+    processes: int = 0,
+) -> pd.DataFrame:
+    """
+    Metrics of every grid cell over all stored predictions.
+
+    Each (sl_scale, tp_scale) pair replays all trades at once on `candles` for each
+    horizon; confidence thresholds only filter the replayed trades. With
+    `processes` > 0, the pairs are evaluated in a process pool.
+
+    Returns:
+        One row per grid cell: the cell parameters, `hit_rate` (TP1 before SL, as
+        `profitable` in `res.csv`) and the `risk_metrics` of the taken trades
+    """
+    jobs = [
+        (predictions, candles, sl_scale, tp_scale, grid, config)
+        for sl_scale, tp_scale in itertools.product(grid.sl_scale, grid.tp_scale)
+    ]
+    if processes > 0 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            parts = list(pool.map(_evaluate_cells, jobs))
+    else:
+        parts = [_evaluate_cells(job) for job in jobs]
+    return pd.DataFrame([row for part in parts for row in part])
+
+
+def sweep_test(
+    test_name: str,
+    grid: SweepGrid,
+    config: AccountingConfig = AccountingConfig(),
+    processes: int = 0,
+) -> tuple[pd.DataFrame, Path]:
+    """`sweep_predictions` of a test, saved to `logs/backtest/<test_name>/sweep.csv`"""
+    predictions = load_predictions(test_name)
+    if predictions.empty:
+        raise FileNotFoundError(f"No stored predictions for test {test_name}")
+    candles = get_coin_prices(
+        start_date=int(predictions["timestamp"].min()),
+        end_date=int(predictions["timestamp"].max() + max(grid.horizon_days) * DAY_MS),
+    )
+    df_sweep = sweep_predictions(predictions, candles, grid, config, processes)
+    path = Path(f"logs/backtest/{test_name}/sweep.csv")
+    df_sweep.to_csv(path, index=False)
+    return df_sweep, path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Evaluate transformations of stored agent predictions"
+    )
+    parser.add_argument("test_name")
+    parser.add_argument("--sl-scale", type=float, nargs="+", default=[1.0])
+    parser.add_argument("--tp-scale", type=float, nargs="+", default=[1.0])
+    parser.add_argument("--min-confidence", type=float, nargs="+", default=[0.0])
+    parser.add_argument(
+        "--horizon-days", type=float, nargs="+", default=[float(OUTCOME_DAYS)]
+    )
+    parser.add_argument("--processes", type=int, default=0)
+    args = parser.parse_args()
+
+    grid = SweepGrid(
+        sl_scale=tuple(args.sl_scale),
+        tp_scale=tuple(args.tp_scale),
+        min_confidence=tuple(args.min_confidence),
+        horizon_days=tuple(args.horizon_days),
+    )
+    df_sweep, path = sweep_test(args.test_name, grid, processes=args.processes)
+    print(f"Saved {len(df_sweep)} cells to {path}")
+    print(df_sweep.sort_values("expectancy_r", ascending=False).to_string(index=False))
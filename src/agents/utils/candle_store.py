@@ -0,0 +1,197 @@
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Sequence
+import numpy as np
+import pandas as pd
+from src.config import Config
+
+CANDLE_COLUMNS = ["open", "high", "low", "close", "volume", "turnover"]
+CANDLE_DTYPE = np.dtype(
+    [("timestamp", "<i8")] + [(col, "<f8") for col in CANDLE_COLUMNS]
+)
+DAY_MS = 24 * 60 * 60 * 1000
+# Bybit kline intervals that fit into daily partitions, in milliseconds
+INTERVAL_MS = {
+    "1": 60_000,
+    "3": 3 * 60_000,
+    "5": 5 * 60_000,
+    "15": 15 * 60_000,
+    "30": 30 * 60_000,
+    "60": 60 * 60_000,
+    "120": 120 * 60_000,
+    "240": 240 * 60_000,
+    "360": 360 * 60_000,
+    "720": 720 * 60_000,
+    "D": DAY_MS,
+}
+
+
+def klines_to_candles(
+    rows: Sequence[Sequence[str]], out: np.ndarray | None = None
+) -> np.ndarray:
+    """
+    Convert raw Bybit kline rows (lists of strings) to a sorted candle array.
+
+    The strings are parsed in one pass into a (n, 7) float64 buffer, and copied
+    once into the candle array. Bybit sends the newest candle first, so the buffer
+    is read through a reversed view, rows are only sorted if they arrive in any
+    other order.
+
+    Args:
+        out: Candle array of at least `len(rows)` candles to fill, e.g. a slice of a
+            preallocated download buffer. A new array is allocated if None.
+    """
+    if out is None or len(out) < len(rows):
+        out = np.empty(len(rows), dtype=CANDLE_DTYPE)
+    candles = out[: len(rows)]
+    if len(rows) == 0:
+        return candles
+    values = np.array(rows, dtype=np.float64)
+    timestamps = values[:, 0]
+    if timestamps[0] > timestamps[-1]:
+        values = values[::-1]
+        timestamps = values[:, 0]
+    if np.any(timestamps[1:] < timestamps[:-1]):
+        values = values[np.argsort(timestamps, kind="stable")]
+    candles["timestamp"] = values[:, 0]
+    for i, col in enumerate(CANDLE_COLUMNS, start=1):
+        candles[col] = values[:, i]
+    return candles
+
+
+def candles_to_frame(candles: np.ndarray, dtype: np.dtype = np.float64) -> pd.DataFrame:
+    """
+    Build the OHLCV frame returned by `get_coin_prices` from a candle array.
+
+    Columns are copied once into a single column-major block that the frame wraps
+    as is, so pandas does not consolidate or copy them again. `dtype=np.float32`
+    halves the frame memory for large histories.
+    """
+    index = pd.DatetimeIndex(
+        pd.to_datetime(candles["timestamp"], unit="ms"), name="timestamp"
+    )
+    block = np.empty((len(CANDLE_COLUMNS), len(candles)), dtype=dtype)
+    for i, col in enumerate(CANDLE_COLUMNS):
+        block[i] = candles[col]
+    return pd.DataFrame(block.T, index=index, columns=CANDLE_COLUMNS, copy=False)
+
+
+def frame_to_candles(df: pd.DataFrame) -> np.ndarray:
+    """Inverse of `candles_to_frame`"""
+    candles = np.empty(len(df), dtype=CANDLE_DTYPE)
+    candles["timestamp"] = pd.DatetimeIndex(df.index).as_unit("ms").asi8
+    for col in CANDLE_COLUMNS:
+        candles[col] = df[col].to_numpy(dtype=np.float64)
+    return candles
+
+
+class CandleStore:
+    """
+    Persistent OHLCV store backed by memory-mapped NumPy files.
+
+    Candles are partitioned as `<root>/<symbol>/<category>/<interval>/<YYYY-MM-DD>.npy`.
+    Only closed UTC days are persisted, so a partition on disk is always complete
+    and never needs to be fetched again. The current day is fetched on every call.
+    """
+
+    def __init__(self, root: Path = Config.CANDLE_STORE_DIR):
+        self.root = Path(root)
+
+    def partition_path(
+        self, symbol: str, category: str, interval: str, day: int
+    ) -> Path:
+        day_str = datetime.fromtimestamp(day * DAY_MS / 1000, tz=timezone.utc)
+        return self.root / symbol / category / interval / f"{day_str:%Y-%m-%d}.npy"
+
+    def read_day(
+        self, symbol: str, category: str, interval: str, day: int
+    ) -> np.ndarray | None:
+        path = self.partition_path(symbol, category, interval, day)
+        if not path.exists():
+            return None
+        return np.load(path, mmap_mode="r")
+
+    def write_day(
+        self,
+        symbol: str,
+        category: str,
+        interval: str,
+        day: int,
+        candles: np.ndarray,
+    ) -> None:
+        path = self.partition_path(symbol, category, interval, day)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Per process temp file, concurrent writers of a partition don't share it
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(candles, dtype=CANDLE_DTYPE))
+        # Atomic rename, so concurrent readers never see a half-written partition
+        os.replace(tmp_path, path)
+
+    def missing_days(
+        self, symbol: str, category: str, interval: str, start: int, end: int
+    ) -> list[int]:
+        return [
+            day
+            for day in range(start // DAY_MS, end // DAY_MS + 1)
+            if not self.partition_path(symbol, category, interval, day).exists()
+        ]
+
+    def load(
+        self,
+        symbol: str,
+        category: str,
+        interval: str,
+        start: int,
+        end: int,
+        fetch: Callable[[int, int], np.ndarray] | None = None,
+    ) -> np.ndarray:
+        """
+        Return candles with open time in [start, end] (ms since epoch).
+        The result may be a read-only view of a memory-mapped partition.
+
+        Args:
+            fetch: Called as `fetch(range_start, range_end)` for every contiguous
+                range of days missing on disk. Closed days are persisted.
+                If None, only candles already in the store are returned.
+        """
+        now = int(datetime.now(timezone.utc).timestamp() * 1000)
+        fetched_days: dict[int, np.ndarray] = {}
+        if fetch is not None:
+            missing = self.missing_days(symbol, category, interval, start, end)
+            for first, last in _contiguous_ranges(missing):
+                range_end = min((last + 1) * DAY_MS - 1, now)
+                if range_end < first * DAY_MS:
+                    continue
+                candles = fetch(first * DAY_MS, range_end)
+                day_of_candle = candles["timestamp"] // DAY_MS
+                for day in range(first, last + 1):
+                    day_candles = candles[day_of_candle == day]
+                    fetched_days[day] = day_candles
+                    if (day + 1) * DAY_MS <= now:
+                        self.write_day(symbol, category, interval, day, day_candles)
+
+        parts = []
+        for day in range(start // DAY_MS, end // DAY_MS + 1):
+            candles = fetched_days.get(day)
+            if candles is None:
+                candles = self.read_day(symbol, category, interval, day)
+            if candles is not None and len(candles) > 0:
+                parts.append(candles)
+        if not parts:
+            return np.empty(0, dtype=CANDLE_DTYPE)
+        candles = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        # Partitions are sorted and in day order, so the range is a view
+        lo, hi = np.searchsorted(candles["timestamp"], [start, end + 1])
+        return candles[lo:hi]
+
+
+def _contiguous_ranges(days: list[int]) -> list[tuple[int, int]]:
+    ranges: list[tuple[int, int]] = []
+    for day in days:
+        if ranges and ranges[-1][1] == day - 1:
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
@@ -0,0 +1,232 @@
+import json
+import queue
+import threading
+from pathlib import Path
+from typing import Callable, Iterator, Protocol
+import numpy as np
+import pandas as pd
+from src.agents.utils.candle_store import (
+    CANDLE_COLUMNS,
+    CANDLE_DTYPE,
+    INTERVAL_MS,
+    candles_to_frame,
+)
+from src.agents.utils.streaming_indicators import (
+    StreamingIndicator,
+    default_streaming_indicators,
+)
+from src.config import Config
+
+
+def parse_kline_message(message: dict) -> list[tuple[np.ndarray, bool]]:
+    """
+    Convert a Bybit `kline.<interval>.<symbol>` websocket message to
+    (candle record, confirmed) pairs. `confirm` is True once the candle is closed.
+    """
+    updates = []
+    for item in message.get("data", []):
+        candle = np.zeros((), dtype=CANDLE_DTYPE)
+        candle["timestamp"] = int(item["start"])
+        for col in CANDLE_COLUMNS:
+            candle[col] = float(item[col])
+        updates.append((candle, bool(item["confirm"])))
+    return updates
+
+
+class KlineSource(Protocol):
+    def messages(self) -> Iterator[dict]:
+        """Yield raw kline websocket messages until the source is closed"""
+        ...
+
+    def close(self) -> None: ...
+
+
+class BybitKlineStream:
+    """
+    Live kline messages from the Bybit public websocket.
+
+    pybit calls back from its own thread, messages are handed over through a queue.
+    With `record_path`, every message is also appended to a JSON lines file that
+    `ReplayKlineStream` can play back later.
+    """
+
+    def __init__(
+        self,
+        symbol: str = Config.COIN,
+        interval: str = Config.SAMPLING_FREQ,
+        category: str = Config.CATEGORY,
+        record_path: Path | None = None,
+    ):
+        self.symbol = symbol
+        self.interval = interval
+        self.category = category
+        self.record_path = record_path
+        self._queue: queue.Queue[dict | None] = queue.Queue()
+        self._ws = None
+
+    def _on_message(self, message: dict) -> None:
+        self._queue.put(message)
+
+    def messages(self) -> Iterator[dict]:
+        # Imported here, so replaying recorded files does not need websocket support
+        from pybit.unified_trading import WebSocket
+
+        self._ws = WebSocket(testnet=False, channel_type=self.category)
+        self._ws.kline_stream(
+            interval=self.interval, symbol=self.symbol, callback=self._on_message
+        )
+        record = open(self.record_path, "a") if self.record_path else None
+        try:
+            while (message := self._queue.get()) is not None:
+                if record is not None:
+                    record.write(json.dumps(message) + "\n")
+                    record.flush()
+                yield message
+        finally:
+            if record is not None:
+                record.close()
+            self.close()
+
+    def close(self) -> None:
+        if self._ws is not None:
+            self._ws.exit()
+            self._ws = None
+        self._queue.put(None)
+
+
+class ReplayKlineStream:
+    """Kline messages recorded by `BybitKlineStream`, read from a JSON lines file"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._closed = threading.Event()
+
+    def messages(self) -> Iterator[dict]:
+        with open(self.path) as f:
+            for line in f:
+                if self._closed.is_set():
+                    return
+                if line.strip():
+                    yield json.loads(line)
+
+    def close(self) -> None:
+        self._closed.set()
+
+
+class CandleRingBuffer:
+    """Fixed capacity buffer of the most recent closed candles, O(1) append"""
+
+    def __init__(self, capacity: int = Config.STREAM_BUFFER_SIZE):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=CANDLE_DTYPE)
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, candle: np.ndarray) -> None:
+        self._data[self._next] = candle
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def last(self) -> np.ndarray | None:
+        if self._size == 0:
+            return None
+        return self._data[self._next - 1]
+
+    def to_array(self) -> np.ndarray:
+        """Buffered candles in chronological order (a copy)"""
+        if self._size < self.capacity:
+            return self._data[: self._size].copy()
+        return np.concatenate((self._data[self._next :], self._data[: self._next]))
+
+    def to_frame(self) -> pd.DataFrame:
+        return candles_to_frame(self.to_array())
+
+
+def resample_frame(df: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """
+    Aggregate candles of `df` to the longer `interval`, e.g. the streamed 15m
+    buffer to the hourly candles of the weekly chart. A first bucket missing
+    candles is dropped, the last one is kept as a forming candle, as from REST.
+    """
+    rule = pd.Timedelta(milliseconds=INTERVAL_MS[interval])
+    buckets = df.resample(rule, label="left", closed="left")
+    out = buckets.agg(
+        {
+            "open": "first",
+            "high": "max",
+            "low": "min",
+            "close": "last",
+            "volume": "sum",
+            "turnover": "sum",
+        }
+    ).dropna(subset=["open"])
+    per_bucket = rule // (df.index[1] - df.index[0]) if len(df) > 1 else 1
+    if len(out) > 1 and buckets.size().iloc[0] < per_bucket:
+        out = out.iloc[1:]
+    return out
+
+
+class CandleFeed:
+    """
+    Ring buffer of closed candles plus incrementally updated indicators.
+
+    Indicators are updated once per closed candle. The forming candle is kept in
+    `live` and never touches the indicators. Callbacks registered with `on_close`
+    get the feed after each closed candle.
+    """
+
+    def __init__(
+        self,
+        source: KlineSource,
+        capacity: int = Config.STREAM_BUFFER_SIZE,
+        indicators: list[StreamingIndicator] | None = None,
+    ):
+        self.source = source
+        self.buffer = CandleRingBuffer(capacity)
+        self.indicators = (
+            indicators if indicators is not None else default_streaming_indicators()
+        )
+        self.values: dict[str, float] = {}
+        self.live: np.ndarray | None = None
+        self._callbacks: list[Callable[["CandleFeed"], None]] = []
+
+    def on_close(self, callback: Callable[["CandleFeed"], None]) -> None:
+        self._callbacks.append(callback)
+
+    def seed(self, candles: np.ndarray) -> None:
+        """Warm up the buffer and indicators with historical closed candles"""
+        for candle in candles:
+            self._close_candle(candle)
+
+    def _close_candle(self, candle: np.ndarray) -> bool:
+        last = self.buffer.last()
+        if last is not None and candle["timestamp"] <= last["timestamp"]:
+            return False  # duplicate push, e.g. after a reconnect
+        self.buffer.append(candle)
+        for indicator in self.indicators:
+            self.values.update(indicator.update(candle))
+        return True
+
+    def process(self, message: dict) -> list[np.ndarray]:
+        """Apply one websocket message, return the candles it closed"""
+        closed = []
+        for candle, confirmed in parse_kline_message(message):
+            if not confirmed:
+                self.live = candle
+            elif self._close_candle(candle):
+                self.live = None
+                closed.append(candle)
+                for callback in self._callbacks:
+                    callback(self)
+        return closed
+
+    def run(self) -> Iterator[np.ndarray]:
+        """Consume the source, yield each closed candle after the feed is updated"""
+        for message in self.source.messages():
+            yield from self.process(message)
+
+    def snapshot(self) -> dict[str, float]:
+        return dict(self.values)
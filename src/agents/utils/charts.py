@@ -0,0 +1,87 @@
+import io
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from src.config import Config
+
+# Claude downsizes images above ~1.15 megapixels (1568 px long edge),
+# 8x7 inches at 140 dpi gives 1120x980 px, so nothing is rendered just to be thrown away
+CHART_FIGSIZE = (8, 7)
+CHART_DPI = 140
+
+
+class _ChartTemplate:
+    """
+    Figure with price and volume axes, reused between renders of one thread.
+    matplotlib and mplfinance are imported with the first template, not with this module.
+    """
+
+    def __init__(self, figsize: tuple[float, float], dpi: int):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        # Figure + Agg canvas instead of pyplot, so no global state is touched
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(self.fig)
+        self.ax_price = self.fig.add_axes((0.06, 0.36, 0.84, 0.58))
+        self.ax_volume = self.fig.add_axes(
+            (0.06, 0.13, 0.84, 0.2), sharex=self.ax_price
+        )
+
+    def render(self, df: pd.DataFrame, title: str) -> bytes:
+        import mplfinance as mpf
+
+        self.ax_price.clear()
+        self.ax_volume.clear()
+        mpf.plot(
+            df,
+            type="candle",
+            style="charles",
+            ax=self.ax_price,
+            volume=self.ax_volume,
+            axtitle=title,
+            warn_too_much_data=len(df) + 1,
+        )
+        self.ax_price.tick_params(labelbottom=False)
+        buffer = io.BytesIO()
+        self.fig.savefig(buffer, format="png")
+        return buffer.getvalue()
+
+
+_templates = threading.local()
+_process_pool: ProcessPoolExecutor | None = None
+
+
+def render_ohlc_png(
+    df: pd.DataFrame,
+    title: str,
+    figsize: tuple[float, float] = CHART_FIGSIZE,
+    dpi: int = CHART_DPI,
+) -> bytes:
+    """Render a candlestick chart with volume to PNG bytes, thread-safe"""
+    if not hasattr(_templates, "cache"):
+        _templates.cache = {}
+    key = (tuple(figsize), dpi)
+    if key not in _templates.cache:
+        _templates.cache[key] = _ChartTemplate(figsize, dpi)
+    return _templates.cache[key].render(df, title)
+
+
+def _render_job(job: tuple[pd.DataFrame, str]) -> bytes:
+    return render_ohlc_png(*job)
+
+
+def render_ohlc_pngs(
+    jobs: list[tuple[pd.DataFrame, str]],
+    processes: int = Config.CHART_RENDER_PROCESSES,
+) -> list[bytes]:
+    """
+    Render several (df, title) charts, in a pool of worker processes if `processes` > 0.
+    The pool is created on first use and kept alive for the following calls.
+    """
+    global _process_pool
+    if processes <= 0 or len(jobs) < 2:
+        return [_render_job(job) for job in jobs]
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=processes)
+    return list(_process_pool.map(_render_job, jobs))
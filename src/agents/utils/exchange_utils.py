@@ -1,26 +1,110 @@
 from dotenv import load_dotenv
 from datetime import datetime, timedelta, timezone
-import pandas as pd
+import os
+import threading
+from typing import TYPE_CHECKING, Any
+import numpy as np
 from src.config import Config
-import mplfinance as mpf
-import matplotlib.pyplot as plt
 from pathlib import Path
-from pybit.unified_trading import HTTP
+from src.agents.utils.candle_store import (
+    INTERVAL_MS,
+    CandleStore,
+    candles_to_frame,
+)
+from src.agents.utils.charts import CHART_FIGSIZE, render_ohlc_png
+from src.agents.utils.kline_downloader import download_klines
+from src.agents.utils.profiling import profile_stage, profiled
+
+if TYPE_CHECKING:
+    from pybit.unified_trading import HTTP
 
 load_dotenv()
 
-bybit_client = HTTP(
-    api_key=Config.BYBIT_DEMO_API_KEY,
-    api_secret=Config.BYBIT_DEMO_API_SECRET,
-    testnet=False,
-)
+_bybit_client: "HTTP | None" = None
+_client_lock = threading.Lock()
+
+
+def get_bybit_client() -> "HTTP":
+    """
+    Shared Bybit HTTP client, created on first use.
+    A forked worker process creates its own instead of reusing the parent's sockets.
+    """
+    global _bybit_client
+    with _client_lock:
+        if _bybit_client is None:
+            from pybit.unified_trading import HTTP
+            from requests.adapters import HTTPAdapter
+
+            client = HTTP(
+                api_key=Config.BYBIT_DEMO_API_KEY,
+                api_secret=Config.BYBIT_DEMO_API_SECRET,
+                testnet=False,
+            )
+            # Keep a connection per worker thread alive, requests' default pool holds 10
+            client.client.mount(
+                "https://",
+                HTTPAdapter(pool_connections=4, pool_maxsize=Config.HTTP_POOL_SIZE),
+            )
+            _bybit_client = client
+        return _bybit_client
+
+
+def set_bybit_client(client: Any) -> Any:
+    """
+    Replace the shared client, e.g. with an offline fake, returns the previous one.
+    `None` resets it, the next `get_bybit_client` creates a new one.
+    """
+    global _bybit_client
+    with _client_lock:
+        previous, _bybit_client = _bybit_client, client
+    return previous
+
+
+def _reset_after_fork() -> None:
+    global _bybit_client, _client_lock
+    _bybit_client = None
+    _client_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+candle_store = CandleStore(Config.CANDLE_STORE_DIR)
+
+
+def fetch_kline_range(
+    start_date: int,
+    end_date: int,
+    sampling_freq: str = Config.SAMPLING_FREQ,
+    symbol: str = Config.COIN,
+) -> np.ndarray:
+    """Fetch all candles in [start_date, end_date], without the 1000 candles limit"""
+    return download_klines(
+        get_bybit_client(),
+        symbol=symbol,
+        category=Config.CATEGORY,
+        interval=sampling_freq,
+        start=start_date,
+        end=end_date,
+        max_workers=Config.KLINE_DOWNLOAD_WORKERS,
+    )
 
 
 def get_coin_prices(
     start_date: int | None = None,
     end_date: int | None = None,
     sampling_freq: str = Config.SAMPLING_FREQ,
+    use_store: bool = True,
+    offline: bool = Config.CANDLE_STORE_OFFLINE,
+    symbol: str = Config.COIN,
 ):
+    """
+    Load OHLCV candles for `symbol` (`Config.COIN` by default).
+
+    Candles are served from the local candle store first, only the missing days are
+    fetched from the exchange. With `offline=True` the exchange is never called.
+    Ranges longer than 1000 candles are downloaded page by page, so this can be used
+    to backfill the store, e.g. for the whole backtest window.
+    """
     if not start_date:
         start_date = int(
             (datetime.now(timezone.utc) - timedelta(days=1)).timestamp() * 1000
@@ -28,52 +112,84 @@ def get_coin_prices(
     if not end_date:
         end_date = int(datetime.now(timezone.utc).timestamp() * 1000)
 
-    res = bybit_client.get_kline(
-        symbol=Config.COIN,
-        interval=sampling_freq,
-        category=Config.CATEGORY,
-        limit=1000,
-        start=start_date,
-        end=end_date,
-    )
+    with profile_stage(
+        "get_coin_prices", symbol=symbol, interval=sampling_freq
+    ) as stage:
+        stage["fetched_rows"] = stage["fetched_bytes"] = 0
 
-    df = pd.DataFrame(
-        res["result"]["list"],
-        columns=["timestamp", "open", "high", "low", "close", "volume", "turnover"],
-    )
-    df["timestamp"] = pd.to_datetime(df["timestamp"].astype(int), unit="ms")
-    for col in ["open", "high", "low", "close", "volume", "turnover"]:
-        df[col] = pd.to_numeric(df[col])
-    df = df.sort_values("timestamp")
-    df.set_index(df["timestamp"], inplace=True)
-    df = df.drop(columns=["timestamp"])
-    return df
+        def fetch(range_start: int, range_end: int) -> np.ndarray:
+            fetched = fetch_kline_range(range_start, range_end, sampling_freq, symbol)
+            stage["fetched_rows"] += len(fetched)
+            stage["fetched_bytes"] += fetched.nbytes
+            return fetched
 
+        if use_store and sampling_freq in INTERVAL_MS:
+            candles = candle_store.load(
+                symbol=symbol,
+                category=Config.CATEGORY,
+                interval=sampling_freq,
+                start=start_date,
+                end=end_date,
+                fetch=None if offline else fetch,
+            )
+        else:
+            candles = fetch(start_date, end_date)
+        stage["rows"] = len(candles)
+        return candles_to_frame(candles)
 
+
+def get_chart_title(
+    sampling_freq: str = Config.SAMPLING_FREQ, symbol: str = Config.COIN
+) -> str:
+    return f"Candle plot for {symbol} for {sampling_freq} freq."
+
+
+def get_linear_perpetuals(quote_coin: str = "USDT") -> list[str]:
+    """Symbols of all trading linear perpetual contracts settled in `quote_coin`"""
+    symbols = []
+    cursor = ""
+    while True:
+        response = get_bybit_client().get_instruments_info(
+            category="linear", limit=1000, cursor=cursor
+        )
+        result = response["result"]  # pyright: ignore[reportIndexIssue]
+        symbols.extend(
+            item["symbol"]
+            for item in result["list"]
+            if item["contractType"] == "LinearPerpetual"
+            and item["status"] == "Trading"
+            and item["quoteCoin"] == quote_coin
+        )
+        cursor = result.get("nextPageCursor", "")
+        if not cursor:
+            return symbols
+
+
+@profiled("get_plot_and_save_ohlc")
 def get_plot_and_save_ohlc(
     filepath: Path,
-    figsize=(16, 14),
+    figsize=CHART_FIGSIZE,
     start_date: int | None = None,
     end_date: int | None = None,
     sampling_freq: str = Config.SAMPLING_FREQ,
+    symbol: str = Config.COIN,
 ):
     df = get_coin_prices(
-        start_date=start_date, end_date=end_date, sampling_freq=sampling_freq
+        start_date=start_date,
+        end_date=end_date,
+        sampling_freq=sampling_freq,
+        symbol=symbol,
     )
-    df.to_csv(filepath.with_suffix(".csv"))
+    with profile_stage("write_csv") as stage:
+        df.to_csv(filepath.with_suffix(".csv"))
+        stage["bytes"] = filepath.with_suffix(".csv").stat().st_size
     # Candlestick with volume
-    fig, axes = mpf.plot(
-        df,
-        type="candle",
-        style="charles",
-        volume=True,
-        figsize=figsize,
-        returnfig=True,
-        tight_layout=False,
-        title=f"Candle plot for {Config.COIN} for {sampling_freq} freq.",
-    )
-    plt.savefig(filepath, dpi=300, bbox_inches="tight")
-    plt.close()
+    with profile_stage("render_chart", rows=len(df)) as stage:
+        chart = render_ohlc_png(
+            df, title=get_chart_title(sampling_freq, symbol), figsize=figsize
+        )
+        stage["bytes"] = len(chart)
+    filepath.write_bytes(chart)
     return df
 
 
@@ -0,0 +1,99 @@
+import functools
+import hashlib
+import inspect
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, TypeVar
+import pandas as pd
+from src.agents.utils.profiling import payload_size, profile_stage
+from src.config import Config
+
+T = TypeVar("T")
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of a candle frame (index and values)"""
+    hashed = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    digest = hashlib.blake2b(hashed.tobytes(), digest_size=16)
+    digest.update(",".join(map(str, df.columns)).encode())
+    return digest.hexdigest()
+
+
+class IndicatorCache:
+    """Thread-safe LRU cache for computed indicator outputs"""
+
+    def __init__(self, maxsize: int = Config.INDICATOR_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], T]) -> T:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Shared by default between runs, so backtest samples with identical candles reuse results
+shared_indicator_cache = IndicatorCache()
+
+
+def memoized_indicator(func: Callable[..., T]) -> Callable[..., T]:
+    """
+    Memoize an indicator tool on (tool name, params, candle data fingerprint,
+    payload format).
+
+    The wrapped tool must take `RunContext[AgentsDeps]` as its first argument.
+    Signature and docstring are preserved, so the tool schema seen by the agent
+    does not change.
+    """
+    sig = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(ctx, *args, **kwargs):
+        bound = sig.bind(ctx, *args, **kwargs)
+        bound.apply_defaults()
+        params = tuple(
+            (name, value) for name, value in bound.arguments.items() if name != "ctx"
+        )
+        key = (
+            func.__name__,
+            params,
+            ctx.deps.df_fingerprint(),
+            ctx.deps.payload_format,
+            ctx.deps.payload_tail,
+        )
+        computed = False
+
+        def compute():
+            nonlocal computed
+            computed = True
+            return func(ctx, *args, **kwargs)
+
+        with profile_stage(f"tool.{func.__name__}") as stage:
+            result = ctx.deps.indicator_cache.get_or_compute(key, compute)
+            stage["cache_hit"] = not computed
+            stage["payload_chars"] = payload_size(result)
+        return result
+
+    return wrapper
@@ -0,0 +1,311 @@
+import functools
+from dataclasses import dataclass, field
+from typing import Any, Callable, Literal
+import numpy as np
+import pandas as pd
+
+
+def njit(func: Callable) -> Callable:
+    """
+    `numba.njit`, applied on the first call: importing numba takes longer than
+    most commands that never compute a supertrend.
+    """
+    compiled: Callable | None = None
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        nonlocal compiled
+        if compiled is None:
+            try:
+                from numba import njit as numba_njit
+
+                compiled = numba_njit(func)
+            except ImportError:
+                # numba comes with pandas-ta, the engine works without it
+                compiled = func
+        return compiled(*args)
+
+    return wrapper
+
+
+IndicatorName = Literal[
+    "rsi", "ema", "macd", "atr", "bbands", "supertrend", "obv", "vwap", "stoch"
+]
+
+
+@dataclass(frozen=True)
+class IndicatorSpec:
+    """
+    Declarative indicator request, e.g. `IndicatorSpec("macd", {"fast": 8})`.
+    Missing params use the same defaults as the `calculate_*` tools.
+    """
+
+    name: IndicatorName
+    params: dict[str, Any] = field(default_factory=dict)
+
+    def __hash__(self) -> int:
+        return hash((self.name, tuple(sorted(self.params.items()))))
+
+
+# The indicators exposed as agent tools, with their default params
+DEFAULT_PANEL = [
+    IndicatorSpec("rsi"),
+    IndicatorSpec("stoch"),
+    IndicatorSpec("macd"),
+    IndicatorSpec("ema"),
+    IndicatorSpec("supertrend"),
+    IndicatorSpec("bbands"),
+    IndicatorSpec("atr"),
+    IndicatorSpec("obv"),
+    IndicatorSpec("vwap"),
+]
+
+
+def _ewm(values: np.ndarray, alpha: float) -> np.ndarray:
+    # pandas' ewm starts at the first non-NaN value, leading NaNs are kept
+    return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy(copy=True)
+
+
+def _seeded_ewm(values: np.ndarray, length: int, alpha: float) -> np.ndarray:
+    """EMA seeded with the SMA of the first `length` valid values, as in TA-Lib"""
+    out = np.full(len(values), np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) < length:
+        return out
+    first = valid[0]
+    seed_idx = first + length - 1
+    seeded = values.copy()
+    seeded[:seed_idx] = np.nan
+    seeded[seed_idx] = values[first : seed_idx + 1].mean()
+    return _ewm(seeded, alpha)
+
+
+def _rolling(values: np.ndarray, length: int, func: str, **kwargs) -> np.ndarray:
+    rolling = pd.Series(values).rolling(length)
+    return getattr(rolling, func)(**kwargs).to_numpy(copy=True)
+
+
+@njit
+def _supertrend_loop(close, lb, ub):
+    m = len(close)
+    direction = np.ones(m)
+    trend = np.full(m, np.nan)
+    long = np.full(m, np.nan)
+    short = np.full(m, np.nan)
+    for i in range(1, m):
+        if close[i] > ub[i - 1]:
+            direction[i] = 1
+        elif close[i] < lb[i - 1]:
+            direction[i] = -1
+        else:
+            direction[i] = direction[i - 1]
+            if direction[i] > 0 and lb[i] < lb[i - 1]:
+                lb[i] = lb[i - 1]
+            if direction[i] < 0 and ub[i] > ub[i - 1]:
+                ub[i] = ub[i - 1]
+        if direction[i] > 0:
+            trend[i] = lb[i]
+            long[i] = lb[i]
+        else:
+            trend[i] = ub[i]
+            short[i] = ub[i]
+    return trend, direction, long, short
+
+
+class _Intermediates:
+    """Arrays shared by several indicators, each computed at most once per panel"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.index = df.index
+        self.open = df["open"].to_numpy(dtype=np.float64)
+        self.high = df["high"].to_numpy(dtype=np.float64)
+        self.low = df["low"].to_numpy(dtype=np.float64)
+        self.close = df["close"].to_numpy(dtype=np.float64)
+        self.volume = df["volume"].to_numpy(dtype=np.float64)
+        self._cache: dict[tuple, Any] = {}
+
+    def _memo(self, key: tuple, compute: Callable[[], Any]) -> Any:
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def true_range(self) -> np.ndarray:
+        def compute():
+            prev_close = np.concatenate(([np.nan], self.close[:-1]))
+            tr = np.fmax(
+                self.high - self.low,
+                np.fmax(np.abs(self.high - prev_close), np.abs(self.low - prev_close)),
+            )
+            tr[0] = np.nan  # TA-Lib starts true range at the second candle
+            return tr
+
+        return self._memo(("tr",), compute)
+
+    def atr(self, length: int) -> np.ndarray:
+        return self._memo(
+            ("atr", length),
+            lambda: _seeded_ewm(self.true_range(), length, 1 / length),
+        )
+
+    def ema(self, length: int, source: str = "close") -> np.ndarray:
+        return self._memo(
+            ("ema", source, length),
+            lambda: _seeded_ewm(getattr(self, source), length, 2 / (length + 1)),
+        )
+
+    def sma(self, length: int) -> np.ndarray:
+        return self._memo(("sma", length), lambda: _rolling(self.close, length, "mean"))
+
+    def std(self, length: int) -> np.ndarray:
+        return self._memo(
+            ("std", length), lambda: _rolling(self.close, length, "std", ddof=0)
+        )
+
+    def macd_line(self, fast: int, slow: int) -> np.ndarray:
+        return self._memo(("macd", fast, slow), lambda: self.ema(fast) - self.ema(slow))
+
+
+def _rsi(x: _Intermediates, length: int = 14) -> dict[str, np.ndarray]:
+    change = np.diff(x.close, prepend=np.nan)
+    gain = _seeded_ewm(np.where(change > 0, change, 0.0), length, 1 / length)
+    loss = _seeded_ewm(np.where(change < 0, -change, 0.0), length, 1 / length)
+    gain[0] = loss[0] = np.nan
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 * gain / (gain + loss)
+    return {f"RSI_{length}": rsi}
+
+
+def _ema(x: _Intermediates, length: int = 20) -> dict[str, np.ndarray]:
+    return {f"EMA_{length}": x.ema(length)}
+
+
+def _macd(
+    x: _Intermediates, fast: int = 12, slow: int = 26, signal: int = 9
+) -> dict[str, np.ndarray]:
+    macd = x.macd_line(fast, slow)
+    signal_line = _seeded_ewm(macd, signal, 2 / (signal + 1))
+    props = f"_{fast}_{slow}_{signal}"
+    return {
+        f"MACD{props}": macd,
+        f"MACDh{props}": macd - signal_line,
+        f"MACDs{props}": signal_line,
+    }
+
+
+def _atr(x: _Intermediates, length: int = 14) -> dict[str, np.ndarray]:
+    return {f"ATRr_{length}": x.atr(length)}
+
+
+def _bbands(
+    x: _Intermediates, length: int = 20, std: float = 2.0
+) -> dict[str, np.ndarray]:
+    mid = x.sma(length)
+    dev = std * x.std(length)
+    upper, lower = mid + dev, mid - dev
+    props = f"_{length}_{std}_{std}"
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            f"BBL{props}": lower,
+            f"BBM{props}": mid,
+            f"BBU{props}": upper,
+            f"BBB{props}": 100 * (upper - lower) / mid,
+            f"BBP{props}": (x.close - lower) / (upper - lower),
+        }
+
+
+def _supertrend(
+    x: _Intermediates, length: int = 10, multiplier: float = 3.0
+) -> dict[str, np.ndarray]:
+    hl2 = (x.high + x.low) / 2
+    matr = multiplier * x.atr(length)
+    trend, direction, long, short = _supertrend_loop(x.close, hl2 - matr, hl2 + matr)
+    trend[0] = np.nan
+    direction[:length] = np.nan
+    props = f"_{length}_{multiplier}"
+    return {
+        f"SUPERT{props}": trend,
+        f"SUPERTd{props}": direction,
+        f"SUPERTl{props}": long,
+        f"SUPERTs{props}": short,
+    }
+
+
+def _obv(x: _Intermediates) -> dict[str, np.ndarray]:
+    signed = np.sign(np.diff(x.close, prepend=x.close[:1])) * x.volume
+    signed[:1] = x.volume[:1]
+    return {"OBV": np.cumsum(signed)}
+
+
+def _vwap(x: _Intermediates, anchor: str = "D") -> dict[str, np.ndarray]:
+    typical = (x.high + x.low + x.close) / 3
+    periods = x.index.to_period(anchor).asi8
+    # Cumulative sums restarted at each anchor period, without a pandas groupby
+    is_start = np.diff(periods, prepend=periods[:1] - 1) != 0
+    period_idx = np.cumsum(is_start) - 1
+    starts = np.flatnonzero(is_start)
+    cum_wp = np.cumsum(typical * x.volume)
+    cum_vol = np.cumsum(x.volume)
+    offset_wp = np.concatenate(([0.0], cum_wp[starts[1:] - 1]))[period_idx]
+    offset_vol = np.concatenate(([0.0], cum_vol[starts[1:] - 1]))[period_idx]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vwap = (cum_wp - offset_wp) / (cum_vol - offset_vol)
+    return {f"VWAP_{anchor}": vwap}
+
+
+def _stoch(
+    x: _Intermediates, k: int = 14, d: int = 3, smooth_k: int = 3
+) -> dict[str, np.ndarray]:
+    lowest = _rolling(x.low, k, "min")
+    highest = _rolling(x.high, k, "max")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stoch = 100 * (x.close - lowest) / (highest - lowest)
+    stoch_k = _rolling(stoch, smooth_k, "mean") if smooth_k > 1 else stoch
+    stoch_d = _rolling(stoch_k, d, "mean")
+    props = f"_{k}_{d}_{smooth_k}"
+    return {
+        f"STOCHk{props}": stoch_k,
+        f"STOCHd{props}": stoch_d,
+        f"STOCHh{props}": stoch_k - stoch_d,
+    }
+
+
+_INDICATORS: dict[str, Callable[..., dict[str, np.ndarray]]] = {
+    "rsi": _rsi,
+    "ema": _ema,
+    "macd": _macd,
+    "atr": _atr,
+    "bbands": _bbands,
+    "supertrend": _supertrend,
+    "obv": _obv,
+    "vwap": _vwap,
+    "stoch": _stoch,
+}
+
+
+def compute_panel(
+    df: pd.DataFrame, specs: list[IndicatorSpec] = DEFAULT_PANEL
+) -> pd.DataFrame:
+    """
+    Compute many indicators over one OHLCV frame in a single pass.
+
+    Intermediates are shared between indicators: true range between ATR and
+    Supertrend, EMAs between EMA and MACD, rolling mean/std between Bollinger bands
+    of the same length. Columns are named as in pandas-ta (e.g. `MACDs_12_26_9`),
+    values follow the TA-Lib conventions used by pandas-ta when TA-Lib is installed.
+
+    Args:
+        df: OHLCV frame as returned by `get_coin_prices`
+        specs: Indicators to compute, duplicates are computed once
+
+    Returns:
+        Frame aligned with `df.index`, one column per indicator output
+    """
+    intermediates = _Intermediates(df)
+    columns: dict[str, np.ndarray] = {}
+    for spec in dict.fromkeys(specs):
+        try:
+            indicator = _INDICATORS[spec.name]
+        except KeyError:
+            raise ValueError(f"Unknown indicator {spec.name}") from None
+        columns.update(indicator(intermediates, **spec.params))
+    return pd.DataFrame(columns, index=df.index)
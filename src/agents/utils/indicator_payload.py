@@ -0,0 +1,60 @@
+from typing import Any, Literal
+import pandas as pd
+
+PayloadFormat = Literal["full", "compact"]
+
+# What the indicator tools return in compact mode, for their tool descriptions
+COMPACT_RETURNS = (
+    "Dict with 'time' (start, step_minutes and count of the candles), 'values' "
+    "(one list per series, oldest first, aligned with 'time') and 'stats' "
+    "(current, min, max, mean, std per series)"
+)
+
+
+def series_stats(values: pd.Series, decimals: int = 2) -> dict[str, float]:
+    """Summary statistics of an indicator series, same fields as `calculate_rsi`"""
+    return {
+        "current": round(float(values.iloc[-1]), decimals),
+        "min": round(float(values.min()), decimals),
+        "max": round(float(values.max()), decimals),
+        "mean": round(float(values.mean()), decimals),
+        "std": round(float(values.std(ddof=0)), decimals),
+    }
+
+
+def _time_axis(index: pd.Index) -> dict[str, Any]:
+    """Shared time axis: start + step if candles are evenly spaced, else every timestamp"""
+    axis: dict[str, Any] = {"start": str(index[0]), "count": len(index)}
+    if len(index) > 1:
+        steps = index[1:] - index[:-1]
+        if (steps == steps[0]).all():
+            axis["step_minutes"] = int(steps[0].total_seconds() // 60)
+        else:
+            axis["timestamps"] = [str(t) for t in index]
+    return axis
+
+
+def compact_payload(
+    result: pd.DataFrame | pd.Series, tail: int | None = None
+) -> dict[str, Any]:
+    """
+    Column-oriented indicator payload with one shared time axis.
+
+    Args:
+        result: Indicator values indexed by candle timestamps, one column per series
+        tail: Only the last `tail` values of every series are included (none for
+            0), statistics are still computed over the whole series
+
+    Returns:
+        Dict with 'time' (start, step_minutes, count), 'values' (lists per series)
+        and 'stats' (current, min, max, mean, std per series)
+    """
+    frame = result.to_frame() if isinstance(result, pd.Series) else result
+    if frame.empty:
+        return {"time": {"count": 0}, "values": {}, "stats": {}}
+    window = frame if tail is None else frame.iloc[len(frame) - tail :]
+    return {
+        "time": _time_axis(window.index) if len(window) else {"count": 0},
+        "values": {str(col): window[col].tolist() for col in window.columns},
+        "stats": {str(col): series_stats(frame[col]) for col in frame.columns},
+    }
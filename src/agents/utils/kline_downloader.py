@@ -0,0 +1,187 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Protocol
+import numpy as np
+import pandas as pd
+from pybit.exceptions import FailedRequestError, InvalidRequestError
+from src.agents.utils.candle_store import (
+    CANDLE_DTYPE,
+    INTERVAL_MS,
+    candles_to_frame,
+    klines_to_candles,
+)
+
+MAX_KLINE_LIMIT = 1000
+# Bybit "Too many visits" error and HTTP status for breaching the IP rate limit
+RATE_LIMIT_CODES = {10006, 403, 429}
+
+
+class KlineClient(Protocol):
+    """Subset of `pybit.unified_trading.HTTP` used by the downloader"""
+
+    def get_kline(self, **kwargs: Any) -> dict[str, Any]: ...
+
+
+class _RateLimitGate:
+    """Shared pause, so one rate-limited worker backs off the whole pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+
+def split_into_pages(
+    start: int, end: int, interval: str, limit: int = MAX_KLINE_LIMIT
+) -> list[tuple[int, int]]:
+    """Split [start, end] (ms) into ranges holding at most `limit` candles each"""
+    if interval not in INTERVAL_MS:
+        return [(start, end)]
+    page_span = INTERVAL_MS[interval] * limit
+    return [
+        (page_start, min(page_start + page_span - 1, end))
+        for page_start in range(start, end + 1, page_span)
+    ]
+
+
+def _retry_delay(error: Exception, attempt: int, backoff: float) -> float | None:
+    """Seconds to wait before retrying, None if the error is not retryable"""
+    if isinstance(error, InvalidRequestError):
+        if error.status_code not in RATE_LIMIT_CODES:
+            return None
+    elif not isinstance(error, (FailedRequestError, ConnectionError, TimeoutError)):
+        return None
+    if isinstance(error, (InvalidRequestError, FailedRequestError)):
+        headers = getattr(error, "resp_headers", None) or {}
+        reset_at = headers.get("X-Bapi-Limit-Reset-Timestamp")
+        if reset_at:
+            return max(int(reset_at) / 1000 - time.time(), 0.0) + 0.1
+    return backoff * 2**attempt * (1 + random.random())
+
+
+def _fetch_page(
+    client: KlineClient,
+    gate: _RateLimitGate,
+    page: tuple[int, int],
+    symbol: str,
+    category: str,
+    interval: str,
+    limit: int,
+    max_retries: int,
+    backoff: float,
+    out: np.ndarray | None = None,
+) -> np.ndarray:
+    attempt = 0
+    while True:
+        gate.wait()
+        try:
+            res = client.get_kline(
+                symbol=symbol,
+                interval=interval,
+                category=category,
+                limit=limit,
+                start=page[0],
+                end=page[1],
+            )
+            return klines_to_candles(res["result"]["list"], out=out)
+        except Exception as e:
+            delay = _retry_delay(e, attempt, backoff)
+            if delay is None or attempt >= max_retries:
+                raise
+            gate.pause(delay)
+            attempt += 1
+
+
+def download_klines(
+    client: KlineClient,
+    symbol: str,
+    category: str,
+    interval: str,
+    start: int,
+    end: int,
+    max_workers: int = 8,
+    limit: int = MAX_KLINE_LIMIT,
+    max_retries: int = 5,
+    backoff: float = 0.5,
+) -> np.ndarray:
+    """
+    Download every candle in [start, end] (ms) with a bounded pool of workers.
+
+    The range is split into pages of `limit` candles which are fetched concurrently.
+    Rate-limit errors pause all workers (honouring Bybit's reset header when present)
+    and are retried with exponential backoff. Pages are parsed into consecutive
+    slots of one preallocated array, so sorted pages need no stitching; overlaps
+    or gaps fall back to a de-duplicating, sorting copy.
+
+    Args:
+        client: `pybit.unified_trading.HTTP` or any object with a compatible `get_kline`
+        max_workers: Maximum number of concurrent requests
+        max_retries: Retries per page on rate-limit and network errors
+
+    Returns:
+        Candle array with `CANDLE_DTYPE`
+    """
+    pages = split_into_pages(start, end, interval, limit)
+    gate = _RateLimitGate()
+    # Every page is parsed straight into its own slot of one buffer
+    buffer = np.empty(len(pages) * limit, dtype=CANDLE_DTYPE)
+
+    def fetch(i: int) -> np.ndarray:
+        return _fetch_page(
+            client,
+            gate,
+            pages[i],
+            symbol=symbol,
+            category=category,
+            interval=interval,
+            limit=limit,
+            max_retries=max_retries,
+            backoff=backoff,
+            out=buffer[i * limit : (i + 1) * limit],
+        )
+
+    if len(pages) == 1 or max_workers <= 1:
+        results = [fetch(i) for i in range(len(pages))]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pages))) as pool:
+            results = list(pool.map(fetch, range(len(pages))))
+
+    sizes = [len(result) for result in results]
+    if all(size == limit for size in sizes[:-1]):
+        # Only the last page is partial (the usual case): the filled prefix is the
+        # result, without copying
+        candles = buffer[: sum(sizes)]
+    else:
+        candles = np.concatenate(results) if results else buffer[:0]
+    timestamps = candles["timestamp"]
+    if np.any(timestamps[1:] <= timestamps[:-1]):
+        # np.unique sorts, so this both de-duplicates page overlaps and orders candles
+        _, unique_idx = np.unique(timestamps, return_index=True)
+        candles = candles[unique_idx]
+    return candles
+
+
+def download_klines_frame(
+    client: KlineClient,
+    symbol: str,
+    category: str,
+    interval: str,
+    start: int,
+    end: int,
+    **kwargs: Any,
+) -> pd.DataFrame:
+    """Same as `download_klines`, returned in the `get_coin_prices` frame format"""
+    return candles_to_frame(
+        download_klines(client, symbol, category, interval, start, end, **kwargs)
+    )
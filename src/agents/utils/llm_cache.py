@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Literal, Sequence
+from pydantic_ai import BinaryContent
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelMessagesTypeAdapter,
+    ModelRequest,
+    ModelResponse,
+    RetryPromptPart,
+    SystemPromptPart,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+from pydantic_ai.models import KnownModelName, Model, ModelRequestParameters
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings
+from pydantic_core import to_jsonable_python
+from src.config import Config
+
+CacheMode = Literal["record", "replay", "passthrough"]
+
+
+class LLMCacheMissError(RuntimeError):
+    """Raised in replay mode when a request has no recorded response"""
+
+
+def _content_key(content: Any) -> Any:
+    """JSON-able representation of prompt content, binary data replaced by its hash"""
+    if isinstance(content, BinaryContent):
+        return {
+            "media_type": content.media_type,
+            "sha256": hashlib.sha256(content.data).hexdigest(),
+        }
+    if isinstance(content, str):
+        return content
+    if isinstance(content, Sequence):
+        return [_content_key(item) for item in content]
+    return to_jsonable_python(content, fallback=str)
+
+
+def _message_key(message: ModelMessage) -> dict:
+    """
+    Stable representation of a message: ids, timestamps and usage are dropped,
+    so a replayed conversation produces the same keys as the recorded one.
+    """
+    if isinstance(message, ModelRequest):
+        parts = []
+        for part in message.parts:
+            if isinstance(part, (SystemPromptPart, UserPromptPart)):
+                parts.append([part.part_kind, _content_key(part.content)])
+            elif isinstance(part, (ToolReturnPart, RetryPromptPart)):
+                parts.append(
+                    [part.part_kind, part.tool_name, _content_key(part.content)]
+                )
+        # Agents strip the instructions, seeds may pass them as written in prompts.py
+        instructions = (message.instructions or "").strip()
+        return {"instructions": instructions, "parts": parts}
+    parts = []
+    for part in message.parts:
+        if isinstance(part, TextPart):
+            parts.append([part.part_kind, part.content])
+        elif isinstance(part, ToolCallPart):
+            parts.append([part.part_kind, part.tool_name, part.args_as_dict()])
+    return {"parts": parts}
+
+
+def request_key(
+    model_name: str,
+    messages: list[ModelMessage],
+    model_request_parameters: ModelRequestParameters | None = None,
+) -> str:
+    """Content address of a model request"""
+    payload: dict[str, Any] = {
+        "model": model_name,
+        "messages": [_message_key(m) for m in messages],
+    }
+    if model_request_parameters is not None:
+        payload["tools"] = sorted(
+            [tool.name, tool.parameters_json_schema]
+            for tool in model_request_parameters.function_tools
+        )
+        payload["output_tools"] = sorted(
+            tool.name for tool in model_request_parameters.output_tools
+        )
+    return _hash(payload)
+
+
+def seed_key(model_name: str, instructions: str | None, user_prompt: Any) -> str:
+    """
+    Address of the first request of a run, independent of tool schemas.
+    Used for responses imported from stored agent outputs.
+    """
+    request = ModelRequest(
+        parts=[UserPromptPart(content=user_prompt)], instructions=instructions
+    )
+    return _hash({"model": model_name, "seed": _message_key(request)})
+
+
+def _hash(payload: Any) -> str:
+    data = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(data).hexdigest()
+
+
+class LLMResponseCache:
+    """Responses stored as JSON files under `<root>/<key[:2]>/<key>.json`"""
+
+    def __init__(self, root: Path = Config.LLM_CACHE_DIR):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> ModelResponse | None:
+        path = self._path(key)
+        if not path.exists():
+            return None
+        message = ModelMessagesTypeAdapter.validate_json(path.read_bytes())[0]
+        assert isinstance(message, ModelResponse)
+        return message
+
+    def put(self, key: str, response: ModelResponse) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(ModelMessagesTypeAdapter.dump_json([response]))
+        os.replace(tmp_path, path)
+
+    def put_seed(
+        self,
+        model_name: str,
+        instructions: str | None,
+        user_prompt: Any,
+        output: dict,
+        output_tool_name: str = "final_result",
+    ) -> str:
+        """
+        Store an agent's final structured output as the response to the first
+        request of a run, i.e. as if the model answered without calling tools.
+        """
+        key = seed_key(model_name, instructions, user_prompt)
+        response = ModelResponse(
+            parts=[ToolCallPart(tool_name=output_tool_name, args=output)],
+            model_name=model_name,
+        )
+        self.put(key, response)
+        return key
+
+
+class CachedModel(WrapperModel):
+    """
+    Model wrapper serving responses from `LLMResponseCache`.
+
+    Modes:
+        record: serve cached responses, call the wrapped model and store on a miss
+        replay: serve cached responses only, raise `LLMCacheMissError` on a miss
+        passthrough: always call the wrapped model, nothing is cached
+
+    Streamed requests are not cached.
+    """
+
+    def __init__(
+        self,
+        wrapped: Model | KnownModelName,
+        cache: LLMResponseCache | None = None,
+        mode: CacheMode = "record",
+    ):
+        super().__init__(wrapped)
+        self.cache = cache or LLMResponseCache()
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+
+    async def request(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> ModelResponse:
+        if self.mode == "passthrough":
+            return await self.wrapped.request(
+                messages, model_settings, model_request_parameters
+            )
+
+        key = request_key(self.model_name, messages, model_request_parameters)
+        response = self.cache.get(key)
+        if response is None and len(messages) == 1:
+            first = messages[0]
+            if isinstance(first, ModelRequest) and len(first.parts) == 1:
+                part = first.parts[0]
+                if isinstance(part, UserPromptPart):
+                    response = self.cache.get(
+                        seed_key(self.model_name, first.instructions, part.content)
+                    )
+        if response is not None:
+            self.hits += 1
+            return response
+
+        self.misses += 1
+        if self.mode == "replay":
+            raise LLMCacheMissError(f"No cached response for request {key}")
+        response = await self.wrapped.request(
+            messages, model_settings, model_request_parameters
+        )
+        self.cache.put(key, response)
+        return response
+
+
+def cached_model(
+    model: Model | KnownModelName | str, mode: CacheMode = Config.LLM_CACHE_MODE
+) -> Model | str:
+    """Wrap `model` with the response cache, unless `mode` is passthrough"""
+    if mode == "passthrough":
+        return model
+    return CachedModel(model, mode=mode)
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable
+from src.config import Config
+
+if TYPE_CHECKING:
+    from pydantic_ai.mcp import MCPServer
+
+logger = logging.getLogger(__name__)
+
+MCPServerFactory = Callable[[], "MCPServer"]
+
+
+@dataclass
+class _Slot:
+    """A started server, the task owning its session and the runs leasing it"""
+
+    server: "MCPServer"
+    stop: asyncio.Event = field(default_factory=asyncio.Event)
+    idle: asyncio.Event = field(default_factory=asyncio.Event)
+    leases: int = 0
+    started_at: float = 0.0
+    start_seconds: float = 0.0
+    owner: "asyncio.Task[None] | None" = None
+
+
+class MCPServerPool:
+    """
+    Long-lived MCP server sessions shared by the agent runs of one event loop.
+
+    Each server is started once (process spawn and MCP handshake) and its session
+    is kept open by an owner task, so agent runs entering the server only take a
+    reference. Concurrent runs share the session, MCP requests are multiplexed by id.
+    Servers failing a health check are restarted, runs still using the old session
+    keep it until they end.
+
+    Usage:
+        async with pool.lease() as servers:
+            await agent.run(prompt, toolsets=servers)
+    """
+
+    def __init__(
+        self,
+        factories: dict[str, MCPServerFactory],
+        health_interval: float = Config.MCP_HEALTH_CHECK_SECONDS,
+        health_timeout: float = Config.MCP_HEALTH_CHECK_TIMEOUT,
+    ):
+        self.factories = factories
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.restarts = {name: 0 for name in factories}
+        self._slots: dict[str, _Slot] = {}
+        self._lock: asyncio.Lock | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._health_task: asyncio.Task[None] | None = None
+
+    def _bind_loop(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._loop is None or self._loop.is_closed():
+            # Sessions of a closed loop died with it, e.g. between two `asyncio.run`
+            if self._slots:
+                logger.warning("Event loop of the MCP pool closed, restarting servers")
+            self._slots, self._health_task = {}, None
+            self._loop = loop
+            self._lock = asyncio.Lock()
+        elif self._loop is not loop:
+            raise RuntimeError("MCPServerPool is bound to another event loop")
+        return self._lock  # type: ignore[return-value]
+
+    async def start(self, names: list[str] | None = None) -> "MCPServerPool":
+        """
+        Start the servers not running yet (all by default), e.g. to warm up a daemon.
+        If some fail, the others are still kept (and closed by `close`) before the
+        first error is raised.
+        """
+        async with self._bind_loop():
+            missing = [
+                name for name in names or self.factories if name not in self._slots
+            ]
+            results = await asyncio.gather(
+                *(self._start_slot(name) for name in missing), return_exceptions=True
+            )
+            errors = []
+            for name, result in zip(missing, results):
+                if isinstance(result, BaseException):
+                    errors.append(result)
+                else:
+                    self._slots[name] = result
+            if self.health_interval > 0 and self._health_task is None:
+                self._health_task = asyncio.create_task(
+                    self._health_loop(), name="mcp-pool-health"
+                )
+            if errors:
+                raise errors[0]
+        return self
+
+    async def _start_slot(self, name: str) -> _Slot:
+        slot = _Slot(self.factories[name]())
+        slot.idle.set()
+        ready: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        start = time.perf_counter()
+        slot.owner = asyncio.create_task(self._own(slot, ready), name=f"mcp:{name}")
+        await ready
+        slot.started_at = time.time()
+        slot.start_seconds = time.perf_counter() - start
+        logger.info("Started MCP server %s in %.2fs", name, slot.start_seconds)
+        return slot
+
+    @staticmethod
+    async def _own(slot: _Slot, ready: "asyncio.Future[None]") -> None:
+        # The session must be entered and closed by the same task (anyio task
+        # groups), so it lives here until the slot is stopped and no run uses it
+        try:
+            await slot.server.__aenter__()
+        except BaseException as exc:
+            ready.set_exception(exc)
+            return
+        ready.set_result(None)
+        try:
+            await slot.stop.wait()
+            await slot.idle.wait()
+        finally:
+            try:
+                await slot.server.__aexit__(None, None, None)
+            except Exception:
+                logger.warning("Error while closing an MCP server", exc_info=True)
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[list["MCPServer"]]:
+        """
+        Running servers for one agent run, started on first use. A server restarted
+        during the run stays open for it until the lease ends.
+        """
+        await self.start()
+        slots = list(self._slots.values())
+        for slot in slots:
+            slot.leases += 1
+            slot.idle.clear()
+        try:
+            yield [slot.server for slot in slots]
+        finally:
+            for slot in slots:
+                slot.leases -= 1
+                if slot.leases == 0:
+                    slot.idle.set()
+
+    async def check(self, name: str) -> bool:
+        """True if the server answers `tools/list` within `health_timeout`"""
+        slot = self._slots[name]
+        if slot.owner is None or slot.owner.done():
+            return False
+        try:
+            await asyncio.wait_for(slot.server.list_tools(), self.health_timeout)
+            return True
+        except Exception:
+            logger.warning("MCP server %s failed its health check", name, exc_info=True)
+            return False
+
+    async def restart(self, name: str) -> None:
+        """Swap in a new session of `name`, the old one closes after its last run"""
+        async with self._bind_loop():
+            old = self._slots.get(name)
+            self._slots[name] = await self._start_slot(name)
+            self.restarts[name] += 1
+        if old is not None:
+            old.stop.set()
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for name in list(self._slots):
+                if await self.check(name):
+                    continue
+                try:
+                    await self.restart(name)
+                except Exception:
+                    logger.exception("Could not restart MCP server %s", name)
+
+    async def close(self, timeout: float | None = None) -> None:
+        """
+        Stop the health check and every server, waiting for the runs using them.
+        Servers still leased after `timeout` seconds are closed under their runs.
+        """
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        slots, self._slots = list(self._slots.values()), {}
+        for slot in slots:
+            slot.stop.set()
+        owners = [slot.owner for slot in slots if slot.owner is not None]
+        if not owners:
+            return
+        _, pending = await asyncio.wait(owners, timeout=timeout)
+        if pending:
+            logger.warning(
+                "Closing %d MCP servers still in use after %.0fs", len(pending), timeout
+            )
+            for owner in pending:
+                owner.cancel()
+        await asyncio.gather(*owners, return_exceptions=True)
+
+    async def __aenter__(self) -> "MCPServerPool":
+        return await self.start()
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """State of every started server, for logs and monitoring"""
+        return {
+            name: {
+                "running": slot.owner is not None and not slot.owner.done(),
+                "leases": slot.leases,
+                "restarts": self.restarts[name],
+                "start_seconds": slot.start_seconds,
+                "uptime_seconds": time.time() - slot.started_at,
+            }
+            for name, slot in self._slots.items()
+        }
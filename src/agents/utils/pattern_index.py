@@ -0,0 +1,207 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import talib
+from src.agents.utils.candle_store import frame_to_candles
+from src.config import Config
+
+# Same patterns, order and column names as `ta.cdl_pattern(..., name="all")`
+ALL_PATTERNS = [
+    "2crows", "3blackcrows", "3inside", "3linestrike", "3outside",
+    "3starsinsouth", "3whitesoldiers", "abandonedbaby", "advanceblock",
+    "belthold", "breakaway", "closingmarubozu", "concealbabyswall",
+    "counterattack", "darkcloudcover", "doji", "dojistar", "dragonflydoji",
+    "engulfing", "eveningdojistar", "eveningstar", "gapsidesidewhite",
+    "gravestonedoji", "hammer", "hangingman", "harami", "haramicross",
+    "highwave", "hikkake", "hikkakemod", "homingpigeon", "identical3crows",
+    "inneck", "inside", "invertedhammer", "kicking", "kickingbylength",
+    "ladderbottom", "longleggeddoji", "longline", "marubozu", "matchinglow",
+    "mathold", "morningdojistar", "morningstar", "onneck", "piercing",
+    "rickshawman", "risefall3methods", "separatinglines", "shootingstar",
+    "shortline", "spinningtop", "stalledpattern", "sticksandwich", "takuri",
+    "tasukigap", "thrusting", "tristar", "unique3river", "upsidegap2crows",
+    "xsidegap3methods",
+]  # fmt: skip
+PATTERN_NAMES = [
+    "CDL_DOJI_10_0.1" if name == "doji" else f"CDL_{name.upper()}"
+    for name in ALL_PATTERNS
+]
+# Candles needed before a chunk for its patterns to match a single pass over
+# the whole history: the longest TA-Lib lookback (14) with some margin
+PATTERN_WARMUP = 32
+
+EVENT_DTYPE = np.dtype([("timestamp", "<i8"), ("pattern", "<i2"), ("direction", "<i1")])
+
+
+def _pattern_matrix(candles: np.ndarray) -> np.ndarray:
+    """Pattern signals, one row per candle and one column per `PATTERN_NAMES` entry"""
+    open_, high, low, close = (
+        np.ascontiguousarray(candles[col], dtype=np.float64)
+        for col in ("open", "high", "low", "close")
+    )
+    matrix = np.zeros((len(candles), len(PATTERN_NAMES)), dtype=np.int16)
+    if len(candles) == 0:
+        return matrix
+    for j, name in enumerate(ALL_PATTERNS):
+        # Doji and inside bar are pandas-ta's own definitions, not TA-Lib's
+        if name == "doji":
+            body = np.abs(close - open_)
+            matrix[:, j] = 100 * (body < 0.1 * talib.SMA(high - low, 10))
+        elif name == "inside":
+            inside = (high[1:] < high[:-1]) & (low[1:] > low[:-1])
+            matrix[1:, j] = 100 * inside
+        else:
+            pattern = getattr(talib, f"CDL{name.upper()}")
+            matrix[:, j] = pattern(open_, high, low, close)
+    return matrix
+
+
+def detect_pattern_events(candles: np.ndarray) -> np.ndarray:
+    """
+    Sparse candlestick pattern events of a candle array (`CANDLE_DTYPE`).
+
+    Returns:
+        `EVENT_DTYPE` array sorted by timestamp, then pattern: the pattern is an index
+        into `PATTERN_NAMES`, direction is 1 (bullish) or -1 (bearish)
+    """
+    matrix = _pattern_matrix(candles)
+    rows, cols = np.nonzero(matrix)
+    events = np.empty(len(rows), dtype=EVENT_DTYPE)
+    events["timestamp"] = candles["timestamp"][rows]
+    events["pattern"] = cols
+    events["direction"] = np.sign(matrix[rows, cols])
+    return events
+
+
+def _detect_chunk(job: tuple[np.ndarray, int]) -> np.ndarray:
+    candles, first_ts = job
+    events = detect_pattern_events(candles)
+    return events[events["timestamp"] >= first_ts]
+
+
+def build_pattern_events(
+    candles: np.ndarray,
+    chunk_size: int = 50_000,
+    processes: int = 0,
+) -> np.ndarray:
+    """
+    `detect_pattern_events` over a long history, in chunks of `chunk_size` candles.
+
+    Each chunk is evaluated with `PATTERN_WARMUP` extra candles before it, so the
+    result is the same as a single pass. With `processes` > 0, chunks are evaluated
+    in a process pool.
+    """
+    jobs = []
+    for start in range(0, len(candles), chunk_size):
+        chunk = candles[max(0, start - PATTERN_WARMUP) : start + chunk_size]
+        jobs.append((chunk, int(candles["timestamp"][start])))
+    if processes > 0 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            parts = list(pool.map(_detect_chunk, jobs))
+    else:
+        parts = [_detect_chunk(job) for job in jobs]
+    if not parts:
+        return np.empty(0, dtype=EVENT_DTYPE)
+    return np.concatenate(parts)
+
+
+@dataclass
+class PatternIndex:
+    """Persistable pattern events of one symbol/interval, queryable by time window"""
+
+    events: np.ndarray
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, **kwargs) -> "PatternIndex":
+        return cls(build_pattern_events(frame_to_candles(df), **kwargs))
+
+    def window(self, start: int, end: int) -> np.ndarray:
+        """Events with timestamp in [start, end] (ms since epoch)"""
+        timestamps = self.events["timestamp"]
+        lo = np.searchsorted(timestamps, start, side="left")
+        hi = np.searchsorted(timestamps, end, side="right")
+        return self.events[lo:hi]
+
+    def to_frame(self, events: np.ndarray | None = None) -> pd.DataFrame:
+        """Events as a (timestamp, pattern, direction) frame with pattern names"""
+        events = self.events if events is None else events
+        return pd.DataFrame(
+            {
+                "timestamp": pd.to_datetime(events["timestamp"], unit="ms"),
+                "pattern": np.asarray(PATTERN_NAMES)[events["pattern"]],
+                "direction": events["direction"],
+            }
+        )
+
+    def save(self, path: Path, coverage: np.ndarray | None = None) -> None:
+        """Save to an .npz file, `coverage` is the [first, last] candle timestamp"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {"events": self.events, "names": np.asarray(PATTERN_NAMES)}
+        if coverage is not None:
+            arrays["coverage"] = coverage
+        # Names are stored with the events, so codes stay valid if the list changes
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: Path) -> "PatternIndex":
+        with np.load(path) as data:
+            events, names = data["events"], list(data["names"])
+        if names != PATTERN_NAMES:
+            remap = np.array([PATTERN_NAMES.index(name) for name in names])
+            events = events.copy()
+            events["pattern"] = remap[events["pattern"]]
+        return cls(events)
+
+
+def pattern_index_path(
+    symbol: str,
+    interval: str,
+    category: str = Config.CATEGORY,
+    root: Path = Config.PATTERN_INDEX_DIR,
+) -> Path:
+    return Path(root) / symbol / category / f"{interval}.npz"
+
+
+def load_pattern_index(
+    symbol: str,
+    interval: str,
+    df: pd.DataFrame,
+    processes: int = 0,
+) -> PatternIndex:
+    """
+    Pattern index of `df` for `symbol`/`interval`, from disk if a saved index covers
+    the same first and last candles, otherwise built from `df` and saved.
+    """
+    path = pattern_index_path(symbol, interval)
+    candles = frame_to_candles(df)
+    coverage = np.array([candles["timestamp"][0], candles["timestamp"][-1]])
+    if path.exists():
+        with np.load(path) as data:
+            saved_coverage = data["coverage"] if "coverage" in data else None
+        if saved_coverage is not None and np.array_equal(saved_coverage, coverage):
+            return PatternIndex.load(path)
+    index = PatternIndex(build_pattern_events(candles, processes=processes))
+    index.save(path, coverage=coverage)
+    return index
+
+
+def format_pattern_events(events: np.ndarray) -> str:
+    """Events as text, one line per candle: `<timestamp>: Hammer ↑, Doji 10 0.1 ↑`"""
+    if len(events) == 0:
+        return "No candlestick patterns detected in the analyzed period."
+    names = np.array(
+        [name.replace("CDL_", "").replace("_", " ").title() for name in PATTERN_NAMES]
+    )
+    labels = np.char.add(
+        np.char.add(names[events["pattern"]], " "),
+        np.where(events["direction"] > 0, "↑", "↓"),
+    )
+    timestamps, starts = np.unique(events["timestamp"], return_index=True)
+    result_lines = ["Candlestick Patterns Detected:\n"]
+    for timestamp, group in zip(
+        pd.to_datetime(timestamps, unit="ms"), np.split(labels, starts[1:])
+    ):
+        result_lines.append(f"{timestamp}: {', '.join(group)}")
+    return "\n".join(result_lines)
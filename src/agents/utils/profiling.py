@@ -0,0 +1,283 @@
+import contextvars
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Iterator, TypeVar
+import numpy as np
+import pandas as pd
+from pydantic_core import to_json
+from src.agents.utils.telemetry import telemetry_enabled
+
+if TYPE_CHECKING:
+    from pydantic_ai.messages import ModelMessage
+
+T = TypeVar("T")
+
+# Rough size of a token in characters of JSON/text, for tool payload estimates
+CHARS_PER_TOKEN = 4
+# Price of prompt cache reads and writes relative to uncached input tokens
+CACHE_READ_PRICE = 0.1
+CACHE_WRITE_PRICE = 1.25
+
+
+@dataclass
+class StageRecord:
+    stage: str
+    start: float  # seconds since the start of the profile
+    duration: float  # seconds
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Profile:
+    """
+    Timed stages of one analysis, e.g. one backtest sample.
+
+    Stages are recorded by `profile_stage` while the profile is active, see
+    `profiling`. Counters hold totals such as LLM tokens.
+    """
+
+    name: str
+    stages: list[StageRecord] = field(default_factory=list)
+    counters: dict[str, float] = field(default_factory=dict)
+    tools: dict[str, dict[str, float]] = field(default_factory=dict)
+    _t0: float = field(default_factory=time.perf_counter, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add_stage(self, record: StageRecord) -> None:
+        with self._lock:
+            self.stages.append(record)
+
+    def count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def stage_totals(self) -> dict[str, float]:
+        """Total seconds per stage name (a stage may run several times)"""
+        totals: dict[str, float] = {}
+        for record in self.stages:
+            totals[record.stage] = totals.get(record.stage, 0.0) + record.duration
+        return totals
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "stages": [asdict(record) for record in self.stages],
+            "totals": self.stage_totals(),
+            "counters": self.counters,
+            "tools": self.tools,
+        }
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2, default=str))
+
+
+# Copied into threads started with `asyncio.to_thread`, so the stages of a sample
+# prepared in a worker thread land in that sample's profile
+_current_profile: contextvars.ContextVar[Profile | None] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+
+def current_profile() -> Profile | None:
+    return _current_profile.get()
+
+
+@contextmanager
+def profiling(name: str) -> Iterator[Profile]:
+    """Record the stages run in this context (and its tasks/threads) to a profile"""
+    profile = Profile(name)
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+@contextmanager
+def profile_stage(stage: str, **attributes: Any) -> Iterator[dict[str, Any]]:
+    """
+    Time a pipeline stage as a logfire span (once telemetry is configured) and, if
+    a profile is active, as a `StageRecord`. Sizes known only at the end (rows,
+    bytes) can be set on the yielded dict.
+    """
+    profile = _current_profile.get()
+    start = time.perf_counter()
+    if telemetry_enabled():
+        import logfire
+
+        span_context: Any = logfire.span(stage, **attributes)
+    else:
+        span_context = nullcontext()
+    with span_context as span:
+        try:
+            yield attributes
+        finally:
+            duration = time.perf_counter() - start
+            if span is not None:
+                span.set_attributes(attributes)
+            if profile is not None:
+                profile.add_stage(
+                    StageRecord(stage, start - profile._t0, duration, attributes)
+                )
+
+
+def profiled(stage: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorator running the whole function as `profile_stage(stage)`"""
+
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile_stage(stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def payload_size(value: Any) -> int:
+    """Characters of a tool result as serialized for the model"""
+    if isinstance(value, str):
+        return len(value)
+    return len(to_json(value, fallback=str))
+
+
+def record_llm_usage(messages: "list[ModelMessage]") -> None:
+    """
+    Add the LLM usage of an agent run to the active profile: total tokens, prompt
+    cache usage (see `prompt_cache_stats`), and per tool the number of calls,
+    payload characters and input tokens.
+
+    A tool's input tokens are the growth of the prompt between the model request
+    that returned the tool results and the previous one, split between the tools of
+    that request by payload size. Tools answered with no later model call only get
+    an estimate from their payload size.
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        return
+    from pydantic_ai.messages import ModelRequest, ModelResponse, ToolReturnPart
+
+    tools = profile.tools
+    prev_tokens: int | None = None
+    pending: list[tuple[str, int]] = []
+    for message in messages:
+        if isinstance(message, ModelRequest):
+            for part in message.parts:
+                if isinstance(part, ToolReturnPart):
+                    pending.append((part.tool_name, payload_size(part.content)))
+        elif isinstance(message, ModelResponse):
+            usage = message.usage
+            profile.count("llm_requests")
+            profile.count("input_tokens", usage.input_tokens)
+            profile.count("output_tokens", usage.output_tokens)
+            added = (
+                usage.input_tokens - prev_tokens if prev_tokens is not None else None
+            )
+            _attribute_tool_tokens(tools, pending, added)
+            pending = []
+            prev_tokens = usage.input_tokens + usage.output_tokens
+    _attribute_tool_tokens(tools, pending, None)
+    for name, value in prompt_cache_stats(messages).items():
+        profile.count(name, value)
+
+
+def prompt_cache_stats(messages: "list[ModelMessage]") -> dict[str, float]:
+    """
+    Prompt cache usage of an agent run: tokens read from and written to the
+    provider's cache, requests that read from it (hits) or not (misses), and the
+    input tokens saved, net of the cache write premium.
+    """
+    from pydantic_ai.messages import ModelResponse
+
+    stats = {
+        "prompt_cache_hits": 0.0,
+        "prompt_cache_misses": 0.0,
+        "cache_read_tokens": 0.0,
+        "cache_write_tokens": 0.0,
+    }
+    for message in messages:
+        if not isinstance(message, ModelResponse):
+            continue
+        usage = message.usage
+        # Anthropic's own fields, when the usage was not mapped to the common ones
+        read = usage.cache_read_tokens or usage.details.get(
+            "cache_read_input_tokens", 0
+        )
+        write = usage.cache_write_tokens or usage.details.get(
+            "cache_creation_input_tokens", 0
+        )
+        stats["prompt_cache_hits" if read else "prompt_cache_misses"] += 1
+        stats["cache_read_tokens"] += read
+        stats["cache_write_tokens"] += write
+    stats["input_tokens_saved"] = stats["cache_read_tokens"] * (
+        1 - CACHE_READ_PRICE
+    ) - stats["cache_write_tokens"] * (CACHE_WRITE_PRICE - 1)
+    return stats
+
+
+def _attribute_tool_tokens(
+    tools: dict[str, dict[str, float]],
+    returns: list[tuple[str, int]],
+    added_tokens: int | None,
+) -> None:
+    total_chars = sum(chars for _, chars in returns)
+    for name, chars in returns:
+        stats = tools.setdefault(
+            name, {"calls": 0, "payload_chars": 0, "input_tokens": 0}
+        )
+        stats["calls"] += 1
+        stats["payload_chars"] += chars
+        if added_tokens is not None and total_chars > 0:
+            stats["input_tokens"] += max(added_tokens, 0) * chars / total_chars
+        else:
+            stats["input_tokens"] += chars / CHARS_PER_TOKEN
+
+
+def stage_breakdown(profiles: list[Profile]) -> pd.DataFrame:
+    """Seconds per stage (columns) and profile (rows), NaN where a stage did not run"""
+    return pd.DataFrame.from_dict(
+        {profile.name: profile.stage_totals() for profile in profiles},
+        orient="index",
+    )
+
+
+def stage_percentiles(
+    breakdown: pd.DataFrame, percentiles: tuple[float, ...] = (50, 90, 99)
+) -> pd.DataFrame:
+    """Count, mean and percentiles of the seconds of every stage"""
+    stats = {}
+    for stage, seconds in breakdown.items():
+        values = seconds.dropna().to_numpy()
+        if len(values) == 0:
+            continue
+        stats[stage] = {
+            "count": len(values),
+            "mean": float(values.mean()),
+            **{f"p{p:g}": float(np.percentile(values, p)) for p in percentiles},
+            "max": float(values.max()),
+        }
+    return pd.DataFrame.from_dict(stats, orient="index").sort_values(
+        "mean", ascending=False
+    )
+
+
+def load_profiles(folder: Path, pattern: str = "*/profile.json") -> list[Profile]:
+    """Profiles saved with `Profile.save` under `folder`"""
+    profiles = []
+    for path in sorted(folder.glob(pattern)):
+        data = json.loads(path.read_text())
+        profile = Profile(
+            data["name"],
+            stages=[StageRecord(**record) for record in data["stages"]],
+            counters=data["counters"],
+            tools=data["tools"],
+        )
+        profiles.append(profile)
+    return profiles
@@ -0,0 +1,88 @@
+import contextvars
+from typing import Any
+from pydantic_ai.messages import ModelMessage
+from pydantic_ai.models import ModelRequestParameters
+from pydantic_ai.models.anthropic import AnthropicModel, AnthropicModelSettings
+
+# Anthropic caches a prompt prefix up to each block marked with this, 5 min TTL
+CACHE_CONTROL = {"type": "ephemeral"}
+MAX_CACHE_BREAKPOINTS = 4
+
+
+class PromptCachingSettings(AnthropicModelSettings, total=False):
+    """
+    `AnthropicModelSettings` with prompt cache breakpoints:
+
+        anthropic_cache_tool_definitions: cache the tool schemas (last tool)
+        anthropic_cache_instructions: cache tools and system prompt
+        anthropic_cache_messages: cache the conversation so far (last message),
+            so each tool calling turn of a run re-reads the charts from the cache
+    """
+
+    anthropic_cache_tool_definitions: bool
+    anthropic_cache_instructions: bool
+    anthropic_cache_messages: bool
+
+
+# Settings of the request being mapped, the mapping methods don't receive them
+_request_settings: contextvars.ContextVar[dict[str, Any]] = contextvars.ContextVar(
+    "prompt_cache_settings", default={}
+)
+
+
+class PromptCachingAnthropicModel(AnthropicModel):
+    """
+    `AnthropicModel` adding `cache_control` breakpoints to the request as enabled
+    by `PromptCachingSettings`. The cache reads and writes come back in the usage
+    details, see `profiling.prompt_cache_stats`.
+
+    Overrides private methods of `AnthropicModel` 1.0.x, and later pydantic-ai
+    releases may add settings of the same names, pyproject pins pydantic-ai<1.1
+    until this is checked against a newer version.
+    """
+
+    async def _messages_create(
+        self,
+        messages: list[ModelMessage],
+        stream: bool,
+        model_settings: AnthropicModelSettings,
+        model_request_parameters: ModelRequestParameters,
+    ) -> Any:
+        token = _request_settings.set(dict(model_settings))
+        try:
+            return await super()._messages_create(  # pyright: ignore[reportCallIssue]
+                messages,
+                stream,  # pyright: ignore[reportArgumentType]
+                model_settings,
+                model_request_parameters,
+            )
+        finally:
+            _request_settings.reset(token)
+
+    def _get_tools(self, model_request_parameters: ModelRequestParameters) -> Any:
+        tools = super()._get_tools(model_request_parameters)
+        if tools and _request_settings.get().get("anthropic_cache_tool_definitions"):
+            tools[-1] = {**tools[-1], "cache_control": CACHE_CONTROL}
+        return tools
+
+    async def _map_message(self, messages: list[ModelMessage]) -> Any:
+        system_prompt, anthropic_messages = await super()._map_message(messages)
+        settings = _request_settings.get()
+        breakpoints = int(bool(settings.get("anthropic_cache_tool_definitions")))
+        system: Any = system_prompt
+        if system_prompt and settings.get("anthropic_cache_instructions"):
+            system = [
+                {"type": "text", "text": system_prompt, "cache_control": CACHE_CONTROL}
+            ]
+            breakpoints += 1
+        if (
+            anthropic_messages
+            and settings.get("anthropic_cache_messages")
+            and breakpoints < MAX_CACHE_BREAKPOINTS
+        ):
+            last = anthropic_messages[-1]
+            content = last["content"]
+            if isinstance(content, list) and content:
+                block = {**content[-1], "cache_control": CACHE_CONTROL}  # pyright: ignore[reportGeneralTypeIssues]
+                last["content"] = [*content[:-1], block]  # pyright: ignore[reportGeneralTypeIssues]
+        return system, anthropic_messages
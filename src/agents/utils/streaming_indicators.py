@@ -0,0 +1,151 @@
+import math
+from typing import Protocol
+from src.agents.utils.candle_store import DAY_MS
+
+# Incremental counterparts of the `indicator_engine` indicators. Every update is O(1)
+# and the values follow the same conventions (SMA-seeded EMA/RMA, true range from the
+# second candle), so a stream replayed from the first candle gives the panel's values.
+
+
+class StreamingIndicator(Protocol):
+    def update(self, candle) -> dict[str, float]:
+        """Consume one closed candle (a `CANDLE_DTYPE` record), return current values"""
+        ...
+
+
+class _SeededEMA:
+    """Exponential average seeded with the SMA of its first `length` inputs"""
+
+    def __init__(self, length: int, alpha: float):
+        self.length = length
+        self.alpha = alpha
+        self.value = math.nan
+        self._count = 0
+        self._seed_sum = 0.0
+
+    def update(self, x: float) -> float:
+        if math.isnan(x):
+            return self.value
+        if self._count < self.length:
+            self._count += 1
+            self._seed_sum += x
+            if self._count == self.length:
+                self.value = self._seed_sum / self.length
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+
+class StreamingEMA:
+    def __init__(self, length: int = 20):
+        self.name = f"EMA_{length}"
+        self._ema = _SeededEMA(length, 2 / (length + 1))
+
+    def update(self, candle) -> dict[str, float]:
+        return {self.name: self._ema.update(float(candle["close"]))}
+
+
+class StreamingRSI:
+    def __init__(self, length: int = 14):
+        self.name = f"RSI_{length}"
+        self._gain = _SeededEMA(length, 1 / length)
+        self._loss = _SeededEMA(length, 1 / length)
+        self._prev_close = math.nan
+
+    def update(self, candle) -> dict[str, float]:
+        close = float(candle["close"])
+        first = math.isnan(self._prev_close)
+        # The first candle has no change, it counts as 0 gain and 0 loss as in the panel
+        change = 0.0 if first else close - self._prev_close
+        self._prev_close = close
+        gain = self._gain.update(max(change, 0.0))
+        loss = self._loss.update(max(-change, 0.0))
+        if first or math.isnan(gain) or gain + loss == 0:
+            return {self.name: math.nan}
+        return {self.name: 100 * gain / (gain + loss)}
+
+
+class StreamingATR:
+    def __init__(self, length: int = 14):
+        self.name = f"ATRr_{length}"
+        self._rma = _SeededEMA(length, 1 / length)
+        self._prev_close = math.nan
+
+    def update(self, candle) -> dict[str, float]:
+        high, low = float(candle["high"]), float(candle["low"])
+        if math.isnan(self._prev_close):
+            true_range = math.nan
+        else:
+            true_range = max(
+                high - low, abs(high - self._prev_close), abs(low - self._prev_close)
+            )
+        self._prev_close = float(candle["close"])
+        return {self.name: self._rma.update(true_range)}
+
+
+class StreamingOBV:
+    def __init__(self):
+        self.value = 0.0
+        self._prev_close = math.nan
+
+    def update(self, candle) -> dict[str, float]:
+        close, volume = float(candle["close"]), float(candle["volume"])
+        if math.isnan(self._prev_close) or close > self._prev_close:
+            self.value += volume
+        elif close < self._prev_close:
+            self.value -= volume
+        self._prev_close = close
+        return {"OBV": self.value}
+
+
+class StreamingVWAP:
+    """VWAP anchored to UTC days"""
+
+    def __init__(self):
+        self._day: int | None = None
+        self._cum_wp = 0.0
+        self._cum_vol = 0.0
+
+    def update(self, candle) -> dict[str, float]:
+        day = int(candle["timestamp"]) // DAY_MS
+        if day != self._day:
+            self._day = day
+            self._cum_wp = self._cum_vol = 0.0
+        typical = (
+            float(candle["high"]) + float(candle["low"]) + float(candle["close"])
+        ) / 3
+        volume = float(candle["volume"])
+        self._cum_wp += typical * volume
+        self._cum_vol += volume
+        vwap = self._cum_wp / self._cum_vol if self._cum_vol else math.nan
+        return {"VWAP_D": vwap}
+
+
+class StreamingMACD:
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self._props = f"_{fast}_{slow}_{signal}"
+        self._fast = _SeededEMA(fast, 2 / (fast + 1))
+        self._slow = _SeededEMA(slow, 2 / (slow + 1))
+        self._signal = _SeededEMA(signal, 2 / (signal + 1))
+
+    def update(self, candle) -> dict[str, float]:
+        close = float(candle["close"])
+        macd = self._fast.update(close) - self._slow.update(close)
+        signal = self._signal.update(macd)
+        return {
+            f"MACD{self._props}": macd,
+            f"MACDh{self._props}": macd - signal,
+            f"MACDs{self._props}": signal,
+        }
+
+
+def default_streaming_indicators() -> list[StreamingIndicator]:
+    """Streaming versions of the panel indicators, with the tools' default params"""
+    return [
+        StreamingRSI(),
+        StreamingEMA(),
+        StreamingMACD(),
+        StreamingATR(),
+        StreamingOBV(),
+        StreamingVWAP(),
+    ]
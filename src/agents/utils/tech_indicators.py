@@ -1,20 +1,54 @@
-from typing import Dict, Hashable, Any
+import dataclasses
+import re
+from typing import Any
 import pandas as pd
 import pandas_ta as ta
 from pydantic_ai import RunContext
+from pydantic_ai.tools import ToolDefinition
 from src.agents.analysts.models import AgentsDeps
+from src.agents.utils.indicator_cache import memoized_indicator
+from src.agents.utils.indicator_payload import COMPACT_RETURNS, compact_payload
+from src.agents.utils.candle_store import frame_to_candles
+from src.agents.utils.profiling import profile_stage
+from src.agents.utils.pattern_index import (
+    detect_pattern_events,
+    format_pattern_events,
+)
 
 
 def get_dataframe(ctx: RunContext[AgentsDeps]) -> pd.DataFrame:
     """Load OHLC candlestick data with columns: open, high, low, close, volume"""
-    df = pd.read_csv(ctx.deps.df_candle_path, parse_dates=True, index_col="timestamp")
+    with profile_stage("get_dataframe") as stage:
+        df = ctx.deps.candles()
+        stage["rows"] = len(df)
     return df
 
 
+async def describe_payload(
+    ctx: RunContext[AgentsDeps], tool_def: ToolDefinition
+) -> ToolDefinition:
+    """
+    Tool `prepare` hook: the docstrings describe the full payload, in compact mode
+    the description's returns section is swapped for the compact shape.
+    """
+    if ctx.deps.payload_format != "compact" or tool_def.description is None:
+        return tool_def
+    description, found = re.subn(
+        r"<returns>.*</returns>",
+        f"<returns>\n<description>{COMPACT_RETURNS}</description>\n</returns>",
+        tool_def.description,
+        flags=re.DOTALL,
+    )
+    if not found:
+        description += f"\n\nReturns: {COMPACT_RETURNS}"
+    return dataclasses.replace(tool_def, description=description)
+
+
 # --- MOMENTUM INDICATORS ---
 
 
-def calculate_rsi(ctx: RunContext[AgentsDeps], length: int = 14) -> dict[str, Hashable]:
+@memoized_indicator
+def calculate_rsi(ctx: RunContext[AgentsDeps], length: int = 14) -> dict[str, Any]:
     """
     Calculate RSI (Relative Strength Index) momentum oscillator.
 
@@ -25,27 +59,26 @@ def calculate_rsi(ctx: RunContext[AgentsDeps], length: int = 14) -> dict[str, Ha
         length: Lookback period for calculation. Default 14. Common values: 7, 14, 21
 
     Returns:
-        Structured dictionary containing:
-        - statistics: Statistical summary (min, max, mean, std, current_value)
-        - raw_values: Complete list of RSI values
+        Dict with 'overall_stats' (current, min, max, mean, std) and 'raw_values'
+        (RSI values by datetime)
     """
     df = get_dataframe(ctx=ctx)
     result = ta.rsi(close=df["close"], length=length).dropna().round(2)
+    if ctx.deps.payload_format == "compact":
+        return compact_payload(result.rename("rsi"), tail=ctx.deps.payload_tail)
     rsi_values = result.tolist()
     valid_rsi = [v for v in rsi_values if not (isinstance(v, float) and v != v)]
     # Calculate statistics
     current_rsi = valid_rsi[-1]
+    # Mean computed once, summing it per element made the std quadratic
+    mean_rsi = sum(valid_rsi) / len(valid_rsi)
     statistics = {
         "current": round(current_rsi, 2),
         "min": round(min(valid_rsi), 2),
         "max": round(max(valid_rsi), 2),
-        "mean": round(sum(valid_rsi) / len(valid_rsi), 2),
+        "mean": round(mean_rsi, 2),
         "std": round(
-            (
-                sum((x - sum(valid_rsi) / len(valid_rsi)) ** 2 for x in valid_rsi)
-                / len(valid_rsi)
-            )
-            ** 0.5,
+            (sum((x - mean_rsi) ** 2 for x in valid_rsi) / len(valid_rsi)) ** 0.5,
             2,
         ),
     }
@@ -54,9 +87,10 @@ def calculate_rsi(ctx: RunContext[AgentsDeps], length: int = 14) -> dict[str, Ha
     return output
 
 
+@memoized_indicator
 def calculate_stochastic(
     ctx: RunContext[AgentsDeps], k: int = 14, d: int = 3, smooth_k: int = 3
-) -> Dict[Hashable, Any]:
+) -> dict[str, Any]:
     """
     Calculate Stochastic Oscillator momentum indicator.
 
@@ -84,18 +118,20 @@ def calculate_stochastic(
         .dropna()
         .round(2)
     )
+    columns = [f"STOCHk_{k}_{d}_{smooth_k}", f"STOCHd_{k}_{d}_{smooth_k}"]
+    if ctx.deps.payload_format == "compact":
+        return compact_payload(result[columns], tail=ctx.deps.payload_tail)
     result.index = result.index.astype(str)
-    return result[
-        [f"STOCHk_{k}_{d}_{smooth_k}", f"STOCHd_{k}_{d}_{smooth_k}"]
-    ].to_dict()
+    return result[columns].to_dict()
 
 
 # --- TREND INDICATORS ---
 
 
+@memoized_indicator
 def calculate_macd(
     ctx: RunContext[AgentsDeps], fast: int = 12, slow: int = 26, signal: int = 9
-) -> Dict[str, dict[Any, Any]]:
+) -> dict[str, Any]:
     """
     Calculate MACD (Moving Average Convergence Divergence) trend indicator.
 
@@ -116,6 +152,15 @@ def calculate_macd(
         .dropna()
         .round(2)
     )
+    if ctx.deps.payload_format == "compact":
+        columns = {
+            f"MACD_{fast}_{slow}_{signal}": "macd",
+            f"MACDs_{fast}_{slow}_{signal}": "signal",
+            f"MACDh_{fast}_{slow}_{signal}": "histogram",
+        }
+        return compact_payload(
+            result[list(columns)].rename(columns=columns), tail=ctx.deps.payload_tail
+        )
     result.index = result.index.astype(str)
     return {
         "macd": result[f"MACD_{fast}_{slow}_{signal}"].to_dict(),
@@ -124,7 +169,8 @@ def calculate_macd(
     }
 
 
-def calculate_ema(ctx: RunContext[AgentsDeps], length: int = 20) -> dict[Hashable, Any]:
+@memoized_indicator
+def calculate_ema(ctx: RunContext[AgentsDeps], length: int = 20) -> dict[str, Any]:
     """
     Calculate EMA (Exponential Moving Average).
 
@@ -139,13 +185,16 @@ def calculate_ema(ctx: RunContext[AgentsDeps], length: int = 20) -> dict[Hashabl
     """
     df = get_dataframe(ctx=ctx)
     result = ta.ema(close=df["close"], length=length).dropna().round(2)
+    if ctx.deps.payload_format == "compact":
+        return compact_payload(result.rename("ema"), tail=ctx.deps.payload_tail)
     result.index = result.index.astype(str)
     return result.to_dict()
 
 
+@memoized_indicator
 def calculate_supertrend(
     ctx: RunContext[AgentsDeps], length: int = 10, multiplier: float = 3.0
-) -> Dict[Hashable, Any]:
+) -> dict[str, Any]:
     """
     Calculate Supertrend indicator for trend following.
 
@@ -171,6 +220,16 @@ def calculate_supertrend(
         .dropna()
         .round(2)
     )
+    if ctx.deps.payload_format == "compact":
+        columns = {
+            f"SUPERT_{length}_{multiplier}": "trend",
+            f"SUPERTd_{length}_{multiplier}": "direction",
+            f"SUPERTl_{length}_{multiplier}": "long",
+            f"SUPERTs_{length}_{multiplier}": "short",
+        }
+        return compact_payload(
+            result[list(columns)].rename(columns=columns), tail=ctx.deps.payload_tail
+        )
     result.index = result.index.astype(str)
     return {
         "trend": result[f"SUPERT_{length}_{multiplier}"].to_dict(),
@@ -183,9 +242,10 @@ def calculate_supertrend(
 # --- VOLATILITY INDICATORS ---
 
 
+@memoized_indicator
 def calculate_bollinger_bands(
     ctx: RunContext[AgentsDeps], length: int = 20
-) -> Dict[Hashable, Any]:
+) -> dict[str, Any]:
     """
     Calculate Bollinger Bands volatility indicator.
 
@@ -200,6 +260,16 @@ def calculate_bollinger_bands(
     """
     df = get_dataframe(ctx=ctx)
     result = ta.bbands(close=df["close"], length=length).dropna().round(2)
+    if ctx.deps.payload_format == "compact":
+        columns = {
+            f"BBU_{length}_2.0_2.0": "upper",
+            f"BBM_{length}_2.0_2.0": "middle",
+            f"BBL_{length}_2.0_2.0": "lower",
+            f"BBB_{length}_2.0_2.0": "bandwidth",
+        }
+        return compact_payload(
+            result[list(columns)].rename(columns=columns), tail=ctx.deps.payload_tail
+        )
     result.index = result.index.astype(str)
 
     return {
@@ -210,7 +280,8 @@ def calculate_bollinger_bands(
     }
 
 
-def calculate_atr(ctx: RunContext[AgentsDeps], length: int = 14) -> dict[Hashable, Any]:
+@memoized_indicator
+def calculate_atr(ctx: RunContext[AgentsDeps], length: int = 14) -> dict[str, Any]:
     """
     Calculate ATR (Average True Range) volatility indicator.
 
@@ -229,6 +300,8 @@ def calculate_atr(ctx: RunContext[AgentsDeps], length: int = 14) -> dict[Hashabl
         .dropna()
         .round(2)
     )
+    if ctx.deps.payload_format == "compact":
+        return compact_payload(result.rename("atr"), tail=ctx.deps.payload_tail)
     result.index = result.index.astype(str)
 
     return result.to_dict()
@@ -237,9 +310,10 @@ def calculate_atr(ctx: RunContext[AgentsDeps], length: int = 14) -> dict[Hashabl
 # --- VOLUME INDICATORS ---
 
 
+@memoized_indicator
 def calculate_obv(
     ctx: RunContext[AgentsDeps],
-) -> dict[Any, Hashable]:
+) -> dict[str, Any]:
     """
     Calculate OBV (On-Balance Volume) momentum indicator.
 
@@ -251,14 +325,17 @@ def calculate_obv(
     """
     df = get_dataframe(ctx=ctx)
     result = ta.obv(close=df["close"], volume=df["volume"]).dropna().round(2)
+    if ctx.deps.payload_format == "compact":
+        return compact_payload(result.rename("obv"), tail=ctx.deps.payload_tail)
     result.index = result.index.astype(str)
 
     return result.to_dict()
 
 
+@memoized_indicator
 def calculate_vwap(
     ctx: RunContext[AgentsDeps],
-) -> dict[Hashable, Any]:
+) -> dict[str, Any]:
     """
     Calculate VWAP (Volume Weighted Average Price).
 
@@ -274,6 +351,8 @@ def calculate_vwap(
         .dropna()
         .round(2)
     )
+    if ctx.deps.payload_format == "compact":
+        return compact_payload(result.rename("vwap"), tail=ctx.deps.payload_tail)
     result.index = result.index.astype(str)
     return result.to_dict()
 
@@ -281,6 +360,7 @@ def calculate_vwap(
 # --- CANDLE PATTERN INDICATORS ---
 
 
+@memoized_indicator
 def calculate_cdl_pattern(
     ctx: RunContext[AgentsDeps],
 ) -> str:
@@ -297,28 +377,7 @@ def calculate_cdl_pattern(
         Returns "No candlestick patterns detected." if none found.
     """
     df = get_dataframe(ctx=ctx)
-    res = ta.cdl_pattern(
-        open_=df["open"], high=df["high"], low=df["low"], close=df["close"]
-    )
-    res = res.loc[:, (res != 0).any()]
-    patterns_df = res[(res != 0).any(axis=1)]
-    # If no patterns detected
-    if patterns_df.empty:
-        return "No candlestick patterns detected in the analyzed period."
-    result_lines = ["Candlestick Patterns Detected:\n"]
-
-    for timestamp, row in patterns_df.iterrows():
-        patterns_found = []
-        for pattern_name, value in row.items():
-            if value != 0:
-                clean_name = pattern_name.replace("CDL_", "").replace("_", " ").title()  # pyright: ignore[reportAttributeAccessIssue]
-                signal = "↑" if value > 0 else "↓"
-                patterns_found.append(f"{clean_name} {signal}")
-
-        if patterns_found:
-            result_lines.append(f"{timestamp}: {', '.join(patterns_found)}")
-
-    return "\n".join(result_lines)
+    return format_pattern_events(detect_pattern_events(frame_to_candles(df)))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,26 @@
+import threading
+
+_lock = threading.Lock()
+_service_name: str | None = None
+
+
+def configure_telemetry(service_name: str) -> None:
+    """
+    Configure logfire and instrument pydantic-ai, once per process.
+
+    Called by the agent factories on first use, so importing a module never
+    configures telemetry. Later calls keep the first service name.
+    """
+    global _service_name
+    with _lock:
+        if _service_name is not None:
+            return
+        import logfire
+
+        logfire.configure(service_name=service_name)
+        logfire.instrument_pydantic_ai()
+        _service_name = service_name
+
+
+def telemetry_enabled() -> bool:
+    return _service_name is not None
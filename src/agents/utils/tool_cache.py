@@ -0,0 +1,44 @@
+from dataclasses import dataclass, field
+from typing import Any
+from pydantic_ai import RunContext
+from pydantic_ai.toolsets import WrapperToolset
+from pydantic_ai.toolsets.abstract import ToolsetTool
+from src.agents.utils.ttl_cache import TTLCache
+
+
+@dataclass
+class CachedToolset(WrapperToolset[Any]):
+    """
+    Toolset serving tool results from a `TTLCache`, keyed by (toolset id, tool
+    name, arguments), e.g. to share MCP lookups between analyses of many symbols.
+
+    `ttl_by_tool` overrides the cache's TTL per tool name, 0 disables caching of
+    a tool. Errors are never cached, nor results that are not JSON-able (images).
+
+    Tools are only called by the run itself (stale entries are refreshed before
+    returning, never in the background): the call needs the MCP server leased by
+    the run, which must not outlive the lease. A stale entry is served if its
+    refresh fails.
+    """
+
+    cache: TTLCache = field(kw_only=True)
+    ttl_by_tool: dict[str, float] = field(default_factory=dict, kw_only=True)
+
+    async def call_tool(
+        self,
+        name: str,
+        tool_args: dict[str, Any],
+        ctx: RunContext[Any],
+        tool: ToolsetTool[Any],
+    ) -> Any:
+        ttl = self.ttl_by_tool.get(name, self.cache.ttl)
+        if ttl <= 0:
+            return await super().call_tool(name, tool_args, ctx, tool)
+
+        async def compute() -> Any:
+            return await super(CachedToolset, self).call_tool(
+                name, tool_args, ctx, tool
+            )
+
+        key = self.cache.key(self.wrapped.id or self.wrapped.label, name, tool_args)
+        return await self.cache.get_or_compute(key, compute, ttl=ttl, detached=False)
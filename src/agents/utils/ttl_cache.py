@@ -0,0 +1,200 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    created: float  # unix seconds
+
+    def age(self) -> float:
+        return time.time() - self.created
+
+
+class TTLCache:
+    """
+    JSON values with a time to live, stored as files under `<root>/<key[:2]>/<key>.json`
+    so worker processes on the same disk share them.
+
+    Entries younger than `ttl` are fresh. Up to `ttl + stale_ttl` they are stale:
+    still served, while one background task refreshes them (stale-while-revalidate).
+    A lock file next to the entry keeps other workers from refreshing it too.
+    Older entries are recomputed before returning.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        ttl: float,
+        stale_ttl: float = 0.0,
+        refresh_lock_seconds: float = 300.0,
+    ):
+        self.root = Path(root)
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.refresh_lock_seconds = refresh_lock_seconds
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._background: set[asyncio.Task] = set()
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        data = json.dumps(parts, sort_keys=True, default=str).encode()
+        return hashlib.sha256(data).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> CacheEntry | None:
+        try:
+            data = json.loads(self._path(key).read_bytes())
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(data["value"], data["created"])
+
+    def put(self, key: str, value: Any) -> None:
+        """Store `value`, raises `TypeError` if it is not JSON-able"""
+        data = json.dumps({"value": value, "created": time.time()})
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(data)
+        os.replace(tmp_path, path)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: float | None = None,
+        stale_ttl: float | None = None,
+        detached: bool = True,
+    ) -> Any:
+        """
+        Cached value of `key`, computed by `compute` on a miss. Concurrent misses of
+        one key in this process share a single computation.
+
+        With `detached=False`, `compute` only ever runs in the caller's task, e.g.
+        when it uses resources the caller holds: a stale entry is refreshed before
+        returning (and served if that fails), misses are not shared.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        entry = self.get(key)
+        if entry is not None:
+            age = entry.age()
+            if age < ttl:
+                self.hits += 1
+                return entry.value
+            if age < ttl + stale_ttl:
+                self.stale_hits += 1
+                if not detached:
+                    return await self._refresh_here(key, compute, entry)
+                self._refresh_in_background(key, compute)
+                return entry.value
+        self.misses += 1
+        if not detached:
+            return await self._refresh_here(key, compute, None)
+        return await asyncio.shield(self._compute(key, compute))
+
+    async def _refresh_here(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        stale: CacheEntry | None,
+    ) -> Any:
+        try:
+            value = await compute()
+        except Exception as exc:
+            if stale is None:
+                raise
+            logger.warning("Refresh of %s failed, serving stale: %r", key, exc)
+            return stale.value
+        try:
+            self.put(key, value)
+        except TypeError:
+            logger.debug("Value of %s is not JSON-able, not cached", key)
+        return value
+
+    def _compute(
+        self, key: str, compute: Callable[[], Awaitable[Any]], locked: bool = False
+    ) -> asyncio.Task:
+        if key in self._inflight:
+            return self._inflight[key]
+
+        async def run() -> Any:
+            try:
+                value = await compute()
+                try:
+                    self.put(key, value)
+                except TypeError:
+                    logger.debug("Value of %s is not JSON-able, not cached", key)
+                return value
+            finally:
+                self._inflight.pop(key, None)
+                if locked:
+                    self._lock_path(key).unlink(missing_ok=True)
+
+        task = asyncio.create_task(run())
+        self._inflight[key] = task
+        return task
+
+    def _refresh_in_background(
+        self, key: str, compute: Callable[[], Awaitable[Any]]
+    ) -> None:
+        if key in self._inflight or not self._try_lock(key):
+            return
+        task = self._compute(key, compute, locked=True)
+        self._background.add(task)
+        task.add_done_callback(self._refresh_done)
+
+    def _refresh_done(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(
+                "Background refresh failed, serving stale entries",
+                exc_info=task.exception(),
+            )
+
+    def _lock_path(self, key: str) -> Path:
+        return self._path(key).with_suffix(".lock")
+
+    def _try_lock(self, key: str) -> bool:
+        path = self._lock_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for _ in range(2):
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                # A worker that died while refreshing leaves its lock behind
+                try:
+                    if time.time() - path.stat().st_mtime < self.refresh_lock_seconds:
+                        return False
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+        return False
+
+    async def drain(self, timeout: float | None = None) -> None:
+        """
+        Wait for the running computations and background refreshes, e.g. before the
+        loop ends. Those still running after `timeout` seconds are cancelled.
+        """
+        tasks = {*self._background, *self._inflight.values()}
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
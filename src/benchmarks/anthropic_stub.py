@@ -0,0 +1,156 @@
+import hashlib
+import io
+import json
+import struct
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any
+from src.agents.utils.profiling import CHARS_PER_TOKEN
+
+# Anthropic caches prefixes of at least this many tokens (Sonnet), for 5 minutes,
+# and looks for a cached prefix up to 20 blocks before each breakpoint
+MIN_CACHEABLE_TOKENS = 1024
+CACHE_TTL_SECONDS = 300
+CACHE_LOOKBACK_BLOCKS = 20
+
+FINAL_OUTPUT = {
+    "key_signals": ["RSI neutral", "price above EMA"],
+    "decision": "LONG",
+    "confidence": 6.0,
+    "entry": 40_000.0,
+    "stop_loss": 39_500.0,
+    "take_profit": [41_000.0],
+    "risk_reward_ratio": "1:2",
+    "timeframe_alignment": True,
+}
+
+
+def image_tokens(png: bytes) -> int:
+    """Tokens of a PNG, (width * height) / 750 capped as Anthropic resizes"""
+    width, height = struct.unpack(">II", png[16:24])
+    return min(width * height // 750, 1600)
+
+
+def _jsonable(value: Any) -> Any:
+    # Image data is passed to the client as `BytesIO`
+    if isinstance(value, io.BytesIO):
+        return hashlib.sha256(value.getvalue()).hexdigest()
+    return str(value)
+
+
+def block_key(block: dict[str, Any]) -> str:
+    """Content of a block as cached, its own breakpoint is not part of it"""
+    payload = {k: v for k, v in block.items() if k != "cache_control"}
+    return json.dumps(payload, sort_keys=True, default=_jsonable)
+
+
+def block_tokens(block: dict[str, Any]) -> int:
+    if block.get("type") == "image":
+        return image_tokens(block["source"]["data"].getvalue())
+    return len(block_key(block)) // CHARS_PER_TOKEN
+
+
+@dataclass
+class StubPromptCache:
+    """Prefix cache keyed by the hash of every block up to a breakpoint"""
+
+    entries: dict[str, float] = field(default_factory=dict)  # prefix -> expiry
+
+    def lookup(self, prefixes: list[str], breakpoints: list[int]) -> int:
+        """Index of the last block of the longest cached prefix, -1 if none"""
+        now = time.monotonic()
+        for index in sorted(breakpoints, reverse=True):
+            for j in range(index, max(index - CACHE_LOOKBACK_BLOCKS, -1), -1):
+                if self.entries.get(prefixes[j], 0) > now:
+                    self.entries[prefixes[j]] = now + CACHE_TTL_SECONDS
+                    return j
+        return -1
+
+    def store(self, prefix: str) -> None:
+        self.entries[prefix] = time.monotonic() + CACHE_TTL_SECONDS
+
+
+class StubMessages:
+    """
+    Offline `client.beta.messages` of the technical agent: calls `calculate_rsi`
+    once, then answers with `FINAL_OUTPUT`. Usage is estimated from the request
+    (4 characters per token, images by size) and prompt caching is simulated like
+    Anthropic's, so the cache reads and writes of a run can be checked offline.
+    """
+
+    def __init__(self, cache: StubPromptCache):
+        self.cache = cache
+        self.requests: list[dict[str, Any]] = []
+
+    async def create(self, **kwargs: Any) -> Any:
+        from anthropic.types.beta import BetaMessage, BetaToolUseBlock, BetaUsage
+
+        self.requests.append(kwargs)
+        blocks = self._prompt_blocks(kwargs)
+        prefixes, tokens, breakpoints = [], [], []
+        digest, total = hashlib.sha256(), 0
+        for i, block in enumerate(blocks):
+            digest.update(block_key(block).encode())
+            prefixes.append(digest.hexdigest())
+            total += block_tokens(block)
+            tokens.append(total)
+            if "cache_control" in block:
+                breakpoints.append(i)
+
+        hit = self.cache.lookup(prefixes, breakpoints)
+        read = tokens[hit] if hit >= 0 else 0
+        write = 0
+        for index in breakpoints:
+            if index > hit and tokens[index] >= MIN_CACHEABLE_TOKENS:
+                self.cache.store(prefixes[index])
+                write = tokens[index] - read
+
+        last = kwargs["messages"][-1]["content"]
+        if any(block.get("type") == "tool_result" for block in last):
+            name, args = "final_result", FINAL_OUTPUT
+        else:
+            name, args = "calculate_rsi", {"length": 14}
+        return BetaMessage(
+            id=f"msg_stub_{len(self.requests)}",
+            type="message",
+            role="assistant",
+            model=kwargs["model"],
+            content=[
+                BetaToolUseBlock(
+                    id=f"toolu_stub_{len(self.requests)}",
+                    type="tool_use",
+                    name=name,
+                    input=args,
+                )
+            ],
+            stop_reason="tool_use",
+            usage=BetaUsage(
+                input_tokens=total - read - write,
+                output_tokens=len(json.dumps(args)) // CHARS_PER_TOKEN,
+                cache_read_input_tokens=read,
+                cache_creation_input_tokens=write,
+            ),
+        )
+
+    @staticmethod
+    def _prompt_blocks(kwargs: dict[str, Any]) -> list[dict[str, Any]]:
+        """Tools, system prompt then messages, in the order Anthropic caches them"""
+        blocks = list(kwargs.get("tools") or [])
+        system = kwargs.get("system")
+        if isinstance(system, str):
+            blocks.append({"type": "text", "text": system})
+        elif isinstance(system, list):
+            blocks.extend(system)
+        for message in kwargs["messages"]:
+            for block in message["content"]:
+                blocks.append({"role": message["role"], **block})
+        return blocks
+
+
+def stub_anthropic_client(cache: StubPromptCache | None = None) -> Any:
+    """Stand-in for `AsyncAnthropic`, pass it to `AnthropicProvider(anthropic_client=)`"""
+    messages = StubMessages(cache or StubPromptCache())
+    return SimpleNamespace(
+        base_url="https://api.anthropic.com", beta=SimpleNamespace(messages=messages)
+    )
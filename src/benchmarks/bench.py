@@ -0,0 +1,305 @@
+import argparse
+import gc
+import json
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Iterator
+import pandas as pd
+from src.agents.utils.candle_store import (
+    DAY_MS,
+    INTERVAL_MS,
+    CandleStore,
+    candles_to_frame,
+    frame_to_candles,
+)
+from src.agents.utils.profiling import payload_size
+from src.benchmarks.fixtures import FakeBybitClient, synthetic_candles, synthetic_frame
+from src.config import Config
+
+# Machine specific, so kept out of the repo with the other local data
+BASELINE_PATH = Path("data/benchmarks/baseline.json")
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+FULL_SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+INDICATOR_TOOLS = [
+    "calculate_rsi",
+    "calculate_stochastic",
+    "calculate_macd",
+    "calculate_ema",
+    "calculate_supertrend",
+    "calculate_bollinger_bands",
+    "calculate_atr",
+    "calculate_obv",
+    "calculate_vwap",
+    "calculate_cdl_pattern",
+]
+
+
+@dataclass
+class BenchCase:
+    """
+    A timed operation on `size` candles: `setup(size)` builds the fixtures and
+    returns the function to time, which runs the operation once.
+    """
+
+    name: str
+    setup: Callable[[int], Callable[[], Any]]
+    max_size: int
+
+
+@contextmanager
+def offline_exchange(client: FakeBybitClient) -> Iterator[Path]:
+    """
+    Serve `exchange_utils` from a fake client and a temporary candle store,
+    yields a temporary folder for output files
+    """
+    from src.agents.utils import exchange_utils
+
+    saved_store = exchange_utils.candle_store
+    with tempfile.TemporaryDirectory() as tmp:
+        saved_client = exchange_utils.set_bybit_client(client)
+        exchange_utils.candle_store = CandleStore(Path(tmp) / "candles")
+        try:
+            yield Path(tmp)
+        finally:
+            exchange_utils.set_bybit_client(saved_client)
+            exchange_utils.candle_store = saved_store
+
+
+def _fixture_range(candles) -> tuple[int, int]:
+    return int(candles["timestamp"][0]), int(candles["timestamp"][-1])
+
+
+def _setup_get_coin_prices(size: int) -> Callable[[], Any]:
+    from src.agents.utils.exchange_utils import get_coin_prices
+
+    candles = synthetic_candles(size)
+    start, end = _fixture_range(candles)
+    client = FakeBybitClient(candles)
+
+    def run():
+        with offline_exchange(client):
+            return get_coin_prices(start, end, use_store=False)
+
+    return run
+
+
+def _setup_tool(tool_name: str) -> Callable[[int], Callable[[], Any]]:
+    def setup(size: int) -> Callable[[], Any]:
+        from src.agents.analysts.models import AgentsDeps
+        from src.agents.utils import tech_indicators
+        from src.agents.utils.indicator_cache import IndicatorCache
+
+        tool = getattr(tech_indicators, tool_name)
+        deps = AgentsDeps(
+            df_candle_path=Path("unused.csv"),
+            df_candle=synthetic_frame(size),
+            # Nothing is kept, every call computes the indicator
+            indicator_cache=IndicatorCache(maxsize=0),
+        )
+        ctx = SimpleNamespace(deps=deps)
+        deps.df_fingerprint()
+
+        def run():
+            return payload_size(tool(ctx))
+
+        return run
+
+    return setup
+
+
+def _setup_render(size: int) -> Callable[[], Any]:
+    from src.agents.utils.exchange_utils import get_plot_and_save_ohlc
+
+    candles = synthetic_candles(size)
+    start, end = _fixture_range(candles)
+    client = FakeBybitClient(candles)
+
+    def run():
+        with offline_exchange(client) as folder:
+            return get_plot_and_save_ohlc(
+                folder / "chart.png", start_date=start, end_date=end
+            )
+
+    return run
+
+
+def _setup_scoring(size: int) -> Callable[[], Any]:
+    from src.agents.analysts.models import TechOutput
+    from src.agents.backtesting.backtest import OUTCOME_DAYS, score_prediction
+
+    df = synthetic_frame(size)
+    horizon = OUTCOME_DAYS * DAY_MS // INTERVAL_MS[Config.SAMPLING_FREQ]
+    windows = [
+        df.iloc[i : i + horizon] for i in range(0, max(size - horizon, 1), horizon)
+    ]
+    predictions = []
+    for i, window in enumerate(windows):
+        entry = float(window["open"].iloc[0])
+        side = 1 if i % 2 else -1
+        predictions.append(
+            TechOutput(
+                key_signals=[],
+                decision="LONG" if side > 0 else "SHORT",
+                confidence=0.6,
+                entry=entry,
+                stop_loss=entry * (1 - side * 0.01),
+                take_profit=[entry * (1 + side * k * 0.01) for k in (1, 2, 3)],
+                risk_reward_ratio="1:1",
+                timeframe_alignment=False,
+            )
+        )
+
+    def run():
+        return [score_prediction(p, w) for p, w in zip(predictions, windows)]
+
+    return run
+
+
+def _setup_frame_roundtrip(size: int) -> Callable[[], Any]:
+    # 1 minute candles, so 10M candles stay within the datetime64[ns] range
+    candles = synthetic_candles(size, interval="1")
+
+    def run():
+        return frame_to_candles(candles_to_frame(candles))
+
+    return run
+
+
+BENCH_CASES = [
+    BenchCase("get_coin_prices", _setup_get_coin_prices, 1_000_000),
+    BenchCase("frame_roundtrip", _setup_frame_roundtrip, 10_000_000),
+    *(
+        BenchCase(f"tool.{name}", _setup_tool(name), 1_000_000)
+        for name in INDICATOR_TOOLS
+    ),
+    BenchCase("get_plot_and_save_ohlc", _setup_render, 10_000),
+    BenchCase("score_prediction", _setup_scoring, 1_000_000),
+]
+
+
+def run_case(case: BenchCase, size: int, repeat: int = 3) -> dict[str, Any]:
+    """
+    Best wall time of `repeat` runs after a warm-up run (which also fills the
+    fake client's payload cache), and the peak memory
+    allocated by one more run traced with `tracemalloc` (NumPy and pandas
+    buffers included)
+    """
+    run = case.setup(size)
+    run()
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    seconds = min(times)
+    return {
+        "case": case.name,
+        "size": size,
+        "seconds": seconds,
+        "candles_per_s": size / seconds if seconds > 0 else float("inf"),
+        "peak_mb": peak / 2**20,
+    }
+
+
+def run_benchmarks(
+    sizes: tuple[int, ...] = DEFAULT_SIZES,
+    pattern: str = ".*",
+    repeat: int = 3,
+) -> pd.DataFrame:
+    """Every case matching `pattern` at every size up to the case's `max_size`"""
+    rows = []
+    for case in BENCH_CASES:
+        if not re.search(pattern, case.name):
+            continue
+        for size in sizes:
+            if size > case.max_size:
+                continue
+            row = run_case(case, size, repeat)
+            print(
+                f"{row['case']:<32} {size:>10,} {row['seconds'] * 1000:>10.2f} ms "
+                f"{row['candles_per_s']:>14,.0f} candles/s {row['peak_mb']:>9.1f} MB",
+                file=sys.stderr,
+            )
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def save_baseline(results: pd.DataFrame, path: Path = BASELINE_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results.to_dict(orient="records"), indent=2))
+
+
+def compare_with_baseline(
+    results: pd.DataFrame,
+    path: Path = BASELINE_PATH,
+    tolerance: float = 1.25,
+) -> pd.DataFrame:
+    """
+    Results next to the stored baseline. A case/size regresses when its time or
+    peak memory exceeds the baseline by more than `tolerance` times. Differences
+    below 1 ms or 1 MB are noise and never count.
+    """
+    baseline = pd.DataFrame(json.loads(path.read_text()))
+    merged = results.merge(
+        baseline[["case", "size", "seconds", "peak_mb"]],
+        on=["case", "size"],
+        how="left",
+        suffixes=("", "_baseline"),
+    )
+    merged["time_ratio"] = merged["seconds"] / merged["seconds_baseline"]
+    merged["memory_ratio"] = merged["peak_mb"] / merged["peak_mb_baseline"]
+    slower = (merged["time_ratio"] > tolerance) & (
+        merged["seconds"] - merged["seconds_baseline"] > 1e-3
+    )
+    larger = (merged["memory_ratio"] > tolerance) & (
+        merged["peak_mb"] - merged["peak_mb_baseline"] > 1.0
+    )
+    merged["regression"] = slower | larger
+    return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Offline benchmarks of the data, indicator, chart and scoring paths"
+    )
+    parser.add_argument("-k", "--cases", default=".*", help="Regex on case names")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument(
+        "--full", action="store_true", help=f"Run all sizes {FULL_SIZES}"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    args = parser.parse_args()
+
+    sizes = FULL_SIZES if args.full else tuple(args.sizes)
+    results = run_benchmarks(sizes, args.cases, args.repeat)
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"Saved baseline to {args.baseline}")
+    elif args.baseline.exists():
+        compared = compare_with_baseline(results, args.baseline, args.tolerance)
+        columns = ["case", "size", "seconds", "time_ratio", "peak_mb", "memory_ratio"]
+        print(compared[columns].to_string(index=False))
+        if compared["regression"].any():
+            print("Regressions:")
+            print(compared.loc[compared["regression"], columns].to_string(index=False))
+            sys.exit(1)
+    else:
+        print(results.to_string(index=False))
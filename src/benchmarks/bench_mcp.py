@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import os
+import signal
+import time
+from contextlib import AsyncExitStack
+from src.agents.utils.mcp_pool import MCPServerPool
+from src.benchmarks.mcp_stub import stub_server
+
+SERVERS = ("coingecko", "reddit")
+
+
+async def _call_tools(servers) -> None:
+    for server in servers:
+        await server.direct_call_tool("get_coin_price", {"coin_id": "bitcoin"})
+
+
+async def bench_cold(runs: int, startup_delay: float) -> list[float]:
+    """Seconds per run when every run starts its own servers, as without the pool"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        async with AsyncExitStack() as stack:
+            servers = [
+                await stack.enter_async_context(stub_server(name, startup_delay))
+                for name in SERVERS
+            ]
+            await _call_tools(servers)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+async def bench_pooled(
+    runs: int, startup_delay: float, concurrency: int
+) -> tuple[float, list[float]]:
+    """Warm start seconds, then seconds per batch of `concurrency` concurrent runs"""
+    pool = MCPServerPool(
+        {name: lambda name=name: stub_server(name, startup_delay) for name in SERVERS},
+        health_interval=0,
+    )
+    start = time.perf_counter()
+    await pool.start()
+    warm_start = time.perf_counter() - start
+
+    async def run():
+        async with pool.lease() as servers:
+            await _call_tools(servers)
+
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await asyncio.gather(*(run() for _ in range(concurrency)))
+        times.append(time.perf_counter() - start)
+
+    # A killed server is detected and replaced
+    async with pool.lease() as servers:
+        result = await servers[0].direct_call_tool("server_pid", {})
+    os.kill(int(result), signal.SIGKILL)  # pyright: ignore[reportArgumentType]
+    healthy = await pool.check(SERVERS[0])
+    await pool.restart(SERVERS[0])
+    await run()
+    print(f"killed {SERVERS[0]}: healthy={healthy}, after restart {pool.snapshot()}")
+    await pool.close()
+    return warm_start, times
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Per-run MCP server startup vs the persistent pool, on a local stub"
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--startup-delay", type=float, default=0.0, help="Simulated npx resolution"
+    )
+    args = parser.parse_args()
+
+    cold = asyncio.run(bench_cold(args.runs, args.startup_delay))
+    warm_start, pooled = asyncio.run(
+        bench_pooled(args.runs, args.startup_delay, args.concurrency)
+    )
+    print(f"per-run servers: {min(cold) * 1000:>9.1f} ms per run (best)")
+    print(f"pool warm start: {warm_start * 1000:>9.1f} ms once")
+    print(
+        f"pooled:          {min(pooled) * 1000:>9.1f} ms per batch of "
+        f"{args.concurrency} concurrent runs (best)"
+    )
@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+import pandas as pd
+from src.agents.analysts.models import AgentsDeps
+from src.agents.utils.profiling import CACHE_READ_PRICE, CACHE_WRITE_PRICE
+from src.benchmarks.anthropic_stub import stub_anthropic_client
+from src.benchmarks.fixtures import synthetic_frame
+
+STUB_MODEL_NAME = "claude-sonnet-4-5"
+
+
+async def bench_runs(runs: int, cache_prompts: bool, folder: Path) -> pd.DataFrame:
+    """
+    Prompt cache usage of consecutive technical agent runs against the stub model,
+    each run on new candles and charts as in live or backtest runs
+    """
+    from pydantic_ai.messages import ModelResponse
+    from pydantic_ai.providers.anthropic import AnthropicProvider
+    from src.agents.analysts import technical_analyst
+    from src.agents.utils.charts import render_ohlc_pngs
+    from src.agents.utils.profiling import prompt_cache_stats
+    from src.agents.utils.prompt_cache import (
+        PromptCachingAnthropicModel,
+        PromptCachingSettings,
+    )
+
+    model = PromptCachingAnthropicModel(
+        STUB_MODEL_NAME,
+        provider=AnthropicProvider(anthropic_client=stub_anthropic_client()),
+    )
+    settings = PromptCachingSettings(
+        anthropic_cache_tool_definitions=cache_prompts,
+        anthropic_cache_instructions=cache_prompts,
+        anthropic_cache_messages=cache_prompts,
+    )
+    agent = technical_analyst.get_agent()
+    rows = []
+    for run in range(runs):
+        df = synthetic_frame(96, seed=run)
+        chart, chart_week = render_ohlc_pngs(
+            [(df, "15m"), (synthetic_frame(168, "60", seed=run), "1h")]
+        )
+        user_prompt = technical_analyst.build_user_prompt("BTCUSDT", chart, chart_week)
+        deps = AgentsDeps(df_candle_path=folder / f"{run}.csv", df_candle=df)
+        with agent.override(model=model):
+            res = await agent.run(user_prompt, deps=deps, model_settings=settings)
+        responses = [m for m in res.all_messages() if isinstance(m, ModelResponse)]
+        rows.append(
+            {
+                "requests": len(responses),
+                # Anthropic's input tokens are the ones not read from or written to the cache
+                "input_tokens": sum(m.usage.details["input_tokens"] for m in responses),
+                **prompt_cache_stats(responses),
+            }
+        )
+    return pd.DataFrame(rows).rename_axis("run")
+
+
+def billed_input(stats: pd.DataFrame) -> pd.Series:
+    """Input tokens per run as billed, in uncached input token equivalents"""
+    return (
+        stats["input_tokens"]
+        + stats["cache_read_tokens"] * CACHE_READ_PRICE
+        + stats["cache_write_tokens"] * CACHE_WRITE_PRICE
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Technical agent runs with and without prompt caching, on a stub model"
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    from src.config import Config
+
+    # The stub replaces the agent's model, no Anthropic client is needed
+    Config.MODEL_VERSION_TECHANAL_AGENT = "test"
+    # Offline, get_agent() configures logfire and it must not need a login
+    os.environ["LOGFIRE_SEND_TO_LOGFIRE"] = "false"
+
+    async def main() -> tuple[pd.DataFrame, pd.DataFrame]:
+        with tempfile.TemporaryDirectory() as tmp:
+            cached = await bench_runs(args.runs, True, Path(tmp))
+            uncached = await bench_runs(args.runs, False, Path(tmp))
+        return cached, uncached
+
+    cached, uncached = asyncio.run(main())
+    print(f"with prompt caching:\n{cached.to_string()}")
+    print(f"without:\n{uncached.to_string()}")
+    print(
+        f"billed input tokens per run: {billed_input(cached).mean():.0f} cached, "
+        f"{billed_input(uncached).mean():.0f} uncached"
+    )
@@ -0,0 +1,100 @@
+from typing import Any
+import numpy as np
+import pandas as pd
+from src.agents.utils.candle_store import (
+    CANDLE_DTYPE,
+    INTERVAL_MS,
+    candles_to_frame,
+)
+
+# 2024-01-01 00:00 UTC, fixtures start on a day boundary like store partitions
+FIXTURE_START = 1_704_067_200_000
+
+
+def synthetic_candles(
+    n: int,
+    interval: str = "15",
+    seed: int = 0,
+    start: int = FIXTURE_START,
+    price: float = 40_000.0,
+    volatility: float = 0.002,
+) -> np.ndarray:
+    """
+    Random walk OHLCV candles (`CANDLE_DTYPE`), with wicks and volume, so every
+    indicator and candlestick pattern has realistic work to do.
+    """
+    rng = np.random.default_rng(seed)
+    log_ret = rng.normal(0, volatility, n)
+    close = price * np.exp(np.cumsum(log_ret))
+    open_ = np.concatenate(([price], close[:-1]))
+    wick = np.abs(rng.normal(0, volatility / 2, (2, n)))
+    candles = np.empty(n, dtype=CANDLE_DTYPE)
+    candles["timestamp"] = start + np.arange(n, dtype=np.int64) * INTERVAL_MS[interval]
+    candles["open"] = open_
+    candles["close"] = close
+    candles["high"] = np.maximum(open_, close) * (1 + wick[0])
+    candles["low"] = np.minimum(open_, close) * (1 - wick[1])
+    candles["volume"] = rng.lognormal(3, 1, n)
+    candles["turnover"] = candles["volume"] * close
+    return candles
+
+
+def synthetic_frame(n: int, interval: str = "15", seed: int = 0) -> pd.DataFrame:
+    """`synthetic_candles` in the `get_coin_prices` frame format"""
+    return candles_to_frame(synthetic_candles(n, interval, seed))
+
+
+class FakeBybitClient:
+    """
+    Offline stand-in for `pybit.unified_trading.HTTP.get_kline`, serving fixture
+    candles as Bybit does: rows of strings, newest first, at most `limit` per call.
+
+    Payloads are cached by request, so repeated runs time only the client side.
+    """
+
+    def __init__(self, candles: np.ndarray, interval: str = "15"):
+        self.candles = candles
+        self.interval = interval
+        self.calls = 0
+        self._pages: dict[tuple, dict[str, Any]] = {}
+
+    def get_kline(
+        self,
+        symbol: str,
+        interval: str,
+        category: str,
+        limit: int = 200,
+        start: int | None = None,
+        end: int | None = None,
+        **kwargs: Any,
+    ) -> dict[str, Any]:
+        self.calls += 1
+        key = (symbol, interval, category, limit, start, end)
+        if key not in self._pages:
+            self._pages[key] = self._payload(symbol, category, limit, start, end)
+        return self._pages[key]
+
+    def _payload(
+        self,
+        symbol: str,
+        category: str,
+        limit: int,
+        start: int | None,
+        end: int | None,
+    ) -> dict[str, Any]:
+        timestamps = self.candles["timestamp"]
+        lo = 0 if start is None else np.searchsorted(timestamps, start, "left")
+        hi = (
+            len(timestamps)
+            if end is None
+            else np.searchsorted(timestamps, end, "right")
+        )
+        page = self.candles[max(lo, hi - limit) : hi][::-1]
+        rows = [
+            [str(row[0]), *(repr(value) for value in row[1:])] for row in page.tolist()
+        ]
+        return {
+            "retCode": 0,
+            "retMsg": "OK",
+            "result": {"category": category, "symbol": symbol, "list": rows},
+        }
@@ -0,0 +1,159 @@
+import argparse
+import json
+import subprocess
+import sys
+from dataclasses import dataclass
+
+# Stacks that only the agent, indicator and chart paths need. logfire is not
+# listed: its pydantic plugin imports it with the first pydantic model.
+AGENT_STACK = ("pydantic_ai", "anthropic")
+INDICATOR_STACK = ("pandas_ta", "talib")
+CHART_STACK = ("matplotlib", "mplfinance")
+EXCHANGE_STACK = ("pybit.unified_trading",)
+
+# Run in a fresh interpreter per module, so nothing is imported already
+_PROBE = """
+import importlib, json, sys, threading, time
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+seconds = time.perf_counter() - start
+telemetry = sys.modules.get("src.agents.utils.telemetry")
+exchange = sys.modules.get("src.agents.utils.exchange_utils")
+print(json.dumps({
+    "seconds": seconds,
+    "modules": sorted(sys.modules),
+    "threads": threading.active_count(),
+    "telemetry": bool(telemetry and telemetry.telemetry_enabled()),
+    "exchange_client": bool(exchange and exchange._bybit_client is not None),
+}))
+"""
+
+
+@dataclass
+class ImportBudget:
+    """
+    Cold import of `module` must take less than `max_seconds` and load none of the
+    `forbidden` packages. Side effects (threads, telemetry, exchange clients)
+    are never allowed.
+    """
+
+    module: str
+    max_seconds: float
+    forbidden: tuple[str, ...] = ()
+
+
+IMPORT_BUDGETS = [
+    # Data-only
+    ImportBudget(
+        "src.agents.utils.candle_store",
+        0.8,
+        AGENT_STACK + INDICATOR_STACK + CHART_STACK + EXCHANGE_STACK,
+    ),
+    ImportBudget(
+        "src.agents.utils.exchange_utils",
+        1.0,
+        AGENT_STACK + INDICATOR_STACK + CHART_STACK + EXCHANGE_STACK,
+    ),
+    # Scoring-only
+    ImportBudget(
+        "src.agents.backtesting.barriers",
+        0.3,
+        AGENT_STACK + INDICATOR_STACK + CHART_STACK + EXCHANGE_STACK + ("pandas",),
+    ),
+    ImportBudget(
+        "src.agents.backtesting.portfolio",
+        0.8,
+        AGENT_STACK + INDICATOR_STACK + CHART_STACK + EXCHANGE_STACK,
+    ),
+    ImportBudget(
+        "src.agents.backtesting.sweep",
+        1.2,
+        AGENT_STACK + INDICATOR_STACK + CHART_STACK + EXCHANGE_STACK,
+    ),
+    ImportBudget(
+        "src.agents.backtesting.backtest",
+        1.2,
+        AGENT_STACK + INDICATOR_STACK + CHART_STACK + EXCHANGE_STACK,
+    ),
+    # Agents, built on first use only
+    ImportBudget(
+        "src.agents.analysts.technical_analyst",
+        1.2,
+        AGENT_STACK + INDICATOR_STACK + CHART_STACK + EXCHANGE_STACK,
+    ),
+    ImportBudget(
+        "src.agents.analysts.news_analyst",
+        1.2,
+        AGENT_STACK + INDICATOR_STACK + CHART_STACK + EXCHANGE_STACK,
+    ),
+    ImportBudget(
+        "src.agents.analysts.orchestrator",
+        1.2,
+        AGENT_STACK + INDICATOR_STACK + CHART_STACK + EXCHANGE_STACK,
+    ),
+]
+
+
+def probe_import(module: str, repeat: int = 3) -> dict:
+    """Fastest of `repeat` cold imports of `module`, each in a new interpreter"""
+    best = None
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE, module],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        result = json.loads(out.splitlines()[-1])
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    return best  # type: ignore[return-value]
+
+
+def check_budget(budget: ImportBudget, repeat: int = 3, scale: float = 1.0) -> dict:
+    """Probe of one module with the list of broken rules in `violations`"""
+    result = probe_import(budget.module, repeat)
+    loaded = set(result["modules"])
+    violations = []
+    if result["seconds"] > budget.max_seconds * scale:
+        violations.append(
+            f"took {result['seconds']:.2f}s, budget {budget.max_seconds * scale:.2f}s"
+        )
+    violations += [f"imported {name}" for name in budget.forbidden if name in loaded]
+    if result["threads"] > 1:
+        violations.append(f"started {result['threads'] - 1} thread(s)")
+    if result["telemetry"]:
+        violations.append("configured telemetry")
+    if result["exchange_client"]:
+        violations.append("created the exchange client")
+    return {
+        "module": budget.module,
+        "seconds": result["seconds"],
+        "budget": budget.max_seconds * scale,
+        "violations": violations,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check cold import time and side effects of the CLI modules"
+    )
+    parser.add_argument("-k", "--module", default="", help="Substring of module names")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="Multiplier of every time budget"
+    )
+    args = parser.parse_args()
+
+    failed = False
+    for budget in IMPORT_BUDGETS:
+        if args.module not in budget.module:
+            continue
+        report = check_budget(budget, args.repeat, args.scale)
+        status = "FAIL" if report["violations"] else "ok"
+        print(
+            f"{status:<4} {report['module']:<44} {report['seconds']:>6.2f}s "
+            f"/ {report['budget']:.2f}s  {'; '.join(report['violations'])}"
+        )
+        failed |= bool(report["violations"])
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,73 @@
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pydantic_ai.mcp import MCPServerStdio
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+def stub_server(
+    name: str = "stub", startup_delay: float = 0.0, **kwargs
+) -> "MCPServerStdio":
+    """
+    `MCPServerStdio` running this stub, a stand-in for the news agent's `npx`
+    servers. `startup_delay` adds seconds before the handshake, like npx resolution.
+    """
+    from pydantic_ai.mcp import MCPServerStdio
+
+    return MCPServerStdio(
+        sys.executable,
+        args=[
+            "-m",
+            "src.benchmarks.mcp_stub",
+            "--name",
+            name,
+            "--startup-delay",
+            str(startup_delay),
+        ],
+        cwd=REPO_ROOT,
+        id=name,
+        **kwargs,
+    )
+
+
+def serve(name: str) -> None:
+    """Offline MCP server over stdio with canned coin and post lookups"""
+    from mcp.server.fastmcp import FastMCP
+
+    server = FastMCP(name, log_level="WARNING")
+
+    @server.tool()
+    def get_coin_price(coin_id: str) -> dict:
+        """Current USD price and 24h change of a coin"""
+        return {"id": coin_id, "usd": 40_000.0, "usd_24h_change": 1.5}
+
+    @server.tool()
+    def search_posts(query: str, limit: int = 3) -> list[dict]:
+        """Recent posts matching `query`"""
+        return [
+            {"title": f"{query} post {i}", "score": 100 - i, "sentiment": "neutral"}
+            for i in range(limit)
+        ]
+
+    @server.tool()
+    def server_pid() -> int:
+        """Process id of this server, to kill it in restart checks"""
+        return os.getpid()
+
+    server.run("stdio")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stdio MCP stub")
+    parser.add_argument("--name", default="stub")
+    parser.add_argument("--startup-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    time.sleep(args.startup_delay)
+    serve(args.name)
@@ -1,5 +1,6 @@
 from dotenv import load_dotenv
 import os
+from pathlib import Path
 from typing import Literal
 
 load_dotenv()
@@ -18,6 +19,72 @@ class Config:
         "linear"  # required parameter for bybit
     )
 
+    # Local candle store set up
+    CANDLE_STORE_DIR: Path = Path("data/candles")
+    CANDLE_STORE_OFFLINE: bool = os.getenv("CANDLE_STORE_OFFLINE", "") == "1"
+    KLINE_DOWNLOAD_WORKERS: int = 8  # concurrent kline requests for backfills
+    HTTP_POOL_SIZE: int = 32  # keep-alive connections to the exchange
+    # Closed candles kept in memory by the streaming feed (~10 days of 15m candles)
+    STREAM_BUFFER_SIZE: int = 1000
+
+    # Persisted candlestick pattern events per symbol and interval
+    PATTERN_INDEX_DIR: Path = Path("data/patterns")
+
+    # Multi-symbol scanner: universe screened on these intervals, top K go to the LLM
+    SCAN_INTERVALS: list[str] = ["15", "60"]
+    SCAN_LOOKBACK_CANDLES: int = 200  # candles per symbol and interval for the filter
+    SCAN_TOP_K: int = 5
+    SCAN_FETCH_WORKERS: int = 16
+    SCAN_PROCESSES: int = 4
+
+    # Max number of memoized indicator results shared between agent runs
+    INDICATOR_CACHE_SIZE: int = 512
+    # Indicator tools output: "full" ({timestamp: value} per series) or "compact"
+    # (shared time axis, value arrays and summary stats). On 96 candles the nine
+    # series tools return ~34 KB in full, ~11 KB compact (~3x) and ~4.5 KB (~7x)
+    # compact with INDICATOR_PAYLOAD_TAIL=20
+    INDICATOR_PAYLOAD_FORMAT: Literal["full", "compact"] = os.getenv(  # pyright: ignore[reportAssignmentType]
+        "INDICATOR_PAYLOAD_FORMAT", "full"
+    )
+    INDICATOR_PAYLOAD_TAIL: int | None = None  # last N values sent in compact mode
+
+    # LLM response cache: "record", "replay" or "passthrough"
+    LLM_CACHE_MODE: Literal["record", "replay", "passthrough"] = os.getenv(  # pyright: ignore[reportAssignmentType]
+        "LLM_CACHE_MODE", "passthrough"
+    )
+    LLM_CACHE_DIR: Path = Path("data/llm_cache")
+
+    # The technical agent's confidence is a 0-10 score, see prompts.py
+    TECH_CONFIDENCE_SCALE: float = 10.0
+
+    # Anthropic prompt caching of the technical agent's tool schemas, system prompt
+    # and conversation (charts): cache reads cost 10% of uncached input tokens
+    ANTHROPIC_PROMPT_CACHE: bool = os.getenv("ANTHROPIC_PROMPT_CACHE", "1") == "1"
+
+    # Worker processes rendering the two analysis charts in parallel, 0 renders in-thread
+    CHART_RENDER_PROCESSES: int = 0
+
+    # News agent MCP servers: started once per process and kept alive by a pool
+    MCP_HEALTH_CHECK_SECONDS: float = 60.0  # 0 disables the periodic health check
+    MCP_HEALTH_CHECK_TIMEOUT: float = 10.0
+
+    # News sentiment and MCP tool results cache, shared by workers through the disk.
+    # Stale entries are served while refreshed in the background.
+    NEWS_CACHE_DIR: Path = Path("data/news_cache")
+    NEWS_CACHE_BUCKET_SECONDS: int = 24 * 3600  # sentiment is keyed per day
+    NEWS_SENTIMENT_TTL: float = float(os.getenv("NEWS_SENTIMENT_TTL", 30 * 60))
+    NEWS_SENTIMENT_STALE_TTL: float = 2 * 3600
+    NEWS_TOOL_TTL: float = float(os.getenv("NEWS_TOOL_TTL", 15 * 60))
+    NEWS_TOOL_STALE_TTL: float = 3600
+
+    # Trade decision orchestrator: deadlines in seconds of its concurrent branches.
+    # A late news branch is dropped, a late data or technical branch means no trade.
+    DECISION_DATA_DEADLINE: float = 60.0
+    DECISION_TECH_DEADLINE: float = 180.0
+    DECISION_NEWS_DEADLINE: float = 45.0
+    # After a CLI decision is printed, a late news search gets this long to finish
+    DECISION_SHUTDOWN_GRACE: float = 5.0
+
     # Credentials
     ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "")
     ALPHA_VANTAGE_API_KEY: str = os.getenv("ALPHA_VANTAGE_API_KEY", "")